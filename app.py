@@ -21,6 +21,7 @@ import traceback
 from tank.platform.qt import QtCore
 from tank.platform import Application
 from tank import TankError
+from tank.errors import TankHookMethodDoesNotExistError
 
 import hiero.ui
 import hiero.core
@@ -49,6 +50,13 @@ from tk_hiero_export import (
     ShotgunNukeShotExporterUI,
     ShotgunAudioExporterUI,
     ShotgunHieroObjectBase,
+    AccountingShotgun,
+    PlanningShotgun,
+    TracingShotgun,
+    encode_png,
+    item_args,
+    trace_span,
+    upload_thumbnail_data,
 )
 sys.path.pop()
 
@@ -96,6 +104,21 @@ class HieroExport(Application):
     def init_app(self):
         # let the shot exporter know when the first shot is being run
         self.first_shot = False
+
+        # the hook instances reused by execute_hook_method, and the number of
+        # calls made to each hook method, since the last export started
+        self._hook_instances = {}
+        self._hook_call_counts = {}
+
+        # the tracer of the running export, if the trace_folder setting is set
+        self.tracer = None
+
+        # the accounting of the Shotgun calls made by the running export
+        self.sg_call_stats = None
+
+        # the plan recording the Shotgun writes of a dry run export
+        self.export_plan = None
+
         self._register_exporter()
 
     @property
@@ -105,6 +128,115 @@ class HieroExport(Application):
         """
         return True
 
+    @property
+    def shotgun(self):
+        """
+        The Shotgun connection for the current thread. The API calls made
+        with it are accounted for while an export runs, and recorded when the
+        export is traced. The writes of a dry run export are recorded in its
+        plan rather than made.
+        """
+        shotgun = Application.shotgun.fget(self)
+        if self.sg_call_stats is not None:
+            shotgun = AccountingShotgun(shotgun, self.sg_call_stats)
+        if self.tracer is not None:
+            shotgun = TracingShotgun(shotgun, self.tracer)
+        if self.export_plan is not None:
+            shotgun = PlanningShotgun(shotgun, self.export_plan)
+        return shotgun
+
+    def execute_hook(self, key, **kwargs):
+        """
+        Execute the ``execute`` method of the hook for the given setting. See
+        :meth:`execute_hook_method`.
+        """
+        return self.execute_hook_method(key, "execute", **kwargs)
+
+    def execute_hook_method(self, key, method_name, base_class=None, **kwargs):
+        """
+        Execute a method of the hook for the given setting.
+
+        The export calls hooks several times for every item, so each hook is
+        resolved and instantiated on its first call and the instance is
+        reused until :meth:`reset_hook_cache` is called. Hooks that can't be
+        instantiated here are executed by Toolkit as usual.
+        """
+        call_key = (key, method_name)
+        self._hook_call_counts[call_key] = self._hook_call_counts.get(call_key, 0) + 1
+
+        span_args = None
+        if self.tracer is not None:
+            span_args = item_args(kwargs.get("task"), kwargs.get("item"))
+
+        with trace_span(self.tracer, "%s.%s" % call_key, "hook", span_args):
+            hook = self._get_hook_instance(key, base_class)
+            if hook is None:
+                if base_class is None:
+                    return Application.execute_hook_method(self, key, method_name, **kwargs)
+                return Application.execute_hook_method(self, key, method_name, base_class=base_class, **kwargs)
+
+            try:
+                hook_method = getattr(hook, method_name)
+            except AttributeError:
+                raise TankHookMethodDoesNotExistError(
+                    "Cannot execute hook '%s' - the hook method '%s' does not exist!" % (key, method_name))
+            return hook_method(**kwargs)
+
+    def _get_hook_instance(self, key, base_class=None):
+        """
+        Returns the instance of the hook for the given setting, creating it on
+        first use, or None if it can't be created outside of Toolkit's
+        execute methods.
+        """
+        instance_key = (key, base_class)
+        if instance_key not in self._hook_instances:
+            hook = None
+            try:
+                hook = self.create_hook_instance(self.get_setting(key), base_class=base_class)
+            except Exception, e:
+                # e.g. an older core, or a hook expression that can only be
+                # resolved along with its setting
+                self.log_debug("Hook '%s' will be instantiated for each call: %s" % (key, e))
+            self._hook_instances[instance_key] = hook
+        return self._hook_instances[instance_key]
+
+    @property
+    def hook_call_counts(self):
+        """
+        A dictionary of the number of calls made to each hook method since
+        the last export started, keyed by (setting, method name).
+        """
+        return dict(self._hook_call_counts)
+
+    def reset_hook_cache(self):
+        """
+        Forget the hook instances and call counts. This is called as each
+        export starts, so that changes to the hooks are picked up.
+        """
+        self._hook_instances = {}
+        self._hook_call_counts = {}
+
+    def log_hook_call_counts(self):
+        """
+        Log the number of calls made to each hook method since the last
+        export started.
+        """
+        for ((key, method_name), count) in sorted(self._hook_call_counts.items()):
+            self.log_debug("Hook %s.%s called %s times." % (key, method_name, count))
+
+    def upload_thumbnail(self, entity, qimage, width=600):
+        """
+        Upload the image, scaled down to the given width, as the thumbnail of
+        the entity. The image is encoded in memory and uploaded from a scratch
+        file reused by the current thread.
+
+        :param entity: The entity dictionary to set the thumbnail of.
+        :param qimage: The QImage of the thumbnail.
+        :param width: The width the image is scaled to.
+        """
+        self.log_debug("Uploading thumbnail for %s %s..." % (entity["type"], entity["id"]))
+        upload_thumbnail_data(self.shotgun, entity["type"], entity["id"], encode_png(qimage, width))
+
     def get_default_encoder_name(self):
         """Returns the default encoder for use in quicktime generation.
 
@@ -0,0 +1,300 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Runs a Shotgun shot export of synthetic sequences of 100, 1,000 and 5,000
+shots, and reports the wall time and Shotgun calls of each stage of it:
+ShotgunShotProcessor.processTaskPreQueue, the shot updater taskStep and the
+transcode startTask and finishTask.
+
+Neither Hiero nor a Shotgun site is required. The app runs on the stand-ins
+of hiero_stubs and toolkit_stubs, against the in-process site of mock_shotgun
+which waits for the given latency on every call. Half of the shots exist in
+Shotgun before each export, with a Version each. The tasks are run one after
+the other by the benchmark rather than by Hiero's queue, and the transcode
+tasks write a placeholder file rather than render. Uploads made in the
+background are counted in the stage running when they are made.
+
+With --dry-run, the export is planned rather than run, and the plan is then
+applied to the site, which is reported as the ExportPlan.apply stage.
+
+With --recut, the sequence is exported once before the benchmark, and every
+tenth shot is trimmed by a frame. The export of the re-cut sequence updates
+the latest revision of the Cut. Run with:
+
+    python benchmarks/export_pipeline.py [--latency SECONDS] [--tracks N]
+        [--effects N] [--dry-run] [--recut] [-v] [shot count ...]
+"""
+
+import os
+import imp
+import glob
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import functools
+import collections
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BENCHMARKS)
+
+import hiero_stubs
+import toolkit_stubs
+from mock_shotgun import MockShotgun
+
+hiero_stubs.install()
+toolkit_stubs.install()
+
+app_module = imp.load_source("tk_hiero_export_app", os.path.join(ROOT, "app.py"))
+
+from tk_hiero_export import (
+    ExportPlan,
+    ShotgunShotProcessor,
+    ShotgunShotProcessorPreset,
+    ShotgunTranscodePreset,
+)
+
+EXPORT_PATH = "{sequence}/{shot}/plates/{CbsdVersionBaseName}_v{CbsdAutoVersion}.{ext}"
+
+SETTINGS = {
+    "hook_translate_template": "hiero_translate_template",
+    "hook_upload_thumbnail": "hiero_upload_thumbnail",
+    "hook_get_shot": "hiero_get_shot",
+    "hook_pre_export": "hiero_pre_export",
+    "hook_resolve_custom_strings": "hiero_resolve_custom_strings",
+    "hook_get_quicktime_settings": "hiero_get_quicktime_settings",
+    "hook_update_version_data": "hiero_update_version_data",
+    "hook_post_version_creation": "hiero_post_version_creation",
+    "hook_get_extra_publish_data": "hiero_get_extra_publish_data",
+    "hook_customize_export_ui": "hiero_customize_export_ui",
+    "template_version": "hiero_version",
+    "default_task_template": "Basic shot template",
+    "default_task_filter": "[['step.Step.code', 'is', 'Comp']]",
+    "plate_published_file_type": "Hiero Plate",
+    "nuke_script_toolkit_write_nodes": [],
+    "custom_template_fields": [
+        {"keyword": "CbsdVersionBaseName", "description": "The version base name of the element tag"},
+        {"keyword": "CbsdAutoVersion", "description": "The next version number of the element"},
+    ],
+    "entity_cache_ttl": 0,
+    "trace_folder": "",
+    "sg_call_report_folder": "",
+}
+
+TEMPLATES = [
+    toolkit_stubs.Template("hiero_version", "%(version)03d"),
+    toolkit_stubs.Template(
+        "hiero_shot_convention", r"(?P<episode>[a-z0-9]+)_(?P<scene>\d{3})_(?P<shot>\d{4})"),
+]
+
+# the stages reported first, in this order, followed by any others
+STAGES = (
+    "ShotgunShotProcessor.processTaskPreQueue",
+    "ShotgunShotUpdater.taskStep",
+    "ShotgunTranscodeExporter.startTask",
+    "ShotgunTranscodeExporter.finishTask",
+)
+
+
+class _Stages(object):
+    """
+    Times calls and counts the Shotgun calls made during them, by stage.
+    """
+
+    def __init__(self, shotgun):
+        self._shotgun = shotgun
+        self.seconds = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+
+    def run(self, stage, function, *args):
+        calls = sum(self._shotgun.call_counts().values())
+        start = time.time()
+        try:
+            return function(*args)
+        finally:
+            self.seconds[stage] += time.time() - start
+            self.calls[stage] += sum(self._shotgun.call_counts().values()) - calls
+
+
+def _create_site(shot_names, latency):
+    """
+    Returns a site holding the project and the entities the export looks up,
+    and the first half of the shots with a Version each, along with the
+    project and sequence.
+    """
+    shotgun = MockShotgun(latency)
+    project = shotgun.add("Project", {"name": "Benchmark"})
+    sequence = shotgun.add("Sequence", {"code": "ep101", "project": project})
+    shotgun.add("HumanUser", {"name": "Benchmark User", "login": "benchmark"})
+    step = shotgun.add("Step", {"code": "Comp"})
+    task_template = shotgun.add("TaskTemplate", {
+        "code": SETTINGS["default_task_template"],
+        "entity_type": "Shot",
+        "steps": [step],
+    })
+    shotgun.add("CustomEntity06", {
+        "code": "Final",
+        "sg_width": 1920,
+        "sg_height": 1080,
+        "sg_pixel_aspect_ratio": 1.0,
+    })
+
+    for name in shot_names[:len(shot_names) // 2]:
+        shot = shotgun.add("Shot", {
+            "code": name,
+            "project": project,
+            "sg_sequence": sequence,
+            "task_template": task_template,
+        })
+        shotgun.add("Version", {
+            "code": "%s_v001" % (name.lower(),),
+            "project": project,
+            "entity": shot,
+            "sg_version_type": "Plate",
+            "sg_file_type": "mov",
+            "sg_version_number": 1,
+        })
+
+    return (shotgun, project, sequence)
+
+
+def _export(items, export_root, stages, properties):
+    """
+    Run a Shotgun shot export of the items with the given Shotgun shot
+    processor properties, timing each stage.
+    """
+    preset = ShotgunShotProcessorPreset("Benchmark", {
+        "exportRoot": export_root,
+        "exportTemplate": (
+            (EXPORT_PATH, ShotgunTranscodePreset("", {
+                "file_type": "mov",
+                "mov": {"encoder": "mov64"},
+                "reformat": {"to_type": "None"},
+            })),
+        ),
+        "shotgunShotCreateProperties": properties,
+    })
+
+    processor = ShotgunShotProcessor(preset, hiero_stubs.Submission(), True)
+    processor.processTaskPreQueue = functools.partial(
+        stages.run, "ShotgunShotProcessor.processTaskPreQueue", processor.processTaskPreQueue)
+    stages.run("ShotgunShotProcessor.startProcessing", processor.startProcessing, items)
+
+    for group in processor._submission.children():
+        for task in group.children():
+            name = type(task).__name__
+            stages.run("%s.startTask" % (name,), task.startTask)
+            while stages.run("%s.taskStep" % (name,), task.taskStep):
+                pass
+            stages.run("%s.finishTask" % (name,), task.finishTask)
+            if task.error():
+                raise RuntimeError("%s failed: %s" % (name, task.error()))
+
+
+def run(shot_count, track_count, effects_per_track, latency, dry_run=False, recut=False):
+    """
+    Export a synthetic sequence and print the time and Shotgun calls taken by
+    each stage. A dry run's plan is applied once the export has finished. A
+    re-cut is exported after a first export of the sequence.
+    """
+    hiero_sequence = hiero_stubs.build_sequence(
+        "ep101", shot_count, track_count, effects_per_track)
+    items = [item for track in hiero_sequence.videoTracks() for item in track.items()]
+
+    (shotgun, project, sequence) = _create_site([item.name() for item in hiero_sequence.videoTracks()[0]], latency)
+    tk = toolkit_stubs.Toolkit(shotgun, TEMPLATES)
+    engine = toolkit_stubs.Engine(tk, toolkit_stubs.Context(project, sequence))
+    export_root = tempfile.mkdtemp(prefix="tk_hiero_export_benchmark_")
+    stages = _Stages(shotgun)
+    app = None
+    plan = None
+
+    try:
+        start = time.time()
+        app = app_module.HieroExport(engine, SETTINGS, os.path.join(ROOT, "hooks"))
+
+        properties = {"dryRun": dry_run}
+        if recut:
+            _export(items, export_root, _Stages(shotgun), {})
+            for item in hiero_sequence.videoTracks()[0].items()[::10]:
+                item.trimOut(1)
+            shotgun.reset_counts()
+            properties["incrementalCut"] = True
+            start = time.time()
+
+        _export(items, export_root, stages, properties)
+
+        if dry_run:
+            # the plan is written to the cache location by default
+            (path,) = glob.glob(os.path.join(app.cache_location, "export_plans", "*.json"))
+            plan = ExportPlan.load(path)
+            planned = dict(shotgun.call_counts())
+            stages.run("ExportPlan.apply", plan.apply, app)
+
+        elapsed = time.time() - start
+    finally:
+        shutil.rmtree(export_root, ignore_errors=True)
+        if app is not None:
+            shutil.rmtree(app.cache_location, ignore_errors=True)
+
+    # startProcessing includes processTaskPreQueue, which is reported alone
+    stages.seconds["ShotgunShotProcessor.startProcessing"] -= stages.seconds[STAGES[0]]
+    stages.calls["ShotgunShotProcessor.startProcessing"] -= stages.calls[STAGES[0]]
+
+    print("%s shots, %s tracks, %s effects per track, %.3fs latency per call" % (
+        shot_count, track_count, effects_per_track, latency))
+    print("  %-45s %9s %9s" % ("stage", "seconds", "sg calls"))
+    others = sorted(s for s in stages.seconds if s not in STAGES)
+    for stage in STAGES + tuple(others):
+        print("  %-45s %9.3f %9d" % (stage, stages.seconds[stage], stages.calls[stage]))
+    print("  %-45s %9.3f %9d" % ("total", elapsed, sum(shotgun.call_counts().values())))
+
+    by_method = collections.Counter()
+    for ((method, entity_type), count) in shotgun.call_counts().items():
+        by_method[method] += count
+    print("  calls by method: %s" % (", ".join("%s %s" % m for m in sorted(by_method.items())),))
+    if plan is not None:
+        writes = sum(count for ((method, entity_type), count) in planned.items()
+                     if method not in ("find", "find_one", "schema_field_read"))
+        print("  planned %s writes with %s Shotgun writes made while planning:" % (len(plan), writes))
+        for line in plan.summary()[1:]:
+            print("    %s" % (line,))
+    # each transcode task also updates its CutItem with its Version
+    cut_writes = sorted((request_type, entity_type, count) for ((request_type, entity_type), count)
+                        in shotgun.request_counts().items() if entity_type in ("Cut", "CutItem"))
+    print("  cut writes: %s" % (", ".join("%s %s %s" % w for w in cut_writes) or "none",))
+    print("  shots: %s, versions: %s, cut items: %s, folder creation calls: %s" % (
+        len(shotgun.entities("Shot")), len(shotgun.entities("Version")),
+        len(shotgun.entities("CutItem")), tk.filesystem_calls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of a Shotgun shot export.")
+    parser.add_argument("shot_counts", metavar="shot count", type=int, nargs="*", default=[100, 1000, 5000])
+    parser.add_argument("--latency", type=float, default=0.0, help="the seconds each Shotgun call takes")
+    parser.add_argument("--tracks", type=int, default=1, help="the number of video tracks")
+    parser.add_argument("--effects", type=int, default=0, help="the number of soft effects on each track")
+    parser.add_argument("--dry-run", action="store_true", help="plan the export, then apply the plan")
+    parser.add_argument("--recut", action="store_true", help="export a re-cut of an exported sequence")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log the app's debug messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+
+    for shot_count in args.shot_counts:
+        run(shot_count, args.tracks, args.effects, args.latency, args.dry_run, args.recut)
+
+
+if __name__ == "__main__":
+    main()
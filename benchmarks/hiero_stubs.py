@@ -0,0 +1,977 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Stand-ins for the hiero.core, hiero.ui and hiero.exporters modules, and for
+the nuke module of NukeStudio, so that the exporter can be run outside of
+Hiero by the benchmarks.
+
+The timeline classes implement the methods the exporter and its hooks call,
+and build_sequence generates synthetic sequences from them. The exporter
+base classes do just enough for the Shotgun tasks built on them to run: the
+shot processor creates a task of each preset in the export template for
+every track item, and the transcode task writes a placeholder file in place
+of rendering.
+
+Call install() before importing the app.
+"""
+
+import os
+import sys
+import uuid
+import types
+import logging
+
+
+# timeline
+
+class TimeBase(object):
+    """Stand-in for a hiero.core.TimeBase."""
+
+    def __init__(self, fps):
+        self._fps = fps
+
+    def toFloat(self):
+        return float(self._fps)
+
+    def isValid(self):
+        return True
+
+
+class Format(object):
+    """Stand-in for a hiero.core.Format."""
+
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+
+class _Image(object):
+    """Stand-in for the QImage of a rendered frame."""
+
+    def __init__(self, key):
+        self._key = key
+
+    def scaledToWidth(self, width, mode=None):
+        return _Image("%s@%s" % (self._key, width))
+
+    def save(self, buffer, format):
+        buffer.write("%s:%s" % (format, self._key))
+        return True
+
+
+class _Metadata(object):
+    """Stand-in for the metadata of a tag."""
+
+    def __init__(self, values):
+        self._values = dict(values)
+
+    def hasKey(self, key):
+        return key in self._values
+
+    def keys(self):
+        return list(self._values.keys())
+
+    def value(self, key):
+        return self._values[key]
+
+    def setValue(self, key, value):
+        self._values[key] = value
+
+
+class Tag(object):
+    """Stand-in for a hiero.core.Tag."""
+
+    def __init__(self, name, metadata=None):
+        if isinstance(name, Tag):
+            (name, metadata) = (name.name(), dict((k, name.metadata().value(k)) for k in name.metadata().keys()))
+        self._name = name
+        self._guid = str(uuid.uuid4())
+        self._metadata = _Metadata(metadata or {})
+
+    def name(self):
+        return self._name
+
+    def guid(self):
+        return self._guid
+
+    def metadata(self):
+        return self._metadata
+
+
+class _FileInfo(object):
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def filename(self):
+        return self._filename
+
+
+class MediaSource(object):
+    """Stand-in for a hiero.core.MediaSource."""
+
+    def __init__(self, path):
+        self._path = path
+
+    def isMediaPresent(self):
+        return True
+
+    def fileinfos(self):
+        return [_FileInfo(self._path)]
+
+
+class _Taggable(object):
+
+    def tags(self):
+        return list(self._tags)
+
+    def addTag(self, tag):
+        self._tags.append(tag)
+
+
+class SequenceBase(_Taggable):
+    """Stand-in for a hiero.core.SequenceBase."""
+
+    def __init__(self, name, fps=24, duration=0):
+        self._name = name
+        self._guid = str(uuid.uuid4())
+        self._framerate = TimeBase(fps)
+        self._duration = duration
+        self._format = Format(1920, 1080)
+        self._posterFrame = 0
+        self._tags = []
+
+    def name(self):
+        return self._name
+
+    def guid(self):
+        return self._guid
+
+    def framerate(self):
+        return self._framerate
+
+    def setFramerate(self, framerate):
+        self._framerate = framerate
+
+    def duration(self):
+        return self._duration
+
+    def format(self):
+        return self._format
+
+    def setFormat(self, format):
+        self._format = format
+
+    def posterFrame(self):
+        return self._posterFrame
+
+    def setPosterFrame(self, frame):
+        self._posterFrame = frame
+
+    def thumbnail(self, frame):
+        return _Image("%s:%s" % (self._guid, frame))
+
+
+class Clip(SequenceBase):
+    """Stand-in for a hiero.core.Clip of file based media."""
+
+    def __init__(self, name, duration, fps=24, timecode_start=0):
+        SequenceBase.__init__(self, name, fps, duration)
+        self._timecodeStart = timecode_start
+        self._mediaSource = MediaSource("/media/%s.####.exr" % (name,))
+
+    def timecodeStart(self):
+        return self._timecodeStart
+
+    def mediaSource(self):
+        return self._mediaSource
+
+
+class Sequence(SequenceBase):
+    """Stand-in for a hiero.core.Sequence."""
+
+    def __init__(self, name, fps=24, timecode_start=86400):
+        SequenceBase.__init__(self, name, fps)
+        self._timecodeStart = timecode_start
+        self._dropFrame = False
+        self._videoTracks = []
+
+    def videoTracks(self):
+        return list(self._videoTracks)
+
+    def audioTracks(self):
+        return []
+
+    def items(self):
+        return self.videoTracks()
+
+    def addTrack(self, track):
+        track._parent = self
+        track._index = len(self._videoTracks)
+        self._videoTracks.append(track)
+
+    def duration(self):
+        return max([t.items()[-1].timelineOut() + 1 for t in self._videoTracks if t.items()] or [0])
+
+    def timecodeStart(self):
+        return self._timecodeStart
+
+    def setTimecodeStart(self, timecode_start):
+        self._timecodeStart = timecode_start
+
+    def dropFrame(self):
+        return self._dropFrame
+
+    def setDropFrame(self, drop_frame):
+        self._dropFrame = drop_frame
+
+    def inTime(self):
+        raise RuntimeError("No in time set")
+
+    def outTime(self):
+        raise RuntimeError("No out time set")
+
+
+class VideoTrack(_Taggable):
+    """Stand-in for a hiero.core.VideoTrack, holding track items and soft
+    effects."""
+
+    def __init__(self, name):
+        self._name = name
+        self._guid = str(uuid.uuid4())
+        self._items = []
+        self._subTrackItems = []
+        self._tags = []
+        self._parent = None
+        self._index = 0
+
+    def name(self):
+        return self._name
+
+    def guid(self):
+        return self._guid
+
+    def parent(self):
+        return self._parent
+
+    def trackIndex(self):
+        return self._index
+
+    def isBlendEnabled(self):
+        return False
+
+    def items(self):
+        return list(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def addItem(self, item):
+        item._track = self
+        self._items.append(item)
+
+    def subTrackItems(self):
+        # hiero builds new lists on every call
+        return [list(items) for items in self._subTrackItems]
+
+    def addSubTrackItem(self, item, index):
+        while len(self._subTrackItems) <= index:
+            self._subTrackItems.append([])
+        item._track = self
+        self._subTrackItems[index].append(item)
+
+
+class TrackItem(_Taggable):
+    """Stand-in for a hiero.core.TrackItem."""
+
+    class MediaType(object):
+        kVideo = 1
+        kAudio = 2
+
+    def __init__(self, name, clip, timeline_in, source_in, duration):
+        self._name = name
+        self._guid = str(uuid.uuid4())
+        self._clip = clip
+        self._timelineIn = timeline_in
+        self._sourceIn = source_in
+        self._duration = duration
+        self._tags = []
+        self._track = None
+
+    def name(self):
+        return self._name
+
+    def guid(self):
+        return self._guid
+
+    def source(self):
+        return self._clip
+
+    def parent(self):
+        return self._track
+
+    def parentTrack(self):
+        return self._track
+
+    def parentSequence(self):
+        return self._track.parent()
+
+    def sequence(self):
+        return self._track.parent()
+
+    def timelineIn(self):
+        return self._timelineIn
+
+    def timelineOut(self):
+        return self._timelineIn + self._duration - 1
+
+    def sourceIn(self):
+        return float(self._sourceIn)
+
+    def sourceOut(self):
+        return float(self._sourceIn + self._duration - 1)
+
+    def sourceDuration(self):
+        return float(self._duration)
+
+    def duration(self):
+        return self._duration
+
+    def trimOut(self, frames):
+        """Move the out point of the item back by the given number of frames."""
+        self._duration -= frames
+
+    def playbackSpeed(self):
+        return 1.0
+
+    def handleInLength(self):
+        return self._sourceIn
+
+    def handleOutLength(self):
+        return self._clip.duration() - (self._sourceIn + self._duration)
+
+    def linkedItems(self):
+        return []
+
+    def mediaType(self):
+        return TrackItem.MediaType.kVideo
+
+    def isEnabled(self):
+        return True
+
+    def inTransition(self):
+        return None
+
+    def outTransition(self):
+        return None
+
+
+class EffectTrackItem(object):
+    """Stand-in for a hiero.core.EffectTrackItem, a soft effect."""
+
+    def __init__(self, name, timeline_in, timeline_out):
+        self._name = name
+        self._guid = str(uuid.uuid4())
+        self._timelineIn = timeline_in
+        self._timelineOut = timeline_out
+        self._track = None
+
+    def name(self):
+        return self._name
+
+    def guid(self):
+        return self._guid
+
+    def parentTrack(self):
+        return self._track
+
+    def timelineIn(self):
+        return self._timelineIn
+
+    def timelineOut(self):
+        return self._timelineOut
+
+    def isEnabled(self):
+        return True
+
+    def node(self):
+        return None
+
+    def linkedItems(self):
+        return []
+
+
+class Timecode(object):
+    """Stand-in for hiero.core.Timecode."""
+
+    kDisplayTimecode = 1
+    kDisplayDropFrameTimecode = 2
+
+    @staticmethod
+    def timeToString(frame, fps, displayType):
+        fps = float(fps)
+        rate = int(round(fps))
+        frame = int(frame)
+        separator = ":"
+        if displayType == Timecode.kDisplayDropFrameTimecode and rate in (30, 60):
+            # drop two frame numbers a minute (four at 60fps), except every
+            # tenth minute
+            drop = rate // 15
+            per_ten_minutes = rate * 600 - drop * 9
+            per_minute = rate * 60 - drop
+            (tens, remainder) = divmod(frame, per_ten_minutes)
+            frame += drop * 9 * tens
+            if remainder > drop:
+                frame += drop * ((remainder - drop) // per_minute)
+            separator = ";"
+        (seconds, frames) = divmod(frame, rate)
+        (minutes, seconds) = divmod(seconds, 60)
+        (hours, minutes) = divmod(minutes, 60)
+        return "%02d:%02d:%02d%s%02d" % (hours % 24, minutes, seconds, separator, frames)
+
+
+def build_sequence(name="ep101", shot_count=100, track_count=1, effects_per_track=0,
+                   tagged=True, shot_length=48, handle_length=24, scene_size=10, fps=24):
+    """
+    Returns a synthetic sequence.
+
+    Each track holds an item for every shot, named <name>_<scene>_<shot>, with
+    scene_size shots per scene. The items of the first track are tagged as
+    the hero plates, those of the other tracks as references. The soft
+    effects of each track are spread evenly along it, over two subtracks.
+
+    :param name: The name of the sequence, also used as the episode name.
+    :param shot_count: The number of shots.
+    :param track_count: The number of video tracks.
+    :param effects_per_track: The number of soft effects on each track.
+    :param tagged: Whether to tag the items with a status and element tag.
+    :param shot_length: The number of frames in each shot.
+    :param handle_length: The number of frames of each clip beyond the shot
+        on either side.
+    :param scene_size: The number of shots in each scene.
+    :param fps: The frame rate of the sequence and clips.
+    """
+    sequence = Sequence(name, fps)
+    status_tag = Tag("In Progress")
+    for track_index in range(track_count):
+        track = VideoTrack("Video %s" % (track_index + 1,))
+        sequence.addTrack(track)
+
+        for shot_index in range(shot_count):
+            shot_name = "%s_%03d_%04d" % (
+                name, shot_index // scene_size + 1, (shot_index % scene_size + 1) * 10)
+            clip = Clip("%s_%s" % (shot_name, track.name().replace(" ", "").lower()),
+                        shot_length + 2 * handle_length, fps, 3600 * fps)
+            item = TrackItem(shot_name, clip, shot_index * shot_length, handle_length, shot_length)
+            track.addItem(item)
+            if not tagged:
+                continue
+
+            hero = track_index == 0
+            item.addTag(status_tag)
+            item.addTag(Tag("Element", {
+                "cbsd_element_tag": "True",
+                "tag.element_type": "Plate" if hero else "Reference",
+                "tag.is_hero": str(hero),
+                "tag.version_base_name": shot_name.lower(),
+                "tag.cut_in_offset": str(handle_length),
+                "tag.cut_out_offset": str(handle_length + shot_length - 1),
+            }))
+
+        duration = shot_count * shot_length
+        for effect_index in range(effects_per_track):
+            start = effect_index * duration // effects_per_track
+            end = max(start, (effect_index + 1) * duration // effects_per_track - 1)
+            track.addSubTrackItem(EffectTrackItem("Grade%s" % (effect_index + 1,), start, end), effect_index % 2)
+
+    return sequence
+
+
+# exporters
+
+class TaskPresetBase(object):
+    """Stand-in for hiero.core.TaskPresetBase."""
+
+    kAllItems = 0
+
+    def __init__(self, parentType, name):
+        self._parentType = parentType
+        self._name = name
+        self._properties = {}
+
+    def name(self):
+        return self._name
+
+    def properties(self):
+        return self._properties
+
+    def parentType(self):
+        return self._parentType
+
+
+class _ResolveTable(object):
+    """Stand-in for the resolver of an export, mapping keywords to values."""
+
+    def __init__(self):
+        self._resolvers = []
+
+    def addResolver(self, keyword, description, resolver):
+        self._resolvers.append((keyword, resolver))
+
+    def resolve(self, task, path):
+        for (keyword, resolver) in self._resolvers:
+            if keyword in path:
+                path = path.replace(keyword, str(resolver(keyword, task)))
+        return path
+
+
+class _TaskGroup(object):
+
+    def __init__(self):
+        self._children = []
+
+    def children(self):
+        return list(self._children)
+
+    def addChild(self, child):
+        self._children.append(child)
+
+
+class Submission(_TaskGroup):
+    """Stand-in for the submission holding the task groups of an export.
+    The benchmark executes the tasks itself."""
+
+    def addToQueue(self):
+        pass
+
+
+class _ExportStructure(object):
+    """Stand-in for the export structure of a processor preset."""
+
+    def __init__(self, template):
+        self._elements = list(template)
+
+    def flatten(self):
+        return list(self._elements)
+
+    def restore(self, elements):
+        self._elements = list(elements)
+
+
+class ShotTask(object):
+    """Stand-in for hiero.exporters.FnShotExporter.ShotTask."""
+
+    def __init__(self, initDict):
+        self._item = initDict["item"]
+        self._preset = initDict["preset"]
+        self._project = initDict.get("project")
+        self._resolver = initDict.get("resolver") or _ResolveTable()
+        self._exportRoot = initDict.get("exportRoot", "")
+        self._exportPath = initDict.get("exportPath", "")
+        self._version = initDict.get("version", 1)
+        self._skipOffline = initDict.get("skipOffline", True)
+        self._cutHandles = initDict.get("cutHandles")
+        self._startFrame = initDict.get("startFrame")
+        self._retime = False
+        self._errors = []
+
+        if isinstance(self._item, TrackItem):
+            self._sequence = self._item.parentSequence()
+            self._clip = self._item.source()
+            self._source = self._clip.mediaSource()
+        else:
+            self._sequence = self._item
+            self._clip = self._item
+            self._source = None
+
+    def startTask(self):
+        pass
+
+    def taskStep(self):
+        return False
+
+    def finishTask(self):
+        pass
+
+    def forcedAbort(self):
+        pass
+
+    def progress(self):
+        return 1.0
+
+    def setError(self, error):
+        self._errors.append(error)
+
+    def error(self):
+        return "\n".join(self._errors)
+
+    def versionString(self):
+        return "v%03d" % (self._version,)
+
+    def clipName(self):
+        return self._clip.name()
+
+    def shotName(self):
+        return self._item.name()
+
+    def sequenceName(self):
+        return self._sequence.name()
+
+    def outputSequenceTime(self):
+        return False
+
+    def resolvedExportPath(self):
+        path = os.path.join(self._exportRoot, self._exportPath)
+        for (keyword, value) in (
+                ("{shot}", self.shotName()),
+                ("{clip}", self.clipName()),
+                ("{sequence}", self.sequenceName()),
+                ("{track}", self._item.parentTrack().name() if isinstance(self._item, TrackItem) else ""),
+                ("{version}", self.versionString()),
+                ("{ext}", self._preset.properties().get("file_type", ""))):
+            path = path.replace(keyword, value)
+        return self._resolver.resolve(self, path)
+
+    def inputRange(self, ignoreHandles=False, ignoreRetimes=True, clampToSource=True):
+        start = self._item.sourceIn()
+        end = self._item.sourceOut()
+        if self._cutHandles and not ignoreHandles:
+            start -= self._cutHandles
+            end += self._cutHandles
+            if clampToSource:
+                start = max(0, start)
+                end = min(self._clip.duration() - 1, end)
+        return (start, end)
+
+
+class _Script(object):
+    """Stand-in for the nuke script built by a render task."""
+
+    def __init__(self):
+        self._nodes = []
+
+    def addNode(self, node):
+        self._nodes.append(node)
+
+
+class TranscodeExporter(ShotTask):
+    """Stand-in for hiero.exporters.FnTranscodeExporter.TranscodeExporter. The
+    rendered file is a placeholder written by taskStep."""
+
+    def __init__(self, initDict):
+        ShotTask.__init__(self, initDict)
+        self._script = _Script()
+
+    def buildScript(self):
+        pass
+
+    def startTask(self):
+        self.buildScript()
+
+    def taskStep(self):
+        path = self.resolvedExportPath()
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(path, "wb") as f:
+            f.write("%s\n" % (self._item.name(),))
+        return False
+
+    def writeAudio(self):
+        return False
+
+
+class TranscodePreset(TaskPresetBase):
+    """Stand-in for hiero.exporters.FnTranscodeExporter.TranscodePreset."""
+
+    def __init__(self, name, properties):
+        TaskPresetBase.__init__(self, TranscodeExporter, name)
+        self._properties.update({
+            "file_type": "dpx",
+            "colourspace": "default",
+            "reformat": {"to_type": "None"},
+        })
+        self._properties.update(properties)
+
+
+class NukeShotExporter(ShotTask):
+    """Stand-in for hiero.exporters.FnNukeShotExporter.NukeShotExporter."""
+
+    kCollatedSequenceFrameOffset = 1000
+
+
+class NukeShotPreset(TaskPresetBase):
+    """Stand-in for hiero.exporters.FnNukeShotExporter.NukeShotPreset."""
+
+    def __init__(self, name, properties):
+        TaskPresetBase.__init__(self, NukeShotExporter, name)
+        self._properties.update(properties)
+
+
+class NukeRenderPreset(TaskPresetBase):
+    """Stand-in for hiero.exporters.FnExternalRender.NukeRenderPreset."""
+
+    def __init__(self, name, properties):
+        TaskPresetBase.__init__(self, None, name)
+        self._properties.update(properties)
+
+
+def createWriteNode(path, preset, nodeName, framerate=None, project=None):
+    """Stand-in for hiero.exporters.FnExternalRender.createWriteNode."""
+    return (nodeName, path)
+
+
+class AudioExportTask(ShotTask):
+    """Stand-in for hiero.exporters.FnAudioExportTask.AudioExportTask."""
+
+
+class AudioExportPreset(TaskPresetBase):
+    """Stand-in for hiero.exporters.FnAudioExportTask.AudioExportPreset."""
+
+    def __init__(self, name, properties):
+        TaskPresetBase.__init__(self, AudioExportTask, name)
+        self._properties.update(properties)
+
+
+class ShotProcessorPreset(object):
+    """Stand-in for hiero.exporters.FnShotProcessor.ShotProcessorPreset."""
+
+    def __init__(self, name, properties):
+        self._name = name
+        self._properties = {
+            "exportTemplate": (),
+            "exportRoot": "",
+            "cutLength": True,
+            "cutUseHandles": True,
+            "cutHandles": 12,
+            "startFrameSource": "Custom",
+            "startFrameIndex": 1001,
+        }
+        self._properties.update(properties)
+
+    def name(self):
+        return self._name
+
+    def properties(self):
+        return self._properties
+
+    def addUserResolveEntries(self, resolver):
+        pass
+
+
+class ShotProcessor(object):
+    """Stand-in for hiero.exporters.FnShotProcessor.ShotProcessor.
+
+    startProcessing creates a task of each preset in the export template for
+    every track item exported, then pre-processes them. The tasks are left
+    for the caller to execute.
+    """
+
+    def __init__(self, preset, submission=None, synchronous=False):
+        self._preset = preset
+        self._submission = submission or Submission()
+        self._synchronous = synchronous
+        self._exportTemplate = _ExportStructure(preset.properties()["exportTemplate"])
+
+    def startProcessing(self, exportItems, preview=False):
+        properties = self._preset.properties()
+        resolver = _ResolveTable()
+        self._preset.addUserResolveEntries(resolver)
+
+        cutHandles = None
+        startFrame = None
+        if properties["cutLength"]:
+            if properties["cutUseHandles"]:
+                cutHandles = properties["cutHandles"]
+            if properties["startFrameSource"] == "Custom":
+                startFrame = properties["startFrameIndex"]
+
+        tasks = []
+        for item in exportItems:
+            group = _TaskGroup()
+            for (path, preset) in self._exportTemplate.flatten():
+                if preset is None or preset.parentType() is None:
+                    continue
+                task = preset.parentType()({
+                    "item": item,
+                    "preset": preset,
+                    "resolver": resolver,
+                    "exportRoot": properties["exportRoot"],
+                    "exportPath": path,
+                    "submission": self._submission,
+                    "cutHandles": cutHandles,
+                    "startFrame": startFrame,
+                })
+                group.addChild(task)
+                tasks.append(task)
+            self._submission.addChild(group)
+
+        if preview:
+            return tasks
+
+        self.processTaskPreQueue()
+        self._submission.addToQueue()
+
+    def processTaskPreQueue(self):
+        pass
+
+
+class _UI(object):
+    """Stand-in for the base classes of the export UIs."""
+
+    def __init__(self, preset):
+        self._preset = preset
+
+    def populateUI(self, *args, **kwargs):
+        pass
+
+
+def findEffectsAnnotationsForTrackItems(trackItems):
+    """Stand-in for hiero.exporters.FnEffectHelpers, returning the soft effects
+    overlapping the items on their tracks."""
+    effects = []
+    for item in trackItems:
+        for subTrackItems in item.parentTrack().subTrackItems():
+            for effect in subTrackItems:
+                if effect.timelineIn() <= item.timelineOut() and effect.timelineOut() >= item.timelineIn():
+                    effects.append(effect)
+    return (effects, [])
+
+
+class _Registry(object):
+    """Stand-in for the task and UI registries."""
+
+    def __init__(self):
+        self.registered = []
+        self._defaultPresets = lambda overwrite: None
+
+    def __getattr__(self, name):
+        if name.startswith("register") or name.endswith("ProcessorPreset"):
+            return lambda *args: self.registered.append((name, args))
+        raise AttributeError(name)
+
+    def setDefaultPresets(self, function):
+        self._defaultPresets = function
+
+    def localPresets(self):
+        return []
+
+
+class _UIPropertyFactory(object):
+
+    @staticmethod
+    def create(*args, **kwargs):
+        return None
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """
+    Install the stand-in modules in sys.modules, unless Hiero is available.
+    """
+    if "hiero" in sys.modules:
+        return
+
+    log = logging.getLogger("hiero")
+
+    core_names = dict(
+        TimeBase=TimeBase,
+        Format=Format,
+        Tag=Tag,
+        MediaSource=MediaSource,
+        SequenceBase=SequenceBase,
+        Clip=Clip,
+        Sequence=Sequence,
+        VideoTrack=VideoTrack,
+        TrackItem=TrackItem,
+        EffectTrackItem=EffectTrackItem,
+        Timecode=Timecode,
+        TaskPresetBase=TaskPresetBase,
+    )
+    core = _module(
+        "hiero.core",
+        __all__=sorted(core_names),
+        log=log,
+        taskRegistry=_Registry(),
+        events=_module("hiero.core.events", registerInterest=lambda *args: None),
+        FnExporterBase=_module("hiero.core.FnExporterBase"),
+        FnNukeHelpers=_module("hiero.core.FnNukeHelpers", offsetNodeAnimationFrames=lambda node, offset: None),
+        nuke=_module("hiero.core.nuke", ReformatNode=type("ReformatNode", (object,), {"kDisabled": 0})),
+        **core_names
+    )
+
+    ui = _module(
+        "hiero.ui",
+        taskUIRegistry=_Registry(),
+        registeredActions=lambda: [],
+        FnUIProperty=_module("hiero.ui.FnUIProperty", UIPropertyFactory=_UIPropertyFactory),
+    )
+
+    exporters = _module(
+        "hiero.exporters",
+        FnShotProcessor=_module(
+            "hiero.exporters.FnShotProcessor",
+            ShotProcessor=ShotProcessor, ShotProcessorPreset=ShotProcessorPreset),
+        FnShotProcessorUI=_module(
+            "hiero.exporters.FnShotProcessorUI", ShotProcessorUI=type("ShotProcessorUI", (_UI,), {})),
+        FnShotExporter=_module("hiero.exporters.FnShotExporter", ShotTask=ShotTask),
+        FnTranscodeExporter=_module(
+            "hiero.exporters.FnTranscodeExporter",
+            TranscodeExporter=TranscodeExporter, TranscodePreset=TranscodePreset),
+        FnTranscodeExporterUI=_module(
+            "hiero.exporters.FnTranscodeExporterUI",
+            TranscodeExporterUI=type("TranscodeExporterUI", (_UI,), {})),
+        FnExternalRender=_module(
+            "hiero.exporters.FnExternalRender",
+            NukeRenderPreset=NukeRenderPreset, createWriteNode=createWriteNode),
+        FnNukeShotExporter=_module(
+            "hiero.exporters.FnNukeShotExporter",
+            NukeShotExporter=NukeShotExporter, NukeShotPreset=NukeShotPreset),
+        FnNukeShotExporterUI=_module(
+            "hiero.exporters.FnNukeShotExporterUI",
+            NukeShotExporterUI=type("NukeShotExporterUI", (_UI,), {})),
+        FnAudioExportTask=_module(
+            "hiero.exporters.FnAudioExportTask",
+            AudioExportTask=AudioExportTask, AudioExportPreset=AudioExportPreset),
+        FnAudioExportUI=_module(
+            "hiero.exporters.FnAudioExportUI", AudioExportUI=type("AudioExportUI", (_UI,), {})),
+        FnEffectHelpers=_module(
+            "hiero.exporters.FnEffectHelpers",
+            findEffectsAnnotationsForTrackItems=findEffectsAnnotationsForTrackItems),
+    )
+
+    _module("hiero", core=core, ui=ui, exporters=exporters)
+
+    # NukeStudio 11.3v1
+    _module(
+        "nuke",
+        NUKE_VERSION_MAJOR=11,
+        NUKE_VERSION_MINOR=3,
+        NUKE_VERSION_RELEASE=1,
+        WRITE_NON_DEFAULT_ONLY=1,
+        TO_SCRIPT=2,
+        TO_VALUE=4,
+    )
@@ -0,0 +1,434 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+An in-process stand-in for a Shotgun site, in the spirit of mockgun, used by
+the benchmarks. Entities are kept in memory and each API call sleeps for a
+configurable latency to mimic the round trip to a real site. The calls made
+are counted by method and entity type.
+
+Only the parts of the API used by the exporter are implemented: find,
+find_one, create, update, delete, batch, upload, upload_thumbnail and
+share_thumbnail, with the filter operators the exporter and its hooks use.
+"""
+
+import copy
+import time
+import datetime
+import threading
+import collections
+
+
+class _ServerCaps(object):
+    """Stand-in for the server capabilities of a Shotgun connection."""
+
+    def __init__(self, version):
+        self.version = version
+
+
+class MockShotgun(object):
+    """
+    In-memory Shotgun site.
+
+    Setting the ``task_template`` of an entity creates a Task for each of the
+    Steps listed in the ``steps`` field of the TaskTemplate, standing in for
+    the tasks Shotgun creates from the template.
+    """
+
+    def __init__(self, latency=0.0, server_version=(7, 0, 0)):
+        """
+        :param latency: The seconds each API call takes, either a number or a
+            dictionary keyed by method name with an optional "default" key.
+        :param server_version: The version reported by ``server_caps``.
+        """
+        self.latency = latency
+        self.server_caps = _ServerCaps(server_version)
+        self._entities = {}
+        # the ids of the entities linking to each entity, keyed by
+        # (entity type, field, linked type, linked id), to find by link
+        # without scanning all of the entities of a type
+        self._links = collections.defaultdict(set)
+        self._next_id = collections.defaultdict(lambda: 1)
+        self._lock = threading.RLock()
+        self._calls = collections.Counter()
+        self._requests = collections.Counter()
+
+    def add(self, entity_type, data):
+        """
+        Add an entity to the site without counting a call, to set up the
+        data a benchmark starts with. Returns the entity.
+        """
+        with self._lock:
+            return dict(self._create(entity_type, data), type=entity_type)
+
+    def call_counts(self):
+        """
+        Returns a dictionary of the number of API calls made, keyed by
+        (method, entity type). The entity type is None for calls that aren't
+        made on a single type, such as batch.
+        """
+        with self._lock:
+            return dict(self._calls)
+
+    def request_counts(self):
+        """
+        Returns a dictionary of the number of requests made, keyed by
+        (request type, entity type), counting each request of a batch.
+        """
+        with self._lock:
+            return dict(self._requests)
+
+    def reset_counts(self):
+        """Forget the calls and requests counted so far."""
+        with self._lock:
+            self._calls.clear()
+            self._requests.clear()
+
+    def entities(self, entity_type):
+        """Returns copies of all of the entities of the given type."""
+        with self._lock:
+            return [dict(copy.deepcopy(e), type=entity_type) for e in self._entities.get(entity_type, {}).values()]
+
+    # the API methods
+
+    def find(self, entity_type, filters, fields=None, order=None,
+             filter_operator=None, limit=0, retired_only=False, page=0,
+             include_archived_projects=True, additional_filter_presets=None):
+        self._call("find", entity_type)
+        with self._lock:
+            return self._find(entity_type, filters, fields, order, filter_operator, limit)
+
+    def find_one(self, entity_type, filters, fields=None, order=None,
+                 filter_operator=None, retired_only=False,
+                 include_archived_projects=True, additional_filter_presets=None):
+        self._call("find_one", entity_type)
+        with self._lock:
+            entities = self._find(entity_type, filters, fields, order, filter_operator, 1)
+        if entities:
+            return entities[0]
+        return None
+
+    def create(self, entity_type, data, return_fields=None):
+        self._call("create", entity_type)
+        with self._lock:
+            return self._create_request(entity_type, data, return_fields)
+
+    def update(self, entity_type, entity_id, data, multi_entity_update_modes=None):
+        self._call("update", entity_type)
+        with self._lock:
+            return self._update_request(entity_type, entity_id, data)
+
+    def delete(self, entity_type, entity_id):
+        self._call("delete", entity_type)
+        with self._lock:
+            return self._delete_request(entity_type, entity_id)
+
+    def batch(self, requests):
+        self._call("batch", None)
+        results = []
+        with self._lock:
+            for request in requests:
+                request_type = request["request_type"]
+                entity_type = request["entity_type"]
+                if request_type == "create":
+                    results.append(self._create_request(
+                        entity_type, request["data"], request.get("return_fields")))
+                elif request_type == "update":
+                    results.append(self._update_request(
+                        entity_type, request["entity_id"], request["data"]))
+                elif request_type == "delete":
+                    results.append(self._delete_request(entity_type, request["entity_id"]))
+                else:
+                    raise ValueError("Invalid request_type '%s' in batch request" % (request_type,))
+        return results
+
+    def upload(self, entity_type, entity_id, path, field_name=None, display_name=None, tag_list=None):
+        self._call("upload", entity_type)
+        with self._lock:
+            entity = self._get(entity_type, entity_id)
+            if field_name:
+                entity[field_name] = {"name": display_name or path, "link_type": "upload"}
+            return self._next("Attachment")
+
+    def upload_thumbnail(self, entity_type, entity_id, path, **kwargs):
+        self._call("upload_thumbnail", entity_type)
+        with self._lock:
+            self._get(entity_type, entity_id)["image"] = path
+            return self._next("Attachment")
+
+    def share_thumbnail(self, entities, thumbnail_path=None, source_entity=None,
+                        filmstrip_thumbnail=False, **kwargs):
+        self._call("share_thumbnail", None)
+        with self._lock:
+            image = thumbnail_path
+            if source_entity is not None:
+                image = self._get(source_entity["type"], source_entity["id"]).get("image")
+                if image is None:
+                    raise ValueError("%s %s has no thumbnail to share" % (
+                        source_entity["type"], source_entity["id"]))
+            for entity in entities:
+                self._get(entity["type"], entity["id"])["image"] = image
+            return self._next("Attachment")
+
+    # implementation
+
+    def _call(self, method, entity_type):
+        """
+        Count a call and wait for the latency of the method.
+        """
+        with self._lock:
+            self._calls[(method, entity_type)] += 1
+
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(method, latency.get("default", 0.0))
+        if latency:
+            time.sleep(latency)
+
+    def _next(self, entity_type):
+        entity_id = self._next_id[entity_type]
+        self._next_id[entity_type] += 1
+        return entity_id
+
+    def _get(self, entity_type, entity_id):
+        try:
+            return self._entities[entity_type][entity_id]
+        except KeyError:
+            raise ValueError("%s %s does not exist" % (entity_type, entity_id))
+
+    def _create(self, entity_type, data):
+        now = datetime.datetime.now()
+        entity = dict((k, _link(v)) for (k, v) in data.items())
+        entity["id"] = self._next(entity_type)
+        entity.setdefault("created_at", now)
+        entity["updated_at"] = now
+        self._entities.setdefault(entity_type, {})[entity["id"]] = entity
+        self._index(entity_type, entity, True)
+        if entity.get("task_template"):
+            self._apply_task_template(entity_type, entity)
+        return entity
+
+    def _create_request(self, entity_type, data, return_fields):
+        self._requests[("create", entity_type)] += 1
+        entity = self._create(entity_type, data)
+        result = self._fields(entity_type, entity, list(data.keys()) + list(return_fields or []))
+        return result
+
+    def _update_request(self, entity_type, entity_id, data):
+        self._requests[("update", entity_type)] += 1
+        entity = self._get(entity_type, entity_id)
+        template = entity.get("task_template")
+        self._index(entity_type, entity, False)
+        entity.update((k, _link(v)) for (k, v) in data.items())
+        self._index(entity_type, entity, True)
+        entity["updated_at"] = datetime.datetime.now()
+        if entity.get("task_template") and not _equal(template, entity["task_template"]):
+            self._apply_task_template(entity_type, entity)
+        return self._fields(entity_type, entity, data.keys())
+
+    def _delete_request(self, entity_type, entity_id):
+        self._requests[("delete", entity_type)] += 1
+        entity = self._entities.get(entity_type, {}).pop(entity_id, None)
+        if entity is None:
+            return False
+        self._index(entity_type, entity, False)
+        return True
+
+    def _index(self, entity_type, entity, add):
+        """
+        Add the links of the entity to the link index, or remove them.
+        """
+        for (field, value) in entity.items():
+            for linked in value if isinstance(value, list) else [value]:
+                if isinstance(linked, dict) and "type" in linked and "id" in linked:
+                    ids = self._links[(entity_type, field, linked["type"], linked["id"])]
+                    if add:
+                        ids.add(entity["id"])
+                    else:
+                        ids.discard(entity["id"])
+
+    def _candidates(self, entity_type, filters, operator):
+        """
+        Returns the entities that may match the filters: those with the
+        fewest matches of the "is" and "in" filters on ids and links when
+        all of the filters must match, or else all of the entities.
+        """
+        entities = self._entities.get(entity_type, {})
+        candidates = None
+        if operator in ("all", "and") and not isinstance(filters, dict):
+            for f in filters:
+                if isinstance(f, dict) or len(f) != 3 or f[1] not in ("is", "in"):
+                    continue
+                values = [f[2]] if f[1] == "is" else f[2]
+                if f[0] == "id":
+                    ids = set(values)
+                elif values and all(isinstance(v, dict) and "id" in v for v in values):
+                    ids = set()
+                    for v in values:
+                        ids.update(self._links.get((entity_type, f[0], v["type"], v["id"]), ()))
+                else:
+                    continue
+                if candidates is None or len(ids) < len(candidates):
+                    candidates = ids
+        if candidates is None:
+            return list(entities.values())
+        return [entities[i] for i in candidates if i in entities]
+
+    def _apply_task_template(self, entity_type, entity):
+        """
+        Create the Tasks of the entity's task template.
+        """
+        template = self._entities.get("TaskTemplate", {}).get(entity["task_template"]["id"])
+        for step in (template or {}).get("steps") or []:
+            self._create("Task", {
+                "content": self._value({"step": step}, "step.Step.code", "Task"),
+                "step": step,
+                "entity": {"type": entity_type, "id": entity["id"]},
+                "project": entity.get("project"),
+            })
+
+    def _find(self, entity_type, filters, fields, order, filter_operator, limit):
+        self._requests[("find", entity_type)] += 1
+        operator = filter_operator or "all"
+        prepared = _prepare(filters)
+        entities = [
+            e for e in self._candidates(entity_type, filters, operator)
+            if self._matches(entity_type, e, prepared, operator)
+        ]
+        entities.sort(key=lambda e: e["id"])
+        for item in reversed(order or []):
+            entities.sort(
+                key=lambda e: self._value(e, item["field_name"], entity_type),
+                reverse=item.get("direction", "asc") == "desc",
+            )
+        if limit:
+            entities = entities[:limit]
+        return [self._fields(entity_type, e, fields or []) for e in entities]
+
+    def _fields(self, entity_type, entity, fields):
+        """
+        Returns a copy of the entity with the requested fields.
+        """
+        result = {"type": entity_type, "id": entity["id"]}
+        for field in fields:
+            result[field] = copy.deepcopy(self._value(entity, field, entity_type))
+        return result
+
+    def _value(self, entity, field, entity_type):
+        """
+        Returns the value of a field of the entity, following the links of
+        deep fields such as "sg_sequence.Sequence.code".
+        """
+        if field == "type":
+            return entity_type
+        parts = field.split(".")
+        value = entity.get(parts[0])
+        while len(parts) > 1:
+            if not isinstance(value, dict) or value.get("type") != parts[1]:
+                return None
+            linked = self._entities.get(parts[1], {}).get(value["id"])
+            if linked is None:
+                return None
+            value = linked.get(parts[2])
+            parts = parts[2:]
+        return value
+
+    def _matches(self, entity_type, entity, filters, operator):
+        if isinstance(filters, dict):
+            return self._matches(entity_type, entity, filters["filters"], filters.get("filter_operator", "all"))
+        results = (self._match(entity_type, entity, f) for f in filters)
+        if operator in ("all", "and"):
+            return all(results)
+        return any(results)
+
+    def _match(self, entity_type, entity, filter):
+        if isinstance(filter, dict):
+            return self._matches(entity_type, entity, filter["filters"], filter.get("filter_operator", "all"))
+
+        (field, operator) = filter[:2]
+        value = filter[2] if len(filter) == 3 else filter[2:]
+        actual = self._value(entity, field, entity_type)
+        actuals = actual if isinstance(actual, list) else [actual]
+
+        if operator == "is":
+            return any(_equal(a, value) for a in actuals)
+        if operator == "is_not":
+            return not any(_equal(a, value) for a in actuals)
+        if operator == "in":
+            return any(_key(a) in value for a in actuals)
+        if operator == "not_in":
+            return not any(_key(a) in value for a in actuals)
+        if operator in ("contains", "not_contains"):
+            found = isinstance(actual, basestring) and value.lower() in actual.lower()
+            return found == (operator == "contains")
+        if operator == "starts_with":
+            return isinstance(actual, basestring) and actual.lower().startswith(value.lower())
+        if operator == "ends_with":
+            return isinstance(actual, basestring) and actual.lower().endswith(value.lower())
+        if operator == "greater_than":
+            return actual is not None and actual > value
+        if operator == "less_than":
+            return actual is not None and actual < value
+        raise NotImplementedError("The '%s' filter operator is not supported" % (operator,))
+
+
+def _link(value):
+    """
+    Returns the value stored for a field, keeping only the type and id of
+    linked entities.
+    """
+    if isinstance(value, dict) and "type" in value and "id" in value:
+        return {"type": value["type"], "id": value["id"]}
+    if isinstance(value, list):
+        return [_link(v) for v in value]
+    return copy.deepcopy(value)
+
+
+def _key(value):
+    """
+    Returns a key comparing as the value does in filters: entities by type
+    and id, and text ignoring case.
+    """
+    if isinstance(value, dict):
+        return ("entity", value.get("type"), value.get("id"))
+    if isinstance(value, basestring):
+        return value.lower()
+    return value
+
+
+def _prepare(filters):
+    """
+    Returns a copy of the filters in which the values of the "in" and
+    "not_in" filters are sets of keys, to look values up in.
+    """
+    if isinstance(filters, dict):
+        return dict(filters, filters=_prepare(filters["filters"]))
+    prepared = []
+    for f in filters:
+        if isinstance(f, dict):
+            prepared.append(_prepare(f))
+        elif f[1] in ("in", "not_in"):
+            values = f[2] if len(f) == 3 else f[2:]
+            prepared.append([f[0], f[1], frozenset(_key(v) for v in values)])
+        else:
+            prepared.append(f)
+    return prepared
+
+
+def _equal(value, filter_value):
+    """
+    Compare a field value with a filter value as Shotgun does: entities by
+    type and id, and text ignoring case.
+    """
+    if isinstance(value, dict) and isinstance(filter_value, dict):
+        return (value.get("type"), value.get("id")) == (filter_value.get("type"), filter_value.get("id"))
+    if isinstance(value, basestring) and isinstance(filter_value, basestring):
+        return value.lower() == filter_value.lower()
+    return value == filter_value
@@ -0,0 +1,114 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Compares looking up the subtrack index of every soft effect on a track with
+the _subTrackIndex scan against the index map used when building collated
+sequences.
+
+Hiero isn't required. The track and its effects are stand-ins implementing
+the few methods the lookups call. Run with:
+
+    python benchmarks/subtrack_index.py [effect count] [subtrack count]
+"""
+
+import os
+import sys
+import time
+import types
+import uuid
+
+# the module only needs hiero to be importable for these helpers
+sys.modules.setdefault("hiero", types.ModuleType("hiero"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "python", "tk_hiero_export"))
+
+import collating_exporter
+
+
+class _Effect(object):
+    """Stand-in for a hiero.core.EffectTrackItem."""
+
+    def __init__(self, track):
+        self._track = track
+        self._guid = str(uuid.uuid4())
+
+    def parentTrack(self):
+        return self._track
+
+    def guid(self):
+        return self._guid
+
+    def __eq__(self, other):
+        # hiero compares the wrapped items, so mimic a comparison that costs
+        # more than an identity check
+        return isinstance(other, _Effect) and self._guid == other._guid
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class _Track(object):
+    """Stand-in for a hiero.core.VideoTrack holding soft effects."""
+
+    def __init__(self, effect_count, subtrack_count):
+        self._guid = str(uuid.uuid4())
+        self._subtracks = [[] for i in range(subtrack_count)]
+        for i in range(effect_count):
+            self._subtracks[i % subtrack_count].append(_Effect(self))
+
+    def guid(self):
+        return self._guid
+
+    def subTrackItems(self):
+        # hiero builds new lists on every call
+        return [list(items) for items in self._subtracks]
+
+    def effects(self):
+        return [effect for items in self._subtracks for effect in items]
+
+
+class _Sequence(object):
+    """Stand-in for a hiero.core.Sequence. The effects' tracks aren't listed
+    as they're only mapped when an effect is looked up."""
+
+    def videoTracks(self):
+        return []
+
+
+def _time(func, effects):
+    start = time.time()
+    indexes = [func(effect) for effect in effects]
+    return (time.time() - start, indexes)
+
+
+def main():
+    effect_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    subtrack_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    track = _Track(effect_count, subtrack_count)
+    effects = track.effects()
+
+    (scan_time, scan_indexes) = _time(collating_exporter._subTrackIndex, effects)
+
+    # a fresh index, as at the start of an export
+    index = collating_exporter._CollationIndex(_Sequence())
+    (map_time, map_indexes) = _time(index.subTrackIndex, effects)
+
+    assert scan_indexes == map_indexes
+
+    print("%s soft effects on %s subtracks" % (effect_count, subtrack_count))
+    print("  _subTrackIndex scan: %.4fs" % (scan_time,))
+    print("  subtrack index map:  %.4fs" % (map_time,))
+    if map_time:
+        print("  speedup:             %.1fx" % (scan_time / map_time,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Stand-ins for the parts of Toolkit (the tank and sgtk modules), Qt and the
+studio modules imported by the hooks, so that the app can be run outside of
+an engine by the benchmarks.
+
+The Application stand-in runs the app's hooks from the hooks folder and reads
+its settings from a dictionary. The Toolkit instance, context and engine hold
+the Shotgun connection, templates and entities the app is run with.
+
+Call install() before importing the app.
+"""
+
+import os
+import imp
+import sys
+import types
+import logging
+import tempfile
+
+
+class TankError(Exception):
+    pass
+
+
+class TankHookMethodDoesNotExistError(TankError):
+    pass
+
+
+class Hook(object):
+    """Stand-in for tank.Hook."""
+
+    def __init__(self, parent):
+        self.__parent = parent
+
+    @property
+    def parent(self):
+        return self.__parent
+
+
+class Template(object):
+    """
+    Stand-in for a Toolkit template. The definition is formatted with the
+    fields using the % operator, e.g. "%(version)03d".
+    """
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.definition = definition
+
+    def apply_fields(self, fields):
+        return self.definition % fields
+
+
+class Context(object):
+    """Stand-in for a Toolkit context."""
+
+    def __init__(self, project, entity=None, task=None):
+        self.project = project
+        self.entity = entity
+        self.task = task
+
+    def as_template_fields(self, template):
+        return {}
+
+
+class Toolkit(object):
+    """
+    Stand-in for a Toolkit instance, creating contexts and folders for the
+    entities of its Shotgun connection. The folders created are counted
+    rather than created.
+    """
+
+    def __init__(self, shotgun, templates=None):
+        self.shotgun = shotgun
+        self.templates = dict((t.name, t) for t in templates or [])
+        self.filesystem_calls = 0
+        self.filesystem_entities = 0
+
+    def create_filesystem_structure(self, entity_type, entity_ids):
+        self.filesystem_calls += 1
+        self.filesystem_entities += len(entity_ids)
+
+    def context_from_entity(self, entity_type, entity_id):
+        entity = self.shotgun.find_one(entity_type, [["id", "is", entity_id]], ["project"])
+        return Context(entity["project"], {"type": entity_type, "id": entity_id})
+
+
+class Engine(object):
+    """Stand-in for the Hiero engine."""
+
+    def __init__(self, tk, context):
+        self.tank = tk
+        self.sgtk = tk
+        self.context = context
+
+    def show_busy(self, title, message):
+        pass
+
+    def clear_busy(self):
+        pass
+
+
+class Application(object):
+    """
+    Stand-in for tank.platform.Application.
+
+    Hook settings hold the name of a file in the hooks folder. Each hook is
+    loaded once, and the Hook subclass it defines is instantiated for every
+    execute_hook_method call, as Toolkit does.
+    """
+
+    def __init__(self, engine, settings, hooks_folder):
+        self.engine = engine
+        self._settings = settings
+        self._hooks_folder = hooks_folder
+        self._hook_classes = {}
+        self.logger = logging.getLogger("tk-hiero-export")
+        self.cache_location = tempfile.mkdtemp(prefix="tk_hiero_export_cache_")
+        self.init_app()
+
+    def init_app(self):
+        pass
+
+    @property
+    def tank(self):
+        return self.engine.tank
+
+    @property
+    def sgtk(self):
+        return self.engine.sgtk
+
+    @property
+    def context(self):
+        return self.engine.context
+
+    @property
+    def shotgun(self):
+        return self.engine.tank.shotgun
+
+    def get_setting(self, key, default=None):
+        return self._settings.get(key, default)
+
+    def get_template(self, key):
+        return self.tank.templates.get(self.get_setting(key))
+
+    def create_hook_instance(self, hook_name, base_class=None):
+        hook_class = self._hook_classes.get(hook_name)
+        if hook_class is None:
+            path = os.path.join(self._hooks_folder, "%s.py" % (hook_name,))
+            module = imp.load_source("tk_hiero_export_hook_%s" % (hook_name,), path)
+            for value in vars(module).values():
+                if isinstance(value, type) and issubclass(value, Hook) and value.__module__ == module.__name__:
+                    hook_class = value
+            if hook_class is None:
+                raise TankError("No hook class found in %s" % (path,))
+            self._hook_classes[hook_name] = hook_class
+        return hook_class(self)
+
+    def execute_hook(self, key, **kwargs):
+        return self.execute_hook_method(key, "execute", **kwargs)
+
+    def execute_hook_method(self, key, method_name, base_class=None, **kwargs):
+        hook = self.create_hook_instance(self.get_setting(key), base_class)
+        try:
+            hook_method = getattr(hook, method_name)
+        except AttributeError:
+            raise TankHookMethodDoesNotExistError(
+                "Cannot execute hook '%s' - the hook method '%s' does not exist!" % (key, method_name))
+        return hook_method(**kwargs)
+
+    def log_debug(self, msg):
+        self.logger.debug(msg)
+
+    def log_info(self, msg):
+        self.logger.info(msg)
+
+    def log_warning(self, msg):
+        self.logger.warning(msg)
+
+    def log_error(self, msg):
+        self.logger.error(msg)
+
+    def log_metric(self, action, log_version=False):
+        pass
+
+
+def get_current_user(tk):
+    """Stand-in for tank.util.get_current_user."""
+    return tk.shotgun.find_one("HumanUser", [], ["name"])
+
+
+def register_publish(tk, context, path, name, version_number, **kwargs):
+    """Stand-in for tank.util.register_publish, creating a PublishedFile."""
+    data = {
+        "code": name,
+        "name": name,
+        "path": {"local_path": path},
+        "version_number": version_number,
+        "project": context.project,
+        "entity": context.entity,
+        "task": kwargs.get("task"),
+        "published_file_type": kwargs.get("published_file_type"),
+    }
+    return tk.shotgun.create("PublishedFile", data)
+
+
+def get_published_file_entity_type(tk):
+    """Stand-in for sgtk.util.get_published_file_entity_type."""
+    return "PublishedFile"
+
+
+class _QByteArray(object):
+
+    def __init__(self):
+        self._data = []
+
+    def data(self):
+        return "".join(self._data)
+
+
+class _QBuffer(object):
+
+    def __init__(self, byte_array):
+        self._byte_array = byte_array
+
+    def open(self, mode):
+        return True
+
+    def write(self, data):
+        self._byte_array._data.append(data)
+
+    def close(self):
+        pass
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """
+    Install the stand-in modules in sys.modules, unless Toolkit is available.
+    A yaml stand-in is installed only if PyYAML is missing.
+    """
+    if "tank" in sys.modules:
+        return
+
+    qt = _module(
+        "tank.platform.qt",
+        QtCore=_module(
+            "tank.platform.qt.QtCore",
+            QByteArray=_QByteArray,
+            QBuffer=_QBuffer,
+            QIODevice=type("QIODevice", (object,), {"WriteOnly": 2}),
+            Qt=type("Qt", (object,), {"SmoothTransformation": 1, "Checked": 2, "Unchecked": 0}),
+        ),
+        QtGui=_module("tank.platform.qt.QtGui"),
+    )
+    platform = _module("tank.platform", Application=Application, qt=qt)
+    errors = _module("tank.errors", TankError=TankError, TankHookMethodDoesNotExistError=TankHookMethodDoesNotExistError)
+    util = _module(
+        "tank.util",
+        get_current_user=get_current_user,
+        register_publish=register_publish,
+        get_published_file_entity_type=get_published_file_entity_type,
+    )
+    tank = _module(
+        "tank",
+        Hook=Hook,
+        TankError=TankError,
+        get_hook_baseclass=lambda: Hook,
+        platform=platform,
+        errors=errors,
+        util=util,
+        templatekey=_module("tank.templatekey"),
+    )
+
+    # sgtk is the same API under another name
+    sys.modules["sgtk"] = tank
+    for name in ("platform", "platform.qt", "errors", "util", "templatekey"):
+        sys.modules["sgtk.%s" % (name,)] = sys.modules["tank.%s" % (name,)]
+
+    _module("messaging", showError=lambda message: None)
+
+    tag_elements = _module("TagElements", TagElementsAction=type("TagElementsAction", (object,), {}))
+    tag_elements.constants = _module(
+        "TagElements.constants",
+        PLATE_TYPE=0,
+        REF_TYPE=1,
+        ELEMENT_TYPE_NAMES={0: "Plate", 1: "Reference"},
+    )
+
+    try:
+        import yaml
+    except ImportError:
+        _module("yaml", dump=repr)
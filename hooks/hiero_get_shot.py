@@ -8,6 +8,8 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+from collections import OrderedDict
+
 from tank import Hook
 
 #  CBSD Customization
@@ -33,6 +35,9 @@ class HieroGetShot(Hook):
     _default_delivery_format = None
     # ==============================
 
+    # maximum number of shot codes to look up in a single query
+    _prefetch_chunk_size = 200
+
     def execute(self, task, item, data, **kwargs):
         """
         Takes a hiero.core.TrackItem as input and returns a data dictionary for
@@ -45,33 +50,38 @@ class HieroGetShot(Hook):
         # shot parent field
         parent_field = "sg_sequence"
 
-        # grab shot from Shotgun
-        sg = self.parent.shotgun
-        filter = [
-            ["project", "is", self.parent.context.project],
-            [parent_field, "is", parent],
-            ["code", "is", item.name()],
-        ]
-
         # default the return fields to None to use the python-api default
         fields = kwargs.get("fields", None)
-        shots = sg.find("Shot", filter, fields=fields)
-        if len(shots) > 1:
-            # can not handle multiple shots with the same name
-            raise StandardError("Multiple shots named '%s' found", item.name())
-        if len(shots) == 0:
-            # create shot in shotgun
 
+        # grab shot from the prefetched cache if possible
+        shot = self._get_cached_shot(parent, item.name(), data, fields)
+
+        if shot is None:
+            # grab shot from Shotgun
+            sg = self.parent.shotgun
+            filter = [
+                ["project", "is", self.parent.context.project],
+                [parent_field, "is", parent],
+                ["code", "is", item.name()],
+            ]
+
+            shots = sg.find("Shot", filter, fields=fields)
+            if len(shots) > 1:
+                # can not handle multiple shots with the same name
+                raise StandardError("Multiple shots named '%s' found", item.name())
+            if len(shots) == 0:
+                # create shot in shotgun
+                shot_data = {
+                    "code": item.name(),
+                    parent_field: parent,
+                    "project": self.parent.context.project,
+                }
+                shot = sg.create("Shot", shot_data, return_fields=fields)
+                self.parent.log_info("Created Shot in Shotgun: %s" % shot_data)
+            else:
+                shot = shots[0]
 
-            shot_data = {
-                "code": item.name(),
-                parent_field: parent,
-                "project": self.parent.context.project,
-            }
-            shot = sg.create("Shot", shot_data, return_fields=fields)
-            self.parent.log_info("Created Shot in Shotgun: %s" % shot_data)
-        else:
-            shot = shots[0]
+            self._cache_shot(parent, item.name(), shot, data)
 
         # update the thumbnail for the shot
         upload_thumbnail = kwargs.get("upload_thumbnail", True)
@@ -95,18 +105,18 @@ class HieroGetShot(Hook):
         if shot['id'] not in self.__class__._processed_shot_ids:
             # make sure we create or get a scene to help sort our shots
             scene_code = self.get_scene_code(item.name())
-            scene = self.get_scene(scene_code)
+            scene = self.get_scene(scene_code, data)
             
             delivery_format = self.get_default_delivery_format()
             width = delivery_format['sg_width']
             height = delivery_format['sg_height']
             pixel_aspect_ratio = delivery_format['sg_pixel_aspect_ratio']
             
-            self.parent.shotgun.update("Shot", shot['id'], {'sg_scene': scene,
-                                                            'sg_width': width,
-                                                            'sg_height': height,
-                                                            'sg_pixel_aspect_ratio': pixel_aspect_ratio,
-                                                            })
+            self._update_shot(shot['id'], {'sg_scene': scene,
+                                           'sg_width': width,
+                                           'sg_height': height,
+                                           'sg_pixel_aspect_ratio': pixel_aspect_ratio,
+                                           }, data)
             self.__class__._processed_shot_ids.append(shot['id'])
 
         if item.guid() not in self.__class__._processed_items_guids:
@@ -123,10 +133,9 @@ class HieroGetShot(Hook):
                 source_timecode_in_num = item.sourceIn() + item.source().timecodeStart()
                 source_timecode_out_num = item.sourceOut() + item.source().timecodeStart()
 
-                self.parent.shotgun.update("Shot", shot['id'], {'sg_srcin_tc': str(source_timecode_in_num),
-                                                                'sg_srcout_tc': str(source_timecode_out_num),
-                                                                }
-                                           )
+                self._update_shot(shot['id'], {'sg_srcin_tc': str(source_timecode_in_num),
+                                               'sg_srcout_tc': str(source_timecode_out_num),
+                                               }, data)
             # 'Reference' or 'Plate' potential types for elements -- for reference transfer the timeline timecodes
             # to the Shot.
             element_type = self.parent.execute_hook_method("hook_resolve_custom_strings",
@@ -138,10 +147,9 @@ class HieroGetShot(Hook):
                 destination_timecode_in_num = item.timelineIn() + item.parentSequence().timecodeStart()
                 destination_timecode_out_num = item.timelineOut() + item.parentSequence().timecodeStart()
 
-                self.parent.shotgun.update("Shot", shot['id'], {'sg_dstin_tc': str(destination_timecode_in_num),
-                                                                'sg_dstout_tc': str(destination_timecode_out_num),
-                                                                }
-                                           )
+                self._update_shot(shot['id'], {'sg_dstin_tc': str(destination_timecode_in_num),
+                                               'sg_dstout_tc': str(destination_timecode_out_num),
+                                               }, data)
             self.__class__._processed_items_guids.append(item.guid())
 
         # ==============================
@@ -193,7 +201,7 @@ class HieroGetShot(Hook):
         ]
         # ==============================
 
-        parents = sg.find(par_entity_type, filter)
+        parents = self._find(par_entity_type, filter)
         if len(parents) > 1:
             # can not handle multiple parents with the same name
             raise StandardError(
@@ -208,6 +216,7 @@ class HieroGetShot(Hook):
                 "project": self.parent.context.project,
             }
             parent = sg.create(par_entity_type, par_data)
+            self._invalidate_cache(par_entity_type)
             self.parent.log_info(
                 "Created %s in Shotgun: %s" % (par_entity_type, par_data))
         else:
@@ -228,6 +237,178 @@ class HieroGetShot(Hook):
 
         return parent
 
+    def prefetch_shots(self, items, data, fields=None, **kwargs):
+        """
+        Given the Hiero items about to be exported, look up all of their Shots
+        with as few queries as possible and store them in the data cache so
+        that ``execute`` does not need to query Shotgun for each item.
+
+        Shots that do not exist yet are created with a single batch request.
+
+        :param items: A list of hiero.core.TrackItems driving shot creation.
+        :param data: A dictionary with cached shot data. This is typically the
+            app's `preprocess_data`.
+        :param fields: A list of Shot fields to query for each Shot.
+        """
+
+        sg = self.parent.shotgun
+        parent_field = "sg_sequence"
+        fields = list(set((fields or []) + ["code", parent_field]))
+
+        # group the shot codes by the parent entity they will be linked to
+        codes_by_parent = {}
+        parents = {}
+        for item in items:
+            parent = self.get_shot_parent(item.parentSequence(), data)
+            parent_key = (parent["type"], parent["id"])
+            parents[parent_key] = parent
+            codes = codes_by_parent.setdefault(parent_key, [])
+            if item.name() not in codes:
+                codes.append(item.name())
+
+        batch_data = []
+        batch_codes = []
+        for (parent_key, codes) in codes_by_parent.iteritems():
+            parent = parents[parent_key]
+
+            # query the existing shots in chunks to keep the filters sane.
+            # codes are matched ignoring case, as the "in" filter does.
+            shots_by_code = {}
+            for i in range(0, len(codes), self._prefetch_chunk_size):
+                filter = [
+                    ["project", "is", self.parent.context.project],
+                    [parent_field, "is", parent],
+                    ["code", "in", codes[i:i + self._prefetch_chunk_size]],
+                ]
+                for shot in self._find("Shot", filter, fields):
+                    shots_by_code.setdefault(shot["code"].lower(), []).append(shot)
+
+            # items whose names only differ by case share a shot, so a
+            # missing shot is only created once for all of them
+            missing_codes = OrderedDict()
+            for code in codes:
+                shots = shots_by_code.get(code.lower(), [])
+                if len(shots) == 1:
+                    self._cache_shot(parent, code, shots[0], data)
+                elif len(shots) == 0:
+                    missing_codes.setdefault(code.lower(), []).append(code)
+                # multiple shots with the same name are left out of the cache
+                # so that ``execute`` reports the problem for the item.
+
+            for item_codes in missing_codes.values():
+                batch_data.append({
+                    "request_type": "create",
+                    "entity_type": "Shot",
+                    "data": {
+                        "code": item_codes[0],
+                        parent_field: parent,
+                        "project": self.parent.context.project,
+                    },
+                    "return_fields": fields,
+                })
+                batch_codes.append((parent, item_codes))
+
+        if batch_data:
+            for (shot, (parent, item_codes)) in zip(sg.batch(batch_data), batch_codes):
+                for code in item_codes:
+                    self._cache_shot(parent, code, shot, data)
+                self.parent.log_info("Created Shot in Shotgun: %s" % shot["code"])
+
+        self.parent.log_debug(
+            "Prefetched %s Shots, created %s." %
+            (len(data.get("shots_by_id", {})), len(batch_data))
+        )
+
+        #  CBSD Customization
+        # ==============================
+        # the shots processed by ``execute`` are linked to their scene, so
+        # look those up at the same time.
+        self.prefetch_scenes(items, data)
+        # ==============================
+
+    def _find(self, entity_type, filters, fields=None):
+        """
+        Find entities through the app's entity cache, if it has one, so that
+        lookups made by earlier exports can be reused.
+        """
+        entity_cache = getattr(self.parent, "entity_cache", None)
+        return (entity_cache or self.parent.shotgun).find(entity_type, filters, fields)
+
+    def _find_one(self, entity_type, filters, fields=None):
+        """
+        Find an entity through the app's entity cache, if it has one.
+        """
+        entity_cache = getattr(self.parent, "entity_cache", None)
+        return (entity_cache or self.parent.shotgun).find_one(entity_type, filters, fields)
+
+    def _invalidate_cache(self, entity_type):
+        """
+        Drop the cached lookups of the entity type after creating one, so the
+        lookups made later in the export find it.
+        """
+        entity_cache = getattr(self.parent, "entity_cache", None)
+        if entity_cache:
+            entity_cache.invalidate(entity_type)
+
+    def _get_cached_shot(self, parent, shot_code, data, fields):
+        """
+        Return a copy of the cached shot for the given parent and code, or
+        None if it has not been cached.
+
+        Any requested fields missing from the cached shot are queried and
+        merged into the cache.
+        """
+
+        key = (parent["type"], parent["id"], shot_code)
+        shot_id = data.get("shot_ids_by_code", {}).get(key)
+        if shot_id is None:
+            return None
+
+        shot = data["shots_by_id"][shot_id]
+        fields = fields or []
+        missing_fields = [f for f in fields if f not in shot]
+        if missing_fields:
+            sg_shot = self.parent.shotgun.find_one("Shot", [["id", "is", shot_id]], missing_fields)
+            if sg_shot is None:
+                return None
+            shot.update(sg_shot)
+
+        # only return the requested fields, as a query would. callers are free
+        # to modify the returned dictionary.
+        return dict((f, shot[f]) for f in ["type", "id"] + fields)
+
+    def _cache_shot(self, parent, shot_code, shot, data):
+        """
+        Store the given shot in the data cache.
+
+        The cache is kept in two parts: ``shots_by_id`` holds the shot data and
+        can be updated by the callers that write to the shot, while
+        ``shot_ids_by_code`` maps a parent and shot code to the shot id.
+        """
+
+        data.setdefault("shots_by_id", {})[shot["id"]] = dict(shot)
+        key = (parent["type"], parent["id"], shot_code)
+        data.setdefault("shot_ids_by_code", {})[key] = shot["id"]
+
+    def _update_shot(self, shot_id, shot_data, data):
+        """
+        Update the given shot in Shotgun.
+
+        If the export provides an update buffer in the data cache, the update
+        is queued there to be committed in a batch with the other updates to
+        the shot. The cached copy of the shot is updated either way.
+        """
+
+        update_buffer = data.get("shot_update_buffer")
+        if update_buffer is None:
+            self.parent.shotgun.update("Shot", shot_id, shot_data)
+        else:
+            update_buffer.update("Shot", shot_id, shot_data)
+
+        cached_shot = data.get("shots_by_id", {}).get(shot_id)
+        if cached_shot is not None:
+            cached_shot.update(shot_data)
+
     #  CBSD Customization
     # ==============================
     def get_scene_code(self, shot_code):
@@ -255,41 +436,94 @@ class HieroGetShot(Hook):
                                   % self._cbsd_shot_convention_template)
                 raise
 
-        else:
-            scene_code = ''
-            match = self.__class__._cbsd_shot_convention_re.match(shot_code)
+        scene_code = ''
+        match = self.__class__._cbsd_shot_convention_re.match(shot_code)
 
-            if not match:
-                self.parent.logger.warning(
-                    "The Shot code, '%s' was not matched to the resolved shot convention: %s"
-                    % (shot_code, self.__class__._cbsd_shot_convention_re.pattern))
-            else:
-                scene_code = match.groupdict().get('scene')
-            return scene_code
+        if not match:
+            self.parent.logger.warning(
+                "The Shot code, '%s' was not matched to the resolved shot convention: %s"
+                % (shot_code, self.__class__._cbsd_shot_convention_re.pattern))
+        else:
+            scene_code = match.groupdict().get('scene')
+        return scene_code
 
-    def get_scene(self, scene_code):
+    def get_scene(self, scene_code, data=None):
         """
         Query shotgun for the scene with the corresponding code, and create one if necessary.
 
         @param scene_code - \b str - the scene code
-        @param shotgun - a Shotgun API instance
+        @param data - \b dict - the data cache, holding the scenes found by ``prefetch_scenes``
         @return \b scene_entity - \b dict - the Shotgun Scene entity matching the scene code.
         """
         if not scene_code:
             return
+
+        # scene codes are matched ignoring case, as Shotgun does
+        scenes = (data or {}).get("scenes_by_code")
+        if scenes is not None and scene_code.lower() in scenes:
+            return scenes[scene_code.lower()]
+
         self.parent.logger.debug("Checking Shotgun for Existing Scene, '%s'..." % scene_code)
-        scene_entities = self.parent.shotgun.find("Scene", [
+        scene_entities = self._find("Scene", [
             ['project', 'is', self.parent.context.project],
             ['code', 'is', scene_code]], ['code'])
 
         if not scene_entities:
             scene_entity = self.parent.shotgun.create("Scene", {'code': scene_code, 'project': self.parent.context.project})
+            self._invalidate_cache("Scene")
             self.parent.logger.debug("Scene not found. Created: %s" % scene_entity)
         else:
             scene_entity = scene_entities[0]
             self.parent.logger.debug("Scene found: %s" % scene_entity)
+
+        if scenes is not None:
+            scenes[scene_code.lower()] = scene_entity
         return scene_entity
 
+    def prefetch_scenes(self, items, data):
+        """
+        Look up the Scenes of all of the given items with a single query and
+        create the missing ones with a single batch request, storing them in
+        the data cache for ``get_scene``.
+
+        @param items - \b list - the hiero.core.TrackItems driving shot creation
+        @param data - \b dict - the data cache
+        """
+        scenes = data.setdefault("scenes_by_code", {})
+
+        codes = {}
+        for shot_code in set(item.name() for item in items):
+            scene_code = self.get_scene_code(shot_code)
+            if scene_code and scene_code.lower() not in scenes:
+                codes.setdefault(scene_code.lower(), scene_code)
+        if not codes:
+            return
+
+        code_list = sorted(codes.values())
+        for i in range(0, len(code_list), self._prefetch_chunk_size):
+            for scene in self._find("Scene", [
+                    ['project', 'is', self.parent.context.project],
+                    ['code', 'in', code_list[i:i + self._prefetch_chunk_size]]], ['code']):
+                # keep the first of any scenes sharing a code, as ``get_scene`` does
+                scenes.setdefault(scene['code'].lower(), scene)
+
+        batch_data = [
+            {
+                "request_type": "create",
+                "entity_type": "Scene",
+                "data": {'code': code, 'project': self.parent.context.project},
+                "return_fields": ['code'],
+            }
+            for (key, code) in sorted(codes.items()) if key not in scenes
+        ]
+        if batch_data:
+            for scene in self.parent.shotgun.batch(batch_data):
+                scenes[scene['code'].lower()] = scene
+                self.parent.logger.debug("Scene not found. Created: %s" % scene)
+            self._invalidate_cache("Scene")
+
+        self.parent.log_debug("Prefetched %s Scenes, created %s." % (len(codes), len(batch_data)))
+
     def get_default_delivery_format(self):
         """In our studios Pipeline, each Shotgun Project must have a 'Final' and an 'Editorial' Delivery Format Entity.
         Assume only one exists.
@@ -297,7 +531,7 @@ class HieroGetShot(Hook):
         DELIVERY_FORMAT_ENTITY = "CustomEntity06"
         # query only once until cache reset
         if not self.__class__._default_delivery_format:
-            self.__class__._default_delivery_format = self.parent.shotgun.find_one(DELIVERY_FORMAT_ENTITY,
+            self.__class__._default_delivery_format = self._find_one(DELIVERY_FORMAT_ENTITY,
                                                                                 [['code', 'is', 'Final']],
                                                                                 ['sg_width', 'sg_height', 'sg_pixel_aspect_ratio']
                                                                      )
@@ -51,6 +51,9 @@ class HieroPreExport(Hook):
                 action.execute(enter_suppression_mode=True)
                 break
 
+        # the tool may have changed the element tags, so read them again
+        getattr(self.parent, "preprocess_data", {}).pop("element_tag_metadata", None)
+
         # as with the `enter_suppression_mode` in the above tool-call, lets take measures to prevent
         # the repeated querying of shotgun when the user is editing the Export Template, effectively keeping
         # that interaction snappy!
@@ -21,6 +21,9 @@ class HieroResolveCustomStrings(Hook):
     # cache of shots that have already been pulled from shotgun
     _sg_lookup_cache = {}
 
+    # the maximum number of shots in a single "in" filter when prefetching
+    _prefetch_chunk_size = 200
+
     #  CBSD Customization
     # ===========================
 
@@ -40,13 +43,101 @@ class HieroResolveCustomStrings(Hook):
             if tag.metadata().hasKey(CBSD_TAG_SIGNATURE):
                 return tag
 
+    def getElementTagMetadata(self, item):
+        """
+        Returns a dictionary of the metadata of the item's element tag, which
+        is empty if the item has none.
+
+        The metadata is read from Hiero once per item during an export and
+        indexed by item guid in the app's data cache. The index is cleared by
+        the pre export hook, as the tags may have been updated.
+        """
+        data = getattr(self.parent, "preprocess_data", None)
+        index = data.setdefault("element_tag_metadata", {}) if data is not None else {}
+
+        guid = item.guid()
+        if guid not in index:
+            metadata = {}
+            element_tag = self.getCbsdElementTag(item)
+            if element_tag:
+                tag_metadata = element_tag.metadata()
+                metadata = dict((key, tag_metadata.value(key)) for key in tag_metadata.keys())
+            index[guid] = metadata
+        return index[guid]
+
     def getElementTagMetadataValue(self, item, metadata_key):
-        element_tag = self.getCbsdElementTag(item)
-        if element_tag and element_tag.metadata().hasKey(metadata_key):
-            metadata_value = element_tag.metadata().value(metadata_key)
-            return metadata_value
+        return self.getElementTagMetadata(item).get(metadata_key, '')
+
+    def prefetch_versions(self, shots, data, **kwargs):
+        """
+        Retrieve the Versions of all of the given shots with as few queries as
+        possible, and index them in the data cache so that getAutoVersion can
+        resolve version numbers without querying Shotgun.
+
+        :param shots: A list of Shot entity dictionaries.
+        :param data: A dictionary with cached data. This is typically the
+            processor's preprocess_data dictionary.
+        """
+        index = data.setdefault("version_index", {})
+        shots = [{"type": s["type"], "id": s["id"]} for s in shots if s["id"] not in index]
+
+        fields = ["code", "sg_version_type", "sg_file_type", "sg_version_number", "entity"]
+        for i in range(0, len(shots), self._prefetch_chunk_size):
+            chunk = shots[i:i + self._prefetch_chunk_size]
+            filters = [
+                ['project', 'is', self.parent.context.project],
+                ['entity', 'in', chunk],
+            ]
+            versions = self.parent.shotgun.find("Version", filters, fields)
+
+            for shot in chunk:
+                index[shot["id"]] = {}
+            for version in versions:
+                key = self._versionIndexKey(version["sg_version_type"], version["sg_file_type"])
+                index[version["entity"]["id"]].setdefault(key, []).append(
+                    ((version["code"] or "").lower(), version["sg_version_number"])
+                )
+
+        self.parent.log_debug("Prefetched the Versions of %s Shots." % (len(shots),))
+
+    def _versionIndexKey(self, version_type, file_type):
+        """
+        Returns the key of the Versions with the given version and file types
+        in the version index. The types are matched ignoring case, as the
+        "is" filters of a direct lookup are.
+        """
+        return ((version_type or "").lower() or None, (file_type or "").lower() or None)
+
+    def _getHighestVersionNumber(self, shot, version_base_name, version_type, file_type):
+        """
+        Returns the highest number of the shot's Versions whose code contains
+        the base name, with the given version and file types, or 0 if there
+        aren't any.
+        """
+        data = getattr(self.parent, "preprocess_data", {})
+        versions_by_type = data.get("version_index", {}).get(shot["id"]) if shot else None
+
+        if versions_by_type is None:
+            # the shot's versions weren't prefetched. look them up directly
+            filters = [
+                ['project', 'is', self.parent.context.project],
+                ['entity', 'is', shot],
+                ['code', 'contains', version_base_name],
+                ['sg_version_type', 'is', version_type],
+                ['sg_file_type', 'is', file_type],
+            ]
+            fields = [
+                'sg_version_number',
+            ]
+            numbers = [v['sg_version_number'] for v in self.parent.shotgun.find("Version", filters, fields)]
+
         else:
-            return ''
+            # match the codes the same way as the "contains" filter would
+            base_name = (version_base_name or "").lower()
+            versions = versions_by_type.get(self._versionIndexKey(version_type, file_type), [])
+            numbers = [num for (code, num) in versions if base_name in code]
+
+        return max([0] + [num for num in numbers if num is not None])
 
     def getAutoVersion(self, task):
         """Get a formatted Version Number string based on existing versions in Shotgun."""
@@ -67,26 +158,10 @@ class HieroResolveCustomStrings(Hook):
                                             data=self.parent.preprocess_data,
                                             upload_thumbnail=False
                                             )
-            filters = [
-                ['project', 'is', self.parent.context.project],
-                ['entity', 'is', shot],
-                ['code', 'contains', version_base_name],
-                ['sg_version_type', 'is', version_type],
-                ['sg_file_type', 'is', file_type],
-            ]
-            fields = [
-                'sg_version_number',
-            ]
-            previous_versions = self.parent.shotgun.find("Version", filters, fields)
-            self.__class__._sg_lookup_cache[version_base_name][version_type][file_type] = previous_versions
-
-        previous_versions = self.__class__._sg_lookup_cache[version_base_name][version_type][file_type]
-        highest_available_number = 0
+            self.__class__._sg_lookup_cache[version_base_name][version_type][file_type] = \
+                self._getHighestVersionNumber(shot, version_base_name, version_type, file_type)
 
-        for version in previous_versions:
-            num = version['sg_version_number']
-            if num > highest_available_number and num is not None:
-                highest_available_number = num
+        highest_available_number = self.__class__._sg_lookup_cache[version_base_name][version_type][file_type]
         highest_available_number += 1
         return '%s' % format(highest_available_number, "03")
 
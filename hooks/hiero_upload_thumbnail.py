@@ -8,15 +8,10 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
-import os
 import sys
 import math
-import shutil
-import tempfile
 import traceback
-import time
 
-from tank.platform.qt import QtCore
 from tank import Hook
 import tank.templatekey
 
@@ -25,49 +20,59 @@ class HieroUploadThumbnail(Hook):
     """
     Upload a thumbnail to a given Shotgun entity for a given Hiero source item.
     """
+
     def execute(self, entity, source, item, **kwargs):
-        thumbdir = tempfile.mkdtemp(prefix='hiero_process_shot')
-        try:
-            path = "%s.png" % os.path.join(thumbdir, source.name())
-            task = kwargs.get('task', None)
+        # if the processor has provided a thumbnail service, each frame is
+        # rendered and encoded once for all of the entities using it
+        thumbnail_service = getattr(self.parent, "preprocess_data", {}).get("thumbnail_service")
+        if thumbnail_service is not None:
+            try:
+                (thumb_source, frame) = self._get_thumbnail_frame(source, item, kwargs.get('task', None))
+                thumbnail = thumbnail_service.get(
+                    thumb_source.guid(), frame, lambda: thumb_source.thumbnail(frame))
+                if thumbnail is not None:
+                    thumbnail_service.upload(entity, thumbnail)
+            except:
+                self.parent.log_info("Thumbnail for %s was not refreshed in Shotgun." % source)
 
-            if item is None:
-                # No timeline info, use the poster frame of the source item
-                frame = source.posterFrame()
-                thumb_qimage = source.thumbnail(frame)
-            else:
-                if (task is not None) and task.isCollated():
-                    # collated shot, use middle frame from task sequence (all collated items)
-                    max_frame = 0
-                    min_frame = sys.maxint
-                    for track in task._sequence.videoTracks():
-                        for i in track.items():
-                            min_frame = min(i.timelineIn(), min_frame)
-                            max_frame = max(i.timelineOut(), max_frame)
-                    frame = int(math.ceil((min_frame + max_frame)/2.0))
-                    thumb_qimage = task._sequence.thumbnail(frame)
-                else:
-                    # Simple item, just use middle frame
-                    frame = int(math.ceil((item.sourceIn() + item.sourceOut())/2.0))
-                    thumb_qimage = source.thumbnail(frame)
-            # scale it down to 600px wide
-            thumb_qimage_scaled = thumb_qimage.scaledToWidth(600, QtCore.Qt.SmoothTransformation)
-            # scale thumbnail here...
-            thumb_qimage_scaled.save(path)
-            self.parent.log_debug("Uploading thumbnail for %s %s..." % (entity['type'], entity['id']))
-            self.parent.shotgun.upload_thumbnail(entity['type'], entity['id'], path)
+                tb = traceback.format_exc()
+                self.parent.log_debug(tb)
+            return
+
+        try:
+            (thumb_source, frame) = self._get_thumbnail_frame(source, item, kwargs.get('task', None))
+            self.parent.upload_thumbnail(entity, thumb_source.thumbnail(frame))
         except:
             self.parent.log_info("Thumbnail for %s was not refreshed in Shotgun." % source)
 
             tb = traceback.format_exc()
             self.parent.log_debug(tb)
-        finally:
-            # Sometimes Windows holds on to the temporary thumbnail file longer than expected which
-            # can cause an exception here. If we wait a second and try again, this usually solves
-            # the issue.
-            try:
-                shutil.rmtree(thumbdir)
-            except Exception:
-                self.parent.log_error("Error removing temporary thumbnail file, trying again.")
-                time.sleep(1.0)
-                shutil.rmtree(thumbdir)
+
+    def _get_thumbnail_frame(self, source, item, task):
+        """
+        Returns the clip or sequence to take the thumbnail from, and the frame
+        to use.
+        """
+        if item is None:
+            # No timeline info, use the poster frame of the source item
+            return (source, source.posterFrame())
+
+        if (task is not None) and task.isCollated():
+            # collated shot, use middle frame from task sequence (all collated items).
+            # the bounds are recorded when the sequence is built.
+            bounds = None
+            if hasattr(task, "collatedSequenceBounds"):
+                bounds = task.collatedSequenceBounds()
+            if bounds is None:
+                max_frame = 0
+                min_frame = sys.maxint
+                for track in task._sequence.videoTracks():
+                    for i in track.items():
+                        min_frame = min(i.timelineIn(), min_frame)
+                        max_frame = max(i.timelineOut(), max_frame)
+                bounds = (min_frame, max_frame)
+            (min_frame, max_frame) = bounds
+            return (task._sequence, int(math.ceil((min_frame + max_frame)/2.0)))
+
+        # Simple item, just use middle frame
+        return (source, int(math.ceil((item.sourceIn() + item.sourceOut())/2.0)))
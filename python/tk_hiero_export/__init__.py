@@ -9,6 +9,10 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 from .base import ShotgunHieroObjectBase
+from .export_tracer import TracingShotgun, item_args, trace_span
+from .sg_call_stats import AccountingShotgun
+from .sg_thumbnail_service import encode_png, upload_thumbnail_data
+from .export_plan import ExportPlan, PlanningShotgun
 
 from .sg_shot_processor import (
 	ShotgunShotProcessor,
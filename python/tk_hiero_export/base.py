@@ -9,8 +9,8 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
+import ast
 import sys
-import shutil
 import time
 
 import hiero.core
@@ -21,6 +21,11 @@ from hiero.exporters import FnTranscodeExporter
 import tank
 from tank.platform.qt import QtGui, QtCore
 
+from .export_tracer import trace_span
+from .sg_entity_cache import ShotgunEntityCache
+from .sg_task_index import DefaultTaskResolver, TaskTemplateIndex
+from .sg_thumbnail_service import CachedThumbnail, encode_png, upload_thumbnail_data
+
 
 class ShotgunHieroObjectBase(object):
     """Base class to make the Hiero classes app aware."""
@@ -48,33 +53,186 @@ class ShotgunHieroObjectBase(object):
         tk_version_str = version_template.apply_fields({'version': version_number})
         return tk_version_str
 
+    def _submit_upload(self, description, upload, cleanup=None, required=True):
+        """
+        Upload to Shotgun in the background if the processor has provided an
+        upload pool, otherwise upload right away.
+
+        :param description: A description of the upload used when reporting.
+        :param upload: A callable taking the Shotgun connection to upload with.
+        :param cleanup: An optional callable run once the upload has finished.
+        :param required: If False, a failure is logged rather than raised, or
+            rather than set as the task's error when it happens in the
+            background.
+        :returns: The :class:`PendingUpload` if the upload was queued,
+            otherwise None.
+        """
+        upload_pool = getattr(self.app, "preprocess_data", {}).get("upload_pool")
+        if upload_pool is not None:
+            self.app.log_debug("Queueing upload of %s..." % (description,))
+            pending = upload_pool.submit(description, upload, cleanup, owner=self, required=required)
+            self._pending_uploads = getattr(self, "_pending_uploads", []) + [pending]
+            return pending
+
+        try:
+            upload(self.app.shotgun)
+        except Exception, e:
+            if required:
+                raise
+            self.app.log_info("Failed to upload %s: %s" % (description, e))
+        if cleanup:
+            cleanup()
+
+    def _create_filesystem_structure(self, entity_type, entity_ids):
+        """
+        Create the folders for the given entities with a single call, logging
+        how long it took.
+
+        :param entity_type: The type of the entities.
+        :param entity_ids: A list of the ids of the entities.
+        """
+        if not entity_ids:
+            return
+
+        # a dry run only plans the folders
+        plan = getattr(self.app, "export_plan", None)
+        if plan is not None:
+            plan.create_filesystem_structure(entity_type, entity_ids)
+            return
+
+        self.app.log_debug("Creating file system structure for %s %s..." % (entity_type, entity_ids))
+        start = time.time()
+        with trace_span(getattr(self.app, "tracer", None), "create_filesystem_structure", "toolkit",
+                        {"entity_type": entity_type, "count": len(entity_ids)}):
+            self.app.tank.create_filesystem_structure(entity_type, entity_ids)
+        self.app.log_info("Created file system structure for %s %s entities in %.2fs." % (
+            len(entity_ids), entity_type, time.time() - start))
+
+    def _register_publish(self, entity, **kwargs):
+        """
+        Register a publish with Toolkit in the context of the given entity.
+        A dry run records the publish in its plan instead.
+
+        :param entity: The entity whose context the file is published in.
+        :param kwargs: The arguments of ``tank.util.register_publish`` other
+            than the Toolkit instance and context.
+        :returns: The published file entity.
+        """
+        plan = getattr(self.app, "export_plan", None)
+        if plan is not None:
+            entity_type = tank.util.get_published_file_entity_type(self.app.tank)
+            return plan.publish(entity_type, entity, kwargs)
+
+        ctx = self.app.tank.context_from_entity(entity["type"], entity["id"])
+        return tank.util.register_publish(tk=self.app.tank, context=ctx, **kwargs)
+
+    def _get_thumbnail(self, source, frame):
+        """
+        Returns the thumbnail for a frame of a clip or sequence, to be passed
+        to _upload_thumbnail_to_sg. If the processor has provided a thumbnail
+        service, each frame is only rendered once per export.
+        """
+        thumbnail_service = getattr(self.app, "preprocess_data", {}).get("thumbnail_service")
+        if thumbnail_service is None:
+            return source.thumbnail(frame)
+        return thumbnail_service.get(source.guid(), frame, lambda: source.thumbnail(frame))
+
     def _upload_thumbnail_to_sg(self, sg_entity, thumb_qimage):
         """
         Updates the thumbnail for an entity in Shotgun
         """
-        import tempfile
-        import uuid
+        # thumbnails from the thumbnail service are uploaded once and shared
+        # between the entities using them
+        if isinstance(thumb_qimage, CachedThumbnail):
+            self.app.preprocess_data["thumbnail_service"].upload(sg_entity, thumb_qimage)
+            return
 
-        thumbdir = tempfile.mkdtemp(prefix='hiero_process_thumbnail_')
         try:
-            path = "%s.png" % os.path.join(thumbdir, sg_entity.get('name', 'thumbnail'))
             # scale it down to 600px wide
-            thumb_qimage_scaled = thumb_qimage.scaledToWidth(600, QtCore.Qt.SmoothTransformation)
-            thumb_qimage_scaled.save(path)
-            self.app.log_debug("Uploading thumbnail for %s %s..." % (sg_entity['type'], sg_entity['id']))
-            self.app.shotgun.upload_thumbnail(sg_entity['type'], sg_entity['id'], path)
+            data = encode_png(thumb_qimage, 600)
         except Exception, e:
             self.app.log_info("Thumbnail for %s %s (#%s) was not refreshed in Shotgun: %s" % (sg_entity['type'], sg_entity.get('name'), sg_entity['id'], e))
-        finally:
-            # Sometimes Windows holds on to the temporary thumbnail file longer than expected which
-            # can cause an exception here. If we wait a second and try again, this usually solves
-            # the issue.
+            return
+
+        def upload(sg):
+            self.app.log_debug("Uploading thumbnail for %s %s..." % (sg_entity['type'], sg_entity['id']))
+            upload_thumbnail_data(sg, sg_entity['type'], sg_entity['id'], data)
+
+        self._submit_upload(
+            "thumbnail for %s %s (#%s)" % (sg_entity['type'], sg_entity.get('name'), sg_entity['id']),
+            upload,
+            required=False,
+        )
+
+    def _get_entity_cache(self):
+        """
+        Returns the on-disk cache of Shotgun entities shared by the exports of
+        the session, or None if the ``entity_cache_ttl`` setting disables it.
+        The cache is opened on first use.
+        """
+        cache = getattr(self.app, "entity_cache", None)
+        if cache is None:
+            ttl = self.app.get_setting("entity_cache_ttl", 0)
+            if not ttl:
+                return None
+            path = os.path.join(self.app.cache_location, ShotgunEntityCache.FILE_NAME)
+            try:
+                cache = ShotgunEntityCache(self.app, path, ttl)
+            except Exception, e:
+                # don't try again for every export of the session
+                self.app.log_warning("Unable to open the Shotgun entity cache %s: %s" % (path, e))
+                cache = False
+            self.app.entity_cache = cache
+        return cache or None
+
+    def _get_task_template_index(self):
+        """
+        Returns the TaskTemplate index shared by the export UI and tasks. The
+        index is created on first use and reset when an export starts.
+        """
+        index = getattr(self.app, "task_template_index", None)
+        if index is None:
+            index = TaskTemplateIndex(self.app, self._get_entity_cache())
+            self.app.task_template_index = index
+        return index
+
+    def _get_default_task_resolver(self):
+        """
+        Returns the resolver for the ``default_task_filter`` setting, shared by
+        all of the tasks in the export, or None if the setting is invalid.
+        """
+        data = getattr(self.app, "preprocess_data", {})
+        resolver = data.get("default_task_resolver")
+        if resolver is None:
+            setting = self.app.get_setting("default_task_filter", "[]")
             try:
-                shutil.rmtree(thumbdir)
-            except Exception:
-                self.parent.log_error("Error removing temporary thumbnail file, trying again.")
-                time.sleep(1.0)
-                shutil.rmtree(thumbdir)
+                task_filter = ast.literal_eval(setting)
+            except ValueError:
+                # continue without task
+                self.app.log_error("Invalid value for 'default_task_filter': %s" % setting)
+                return None
+            resolver = DefaultTaskResolver(self.app, task_filter)
+            data["default_task_resolver"] = resolver
+        return resolver
+
+    def _get_default_task(self, sg_entity):
+        """
+        Returns the Task linked to the given entity that matches the
+        ``default_task_filter`` setting, or None if there isn't exactly one.
+        """
+        resolver = self._get_default_task_resolver()
+        if resolver is None:
+            return None
+        return resolver.get(sg_entity)
+
+    def _get_current_user(self):
+        """
+        Returns the Shotgun user running the export, looked up once per export.
+        """
+        data = getattr(self.app, "preprocess_data", {})
+        if "current_user" not in data:
+            data["current_user"] = tank.util.get_current_user(self.app.tank)
+        return data["current_user"]
 
     def _cutsSupported(self):
         """Returns True if the site has Cut support, False otherwise."""
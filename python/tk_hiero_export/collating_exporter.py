@@ -10,6 +10,7 @@
 
 import sys
 import math
+import bisect
 
 import hiero
 
@@ -35,9 +36,16 @@ class CollatingExporter(object):
         # Handles from the collated sequence.  This is set as a tuple if a collated sequence is created
         self._collatedSequenceHandles = None
 
+        # First and last timeline frames of the track items in the collated sequence.  This is set as
+        # a tuple if a collated sequence is created
+        self._collatedSequenceBounds = None
+
         # Need to keep track of the master track item for disconnected sequence export
         self._masterTrackItemCopy = None
 
+        # Errors encountered while building the collated sequence
+        self._collatedSequenceErrors = []
+
         # Default this to True.  If the following tests fail and return early, we want it in that state.
         # Maybe it would be better to raise an exception or something?
         self._nothingToDo = True
@@ -119,45 +127,16 @@ class CollatingExporter(object):
         collateTime = properties["collateTracks"]
         collateName = properties["collateShotNames"]
 
+        # the index is shared by all of the tasks collating items from the
+        # same sequence, so it is only built once per export.
+        index = _collationIndex(self._sequence)
+
         if properties["collateSequence"]:
             # Add all trackitems to collate list
-            for track in self._sequence.videoTracks():
-                for trackitem in track:
-                    collatedItems.append(trackitem)
+            collatedItems = index.allItems()
 
         elif collateName or collateTime:
-            nameMatches = [self._item]
-            orderedMatches = []
-
-            if collateName:
-                # The collate tracks option will detect any trackitems on other tracks which overlap
-                # so they can be included in the nuke script.
-                for track in self._sequence.videoTracks():
-                    for trackitem in track:
-                        if trackitem is not self._item:
-                            # Collate if shot name matches.
-                            if trackitem.name() == self._item.name():
-                                nameMatches.append(trackitem)
-                                continue
-            for track in self._sequence.videoTracks():
-                for trackitem in track:
-                    for nameMatchTrackItem in nameMatches:
-                        if collateTime:
-                            # Starts before or at same time
-                            if trackitem.timelineIn() <= nameMatchTrackItem.timelineIn():
-                                # finishes after start
-                                if trackitem.timelineOut() >= nameMatchTrackItem.timelineIn():
-                                    orderedMatches.append(trackitem)
-                                    break
-                            elif trackitem.timelineIn() > nameMatchTrackItem.timelineIn():
-                                # Starts before end
-                                if trackitem.timelineIn() < nameMatchTrackItem.timelineOut():
-                                    orderedMatches.append(trackitem)
-                                    break
-                        elif trackitem == nameMatchTrackItem:
-                            orderedMatches.append(trackitem)
-                            break
-            collatedItems = orderedMatches
+            collatedItems = index.collatedItems(self._item, collateName, collateTime)
         return collatedItems
 
     def _buildCollatedSequence(self, properties):
@@ -169,12 +148,76 @@ class CollatingExporter(object):
         """
 
         if self._has_nuke_backend():
-            # later version of Hiero with nuke backend
-            self._buildCollatedSequence_nuke(properties)
+            # later version of Hiero with nuke backend. the tasks exporting the
+            # same item with the same settings all build identical sequences,
+            # so the first one built is shared with the others. the tasks only
+            # read their collated sequence, so it is never copied.
+            index = _collationIndex(self._sequence)
+            key = self._collatedSequenceKey(properties)
+            state = index.collatedSequence(key)
+            if state is None:
+                self._buildCollatedSequence_nuke(properties)
+                index.setCollatedSequence(key, self._collatedSequenceState())
+            else:
+                self._restoreCollatedSequenceState(state)
         else:
             # pre-nuke Hiero
             self._buildCollatedSequence_legacy(properties)
 
+    def _collatedSequenceKey(self, properties):
+        """
+        Returns a key identifying the collated sequence built for this task.
+        """
+        return (
+            self._item.guid(),
+            properties["collateTracks"],
+            properties["collateShotNames"],
+            properties["collateSequence"],
+            properties["collateCustomStart"],
+            self._cutHandles,
+            self._startFrame,
+            self.outputSequenceTime(),
+        )
+
+    def _collatedSequenceState(self):
+        """
+        Returns the state set on this task by building the collated sequence.
+        """
+        return {
+            "sequence": self._sequence,
+            "parentSequence": self._parentSequence,
+            "heroItem": self._heroItem,
+            "masterTrackItemCopy": self._masterTrackItemCopy,
+            "outputFormat": self._collatedSequenceOutputFormat,
+            "handles": self._collatedSequenceHandles,
+            "bounds": self._collatedSequenceBounds,
+            "startFrame": self._startFrame,
+            "errors": list(self._collatedSequenceErrors),
+            "signature": _sequenceSignature(self._sequence),
+        }
+
+    def _restoreCollatedSequenceState(self, state):
+        """
+        Set the state of a collated sequence built by another task on this
+        task, as if it had been built by this task.
+        """
+        # the sequence is shared, so the tasks must not have modified it
+        assert _sequenceSignature(state["sequence"]) == state["signature"], \
+            "The shared collated sequence %s was modified." % (state["sequence"].name(),)
+
+        self._sequence = state["sequence"]
+        self._parentSequence = state["parentSequence"]
+        self._heroItem = state["heroItem"]
+        self._hero = (self._heroItem.guid() == self._item.guid())
+        self._masterTrackItemCopy = state["masterTrackItemCopy"]
+        self._collatedSequenceOutputFormat = state["outputFormat"]
+        self._collatedSequenceHandles = state["handles"]
+        self._collatedSequenceBounds = state["bounds"]
+        self._startFrame = state["startFrame"]
+        self._collatedSequenceErrors = list(state["errors"])
+        for error in self._collatedSequenceErrors:
+            self.setError(error)
+
     def _buildCollatedSequence_legacy(self, properties):
         """
         From the list of collated Items build a sequence, extend edge shots for
@@ -226,6 +269,7 @@ class CollatingExporter(object):
 
         newTracks = {}
         audioTracks = {}
+        bounds = []
         for trackitem in self._collatedItems:
             parentTrack = trackitem.parentTrack()
 
@@ -286,6 +330,7 @@ class CollatingExporter(object):
             # Add Cloned track item to cloned track
             try:
                 newTracks[parentTrack.guid()].addItem(trackItemClone)
+                bounds.append((trackItemClone.timelineIn(), trackItemClone.timelineOut()))
                 for trackGuid in newAudio.keys():
                     for item in newAudio[trackGuid]:
                         audioTracks[trackGuid].addItem(item)
@@ -298,6 +343,8 @@ class CollatingExporter(object):
 
         handles = self._cutHandles if self._cutHandles is not None else 0
 
+        self._collatedSequenceBounds = _frameBounds(bounds)
+
         # Use in/out point to constrain output framerange to track item range
         newSequence.setInTime(max(0, (sequenceIn + offset + self.HEAD_ROOM_OFFSET) - handles))
         newSequence.setOutTime((sequenceOut + offset + self.HEAD_ROOM_OFFSET) + handles)
@@ -419,6 +466,7 @@ class CollatingExporter(object):
         handleOutAdjustments = {}
 
         linkedEffects = []
+        bounds = []
 
         for trackitem in self._collatedItems:
             parentTrack = trackitem.parentTrack()
@@ -488,9 +536,11 @@ class CollatingExporter(object):
             # Add copied track item to copied track
             try:
                 newTrack.addItem(trackItemCopy)
+                bounds.append((trackItemCopy.timelineIn(), trackItemCopy.timelineOut()))
             except Exception as e:
                 clash = newTracks[parentTrack.guid()].items()[0]
                 error = "Failed to add shot %s (%i - %i) due to clash with collated shots, This is likely due to the expansion of the master shot to include handles. (%s %i - %i)\n" % (trackItemCopy.name(), trackItemCopy.timelineIn(), trackItemCopy.timelineOut(), clash.name(), clash.timelineIn(), clash.timelineOut())
+                self._collatedSequenceErrors.append(error)
                 self.setError(error)
                 hiero.core.log.error(error)
                 hiero.core.log.error(str(e))
@@ -511,7 +561,7 @@ class CollatingExporter(object):
             newTrack = newTracks[parentTrack.guid()]
             unusedNewTracks.discard(newTrack)
 
-            subTrackIndex = _subTrackIndex(subTrackItem)
+            subTrackIndex = _collationIndex(self._sequence).subTrackIndex(subTrackItem)
 
             subTrackItemCopy = subTrackItem.copy()
             inAdjustment = handleInAdjustments.get(subTrackItem, 0)
@@ -546,6 +596,7 @@ class CollatingExporter(object):
                 newSequence.setPosterFrame(heroItem.timelineIn() + posterFrame + self.HEAD_ROOM_OFFSET + offset)
 
         self._collatedSequenceHandles = (sequenceInHandle, sequenceOutHandle)
+        self._collatedSequenceBounds = _frameBounds(bounds)
 
         # Useful for debugging, add copied collated sequence to Project
         #newSequence.setName("Collated Sequence")
@@ -567,6 +618,13 @@ class CollatingExporter(object):
     def heroItem(self):
         return self._heroItem
 
+    def collatedSequenceBounds(self):
+        """
+        Returns the first and last timeline frames of the track items in the
+        collated sequence as a tuple, or None if the task isn't collated.
+        """
+        return self._collatedSequenceBounds
+
     def finishTask(self):
         self._parentSequence = None
 
@@ -655,6 +713,182 @@ def _clone_item(item):
         return item.clone()
 
 
+# collation indexes of the sequences being exported, keyed by sequence guid
+_collation_indexes = {}
+
+
+def _collationIndex(sequence):
+    """
+    Returns the collation index for the sequence, building it if necessary.
+    """
+    index = _collation_indexes.get(sequence.guid())
+    if index is None:
+        index = _CollationIndex(sequence)
+        _collation_indexes[sequence.guid()] = index
+    return index
+
+
+def clearCollationIndexes():
+    """
+    Discard the collation indexes so that they're rebuilt from the current
+    state of the sequences. This should be called whenever an export starts,
+    and once it has finished, to release the collated sequences they hold.
+    """
+    _collation_indexes.clear()
+
+
+class _CollationIndex(object):
+    """
+    Index of the video track items of a sequence, used to find the items to
+    collate with a track item without walking the whole sequence.
+
+    Items are bucketed by name, and the timeline in and out points of each
+    track are kept sorted so that the items overlapping a range are found by
+    bisection. The items of a track never overlap, so sorting them by timeline
+    in sorts them by timeline out as well.
+    """
+
+    def __init__(self, sequence):
+        # for each track, the list of items along with their timeline in and
+        # out points, in the order the track returns them.
+        self._tracks = []
+        self._names = {}
+        self._results = {}
+        self._sequences = {}
+        self._subTrackIndexes = {}
+
+        for (trackIndex, track) in enumerate(sequence.videoTracks()):
+            items = list(track)
+            ins = [item.timelineIn() for item in items]
+            outs = [item.timelineOut() for item in items]
+
+            # should never happen, but if the items aren't sorted the track
+            # is scanned in full rather than bisected
+            sortedTimes = all(
+                ins[i] <= ins[i + 1] and outs[i] <= outs[i + 1]
+                for i in range(len(items) - 1)
+            )
+            self._tracks.append((items, ins, outs, sortedTimes))
+
+            for (position, item) in enumerate(items):
+                self._names.setdefault(item.name(), []).append((trackIndex, position))
+
+    def allItems(self):
+        """
+        Returns all of the items in the sequence.
+        """
+        return [item for (items, ins, outs, sortedTimes) in self._tracks for item in items]
+
+    def collatedItems(self, trackItem, collateName, collateTime):
+        """
+        Returns the items to collate with the track item, in the order they
+        appear in the sequence.
+
+        :param trackItem: The track item being exported.
+        :param collateName: Include the items with the same name as the track
+            item, and, if collateTime is set, the items overlapping them.
+        :param collateTime: Include the items overlapping the track item.
+        """
+        key = (trackItem.guid(), collateName, collateTime)
+        if key not in self._results:
+            self._results[key] = self._findCollatedItems(trackItem, collateName, collateTime)
+        return list(self._results[key])
+
+    def collatedSequence(self, key):
+        """
+        Returns the state of the collated sequence built with the given key,
+        or None if it hasn't been built yet.
+        """
+        return self._sequences.get(key)
+
+    def setCollatedSequence(self, key, state):
+        """
+        Store the state of a collated sequence built from this sequence, so
+        that it can be shared by the other tasks building it with the same key.
+        The sequence must not be modified once stored.
+        """
+        self._sequences[key] = state
+
+    def subTrackIndex(self, subTrackItem):
+        """
+        Returns the index of the sub-track holding the sub-track item. The
+        indexes of all of the items of a track are mapped the first time one
+        of them is requested.
+        """
+        track = subTrackItem.parentTrack()
+        indexes = self._subTrackIndexes.get(track.guid())
+        if indexes is None:
+            indexes = _subTrackIndexMap(track)
+            self._subTrackIndexes[track.guid()] = indexes
+
+        index = indexes.get(subTrackItem.guid())
+        if index is None:
+            # added to the track since it was mapped
+            index = _subTrackIndex(subTrackItem)
+        return index
+
+    def _findCollatedItems(self, trackItem, collateName, collateTime):
+        """
+        Returns the items to collate with the track item. See collatedItems.
+        """
+        nameMatches = [(trackItem.timelineIn(), trackItem.timelineOut())]
+        matchKeys = set()
+        if collateName:
+            for (trackIndex, position) in self._names.get(trackItem.name(), []):
+                (items, ins, outs, sortedTimes) = self._tracks[trackIndex]
+                nameMatches.append((ins[position], outs[position]))
+                matchKeys.add((trackIndex, position))
+
+        if not collateTime:
+            # only the items matching by name. the track item is one of them.
+            keys = matchKeys
+        else:
+            keys = set()
+            for (matchIn, matchOut) in nameMatches:
+                # an item overlaps the match if it starts at or before the
+                # start of the match and finishes after the start, or if it
+                # starts after the start of the match but before the end.
+                lo = matchIn
+                hi = max(matchIn, matchOut - 1)
+                for (trackIndex, track) in enumerate(self._tracks):
+                    for position in self._overlapping(track, lo, hi):
+                        keys.add((trackIndex, position))
+
+        return [self._tracks[trackIndex][0][position] for (trackIndex, position) in sorted(keys)]
+
+    def _overlapping(self, track, lo, hi):
+        """
+        Returns the positions of the items in the track with a timeline in at
+        or before hi and a timeline out at or after lo.
+        """
+        (items, ins, outs, sortedTimes) = track
+        if sortedTimes:
+            return range(bisect.bisect_left(outs, lo), bisect.bisect_right(ins, hi))
+        return [i for i in range(len(items)) if ins[i] <= hi and outs[i] >= lo]
+
+
+def _sequenceSignature(sequence):
+    """
+    Returns the placement of the track items of a sequence, used to check that
+    a shared collated sequence hasn't been modified.
+    """
+    return [
+        [(item.guid(), item.sourceIn(), item.sourceOut(), item.timelineIn(), item.timelineOut())
+         for item in track.items()]
+        for track in sequence.videoTracks()
+    ]
+
+
+def _frameBounds(bounds):
+    """
+    Returns the first and last frames of a list of (in, out) tuples, or None
+    if the list is empty.
+    """
+    if not bounds:
+        return None
+    return (min(b[0] for b in bounds), max(b[1] for b in bounds))
+
+
 def _subTrackIndex(subTrackItem):
     """
     Helper function to get the subtrack index for a subtrack item.
@@ -665,6 +899,17 @@ def _subTrackIndex(subTrackItem):
         if subTrackItem in subTrackItems:
             return index
 
+def _subTrackIndexMap(track):
+    """
+    Returns a dictionary mapping the guid of each subtrack item in the track
+    to the index of its subtrack.
+    """
+    indexes = {}
+    for index, subTrackItems in enumerate(track.subTrackItems()):
+        for subTrackItem in subTrackItems:
+            indexes.setdefault(subTrackItem.guid(), index)
+    return indexes
+
 class CollatedShotPreset(object):
     def __init__(self, properties):
         properties["collateTracks"] = False
@@ -0,0 +1,233 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# frame number tokens that may appear in an export path
+_FRAME_TOKEN_REGEX = re.compile(r"%0?\d*d|#+|@+")
+
+
+class ExportFingerprints(object):
+    """
+    Sidecar database recording a fingerprint of the inputs of each file
+    written by an export, along with a signature of the files themselves.
+
+    An output whose fingerprint and files are unchanged since it was recorded
+    doesn't need to be exported again.
+    """
+
+    # name of the database file, stored in the export root
+    FILE_NAME = ".tk_hiero_export_fingerprints.db"
+
+    def __init__(self, root):
+        """
+        :param root: The directory the exported files are written under.
+        """
+        if not os.path.isdir(root):
+            os.makedirs(root)
+        self._path = os.path.join(root, self.FILE_NAME)
+
+        # the tasks may finish on other threads
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self._path, check_same_thread=False)
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                "output_key TEXT PRIMARY KEY, "
+                "output_path TEXT NOT NULL, "
+                "fingerprint TEXT NOT NULL, "
+                "output_signature TEXT NOT NULL, "
+                "version_id INTEGER, "
+                "updated_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+
+    @property
+    def path(self):
+        """The path of the database file."""
+        return self._path
+
+    def is_unchanged(self, output_key, fingerprint):
+        """
+        Returns ``True`` if the output was recorded with the given fingerprint
+        and the files it was recorded with still exist, unchanged.
+
+        :param output_key: The key of the output, as returned by :func:`output_key`.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT output_path, fingerprint, output_signature FROM outputs WHERE output_key = ?",
+                (output_key,)
+            ).fetchone()
+
+        if row is None or row[1] != fingerprint:
+            return False
+        return row[2] == output_signature(row[0])
+
+    def version_id(self, output_key):
+        """
+        Returns the id of the Shotgun Version recorded for the output, or None.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT version_id FROM outputs WHERE output_key = ?", (output_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, output_key, output_path, fingerprint, version_id=None):
+        """
+        Record the fingerprint of the output along with its path, the
+        signature of its current files and the id of the Shotgun Version
+        created for it, if any. Nothing is recorded if there are no files.
+        """
+        signature = output_signature(output_path)
+        if signature is None:
+            self.forget(output_key)
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                (output_key, output_path, fingerprint, signature, version_id, time.time())
+            )
+            self._connection.commit()
+
+    def forget(self, output_key):
+        """
+        Remove the record of the output, so that it is exported next time.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM outputs WHERE output_key = ?", (output_key,))
+            self._connection.commit()
+
+    def close(self):
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def output_key(task):
+    """
+    Returns the key identifying the output of an export task from one export
+    to the next: the guid of its item and its export path template. The
+    tokens of the template are left unresolved, so that the key doesn't change
+    when the output is written to a new version.
+    """
+    return "%s:%s" % (task._item.guid(), os.path.join(task._exportRoot, task._exportPath))
+
+
+def output_signature(output_path):
+    """
+    Returns a signature of the files written to the output path, which may
+    contain a frame number token, or None if there are no files.
+    """
+    pattern = _FRAME_TOKEN_REGEX.sub("*", output_path)
+    if pattern == output_path:
+        files = [output_path] if os.path.isfile(output_path) else []
+    else:
+        files = sorted(glob.glob(pattern))
+
+    if not files:
+        return None
+
+    signature = hashlib.sha1()
+    for path in files:
+        stat = os.stat(path)
+        signature.update("%s:%d:%d\n" % (os.path.basename(path), stat.st_size, int(stat.st_mtime)))
+    return signature.hexdigest()
+
+
+def task_fingerprint(task, processor_properties):
+    """
+    Returns a fingerprint of everything that affects the output of an export
+    task: the source media and range of its items, handles, retimes, effects,
+    and the preset properties.
+
+    :param task: The export task. Its item must still be valid.
+    :param processor_properties: The processor properties that affect the
+        output of the task.
+    """
+    item = task._item
+
+    items = [item]
+    if getattr(task, "_collate", False):
+        items = task._collatedItems
+
+    effects = getattr(task, "_effects", []) + getattr(task, "_annotations", [])
+
+    data = {
+        "task": task.__class__.__name__,
+        "items": [_item_signature(i, item.timelineIn()) for i in items],
+        "effects": [_effect_signature(e, item.timelineIn()) for e in effects],
+        "handles": getattr(task, "_cutHandles", None),
+        "retime": getattr(task, "_retime", None),
+        "start_frame": getattr(task, "_startFrame", None),
+        "preset": task._preset.properties(),
+        "processor": processor_properties,
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=repr)).hexdigest()
+
+
+def _item_signature(item, timeline_offset):
+    """
+    Returns the values of a track item that affect the exported media. The
+    timeline position is relative to the offset, so that moving a shot along
+    the timeline doesn't change it.
+    """
+    source = item.source()
+    try:
+        source_path = source.mediaSource().fileinfos()[0].filename()
+    except Exception:
+        # not a clip with file based media
+        source_path = source.name()
+
+    return [
+        item.name(),
+        item.parentTrack().name(),
+        source_path,
+        item.sourceIn(),
+        item.sourceOut(),
+        item.timelineIn() - timeline_offset,
+        item.timelineOut() - timeline_offset,
+        item.playbackSpeed(),
+        item.isEnabled(),
+    ]
+
+
+def _effect_signature(effect, timeline_offset):
+    """
+    Returns the values of a soft effect or annotation that affect the
+    exported media.
+    """
+    try:
+        import nuke
+        knobs = effect.node().writeKnobs(
+            nuke.WRITE_NON_DEFAULT_ONLY | nuke.TO_SCRIPT | nuke.TO_VALUE)
+    except Exception:
+        # no nuke node to inspect, e.g. annotations
+        knobs = None
+
+    return [
+        effect.name(),
+        effect.timelineIn() - timeline_offset,
+        effect.timelineOut() - timeline_offset,
+        effect.isEnabled(),
+        knobs,
+    ]
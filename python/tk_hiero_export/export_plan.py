@@ -0,0 +1,624 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import json
+import collections
+
+import tank
+
+from .sg_thumbnail_service import CachedThumbnail
+
+
+class ExportPlan(object):
+    """
+    The Shotgun writes an export would make, recorded by a dry run of it.
+
+    The entities created by the plan are given placeholder ids, which are
+    negative, so that the writes which follow can link to them. Updates are
+    merged into the creation of the entity they apply to, or with the other
+    updates of the same entity, so each entity is written once.
+
+    A plan can be written as JSON and loaded again, compared with another
+    plan and applied to Shotgun later. The thumbnails the export would
+    upload and the frames it would render are listed, but not applied.
+    """
+
+    # the version of the JSON written by :meth:`write`
+    FORMAT_VERSION = 1
+
+    def __init__(self):
+        self._operations = []
+        self._created = {}
+        self._updates = {}
+        self._next_placeholder = -1
+
+        # the ids of the entities to create folders for, keyed by type
+        self.filesystem_entities = collections.OrderedDict()
+
+        # the thumbnails and files that would be uploaded, and the files that
+        # would be rendered along with their number of frames
+        self.uploads = []
+        self.renders = []
+
+    def __len__(self):
+        return len(self._operations)
+
+    @property
+    def operations(self):
+        """
+        The writes of the plan, in the order they were made, as dictionaries
+        with the "request_type" ("create", "update", "delete" or "publish")
+        and "entity_type" of the write. Creates and publishes have the
+        placeholder "id" of the new entity, updates and deletes the
+        "entity_id" they apply to. Publishes have the "entity" whose context
+        the file is published in.
+        """
+        return _copy(self._operations)
+
+    def create(self, entity_type, data, return_fields=None):
+        """
+        Plan the creation of an entity. Returns the entity as Shotgun would,
+        with its placeholder id.
+        """
+        operation = {
+            "request_type": "create",
+            "entity_type": entity_type,
+            "id": self._placeholder(),
+            "data": _copy_fields(data),
+        }
+        self._add(operation)
+        return self._entity(operation, list(data.keys()) + list(return_fields or []))
+
+    def publish(self, entity_type, entity, data):
+        """
+        Plan the registration of a publish with Toolkit.
+
+        :param entity_type: The published file entity type.
+        :param entity: The entity whose context the file is published in.
+        :param data: The arguments of ``register_publish`` other than the
+            Toolkit instance and context.
+        :returns: The published file entity, with its placeholder id.
+        """
+        operation = {
+            "request_type": "publish",
+            "entity_type": entity_type,
+            "id": self._placeholder(),
+            "entity": {"type": entity["type"], "id": entity["id"]},
+            "data": _copy_fields(data),
+        }
+        self._add(operation)
+        return self._entity(operation, ["code", "name", "path", "version_number"])
+
+    def update(self, entity_type, entity_id, data):
+        """
+        Plan the update of an entity, merging it with the creation or other
+        updates of the entity.
+        """
+        created = self._created.get(entity_id)
+        if created is not None and created["request_type"] == "create":
+            created["data"].update(_copy_fields(data))
+        else:
+            operation = self._updates.get((entity_type, entity_id))
+            if operation is None:
+                operation = {
+                    "request_type": "update",
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "data": {},
+                }
+                self._updates[(entity_type, entity_id)] = operation
+                self._operations.append(operation)
+            operation["data"].update(_copy_fields(data))
+
+        return dict(_copy_fields(data), type=entity_type, id=entity_id)
+
+    def delete(self, entity_type, entity_id):
+        """
+        Plan the deletion of an entity. Deleting an entity created by the
+        plan drops its creation instead.
+        """
+        update = self._updates.pop((entity_type, entity_id), None)
+        if update is not None:
+            self._operations.remove(update)
+
+        created = self._created.pop(entity_id, None)
+        if created is not None:
+            self._operations.remove(created)
+        else:
+            self._operations.append({
+                "request_type": "delete",
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+            })
+        return True
+
+    def batch(self, requests):
+        """
+        Plan the requests of a Shotgun batch call. Returns their results.
+        """
+        results = []
+        for request in requests:
+            request_type = request["request_type"]
+            entity_type = request["entity_type"]
+            if request_type == "create":
+                results.append(self.create(entity_type, request["data"], request.get("return_fields")))
+            elif request_type == "update":
+                results.append(self.update(entity_type, request["entity_id"], request["data"]))
+            elif request_type == "delete":
+                results.append(self.delete(entity_type, request["entity_id"]))
+            else:
+                raise ValueError("Invalid request_type '%s' in batch request" % (request_type,))
+        return results
+
+    def find_created(self, entity_type, entity_id, fields=None):
+        """
+        Returns the entity created by the plan with the given placeholder id,
+        with the requested fields, or None if the plan doesn't create it.
+        """
+        operation = self._created.get(entity_id)
+        if operation is None or operation["entity_type"] != entity_type:
+            return None
+        return self._entity(operation, fields or [])
+
+    def create_filesystem_structure(self, entity_type, entity_ids):
+        """
+        Plan the creation of the folders of the given entities.
+        """
+        ids = self.filesystem_entities.setdefault(entity_type, [])
+        ids.extend(i for i in entity_ids if i not in ids)
+
+    def record_upload(self, kind, entity, path=None):
+        """
+        Record a thumbnail or file the export would upload for an entity.
+        """
+        self.uploads.append({
+            "kind": kind,
+            "entity": {"type": entity["type"], "id": entity["id"]},
+            "path": path,
+        })
+
+    def record_render(self, path, frames):
+        """
+        Record a file the export would render, with its number of frames.
+        """
+        self.renders.append({"path": path, "frames": frames})
+
+    def thumbnail_service(self):
+        """
+        Returns a stand-in for the export's thumbnail service, recording the
+        thumbnails uploaded with it in the plan without rendering them.
+        """
+        return _PlannedThumbnails(self)
+
+    def summary(self):
+        """
+        Returns the lines of a summary of the plan, for the log.
+        """
+        counts = collections.Counter(
+            (op["request_type"], op["entity_type"]) for op in self._operations)
+        lines = ["Export plan: %s Shotgun writes." % (len(self._operations),)]
+        for ((request_type, entity_type), count) in sorted(counts.items()):
+            lines.append("%-10s %-20s %7d" % (request_type, entity_type, count))
+
+        for (entity_type, entity_ids) in self.filesystem_entities.items():
+            lines.append("Folders would be created for %s %s entities." % (len(entity_ids), entity_type))
+
+        uploads = collections.Counter(upload["kind"] for upload in self.uploads)
+        for (kind, count) in sorted(uploads.items()):
+            lines.append("%s %s uploads would be made." % (count, kind))
+
+        lines.append("%s files would be rendered, %s frames in all." % (
+            len(self.renders), sum(render["frames"] for render in self.renders)))
+        return lines
+
+    def to_dict(self):
+        """
+        Returns a dictionary describing the plan, which can be written as JSON.
+        """
+        return {
+            "format_version": self.FORMAT_VERSION,
+            "operations": _copy(self._operations),
+            "filesystem_entities": [[t, list(ids)] for (t, ids) in self.filesystem_entities.items()],
+            "uploads": _copy(self.uploads),
+            "renders": _copy(self.renders),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Returns the plan described by a dictionary returned by :meth:`to_dict`.
+        """
+        if data.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError("Unsupported export plan format: %s" % (data.get("format_version"),))
+
+        plan = cls()
+        for operation in data["operations"]:
+            if "id" in operation:
+                plan._add(operation)
+                plan._next_placeholder = min(plan._next_placeholder, operation["id"] - 1)
+                continue
+            if operation["request_type"] == "update":
+                plan._updates[(operation["entity_type"], operation["entity_id"])] = operation
+            plan._operations.append(operation)
+
+        plan.filesystem_entities = collections.OrderedDict(
+            (entity_type, list(ids)) for (entity_type, ids) in data.get("filesystem_entities", []))
+        plan.uploads = list(data.get("uploads", []))
+        plan.renders = list(data.get("renders", []))
+        return plan
+
+    def write(self, path):
+        """
+        Write the plan as JSON to the given path.
+        """
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(path, "w") as f:
+            f.write(json.dumps(self.to_dict(), default=repr))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns the plan written to the given path by :meth:`write`.
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def diff(self, other):
+        """
+        Returns the differences between another plan, e.g. that of an earlier
+        dry run, and this one.
+
+        The writes of the plans are matched by their request and entity types
+        and the code, name or path of the entity, or the id of the entity
+        updated or deleted. The placeholder ids of the plans differ, so links
+        to the entities they create are compared by type and code as well.
+
+        :returns: A list of dictionaries with the "change" ("added",
+            "removed" or "changed") and the "key" of a write. Changed writes
+            also have the "fields" that differ, mapped to a tuple of the
+            other plan's value and this plan's value.
+        """
+        (theirs, mine) = (other._keyed(), self._keyed())
+
+        changes = []
+        for key in sorted(set(theirs) | set(mine)):
+            if key not in theirs:
+                changes.append({"change": "added", "key": key})
+            elif key not in mine:
+                changes.append({"change": "removed", "key": key})
+            else:
+                fields = dict(
+                    (field, (theirs[key].get(field), mine[key].get(field)))
+                    for field in set(theirs[key]) | set(mine[key])
+                    if theirs[key].get(field) != mine[key].get(field)
+                )
+                if fields:
+                    changes.append({"change": "changed", "key": key, "fields": fields})
+        return changes
+
+    def apply(self, app):
+        """
+        Make the writes of the plan in Shotgun and create the folders it
+        lists.
+
+        Shotgun can't link to an entity created in the same batch request,
+        so the writes are made with a batch request for each level of
+        dependency between them: e.g. the Shots, then their CutItems, then
+        the Versions linked to both. Publishes are registered with Toolkit.
+
+        :param app: The app instance used to access Shotgun and Toolkit.
+        :returns: A dictionary of the entities created, keyed by their
+            placeholder ids.
+        """
+        created = {}
+        pending = [(op, _placeholders(op)) for op in self._operations]
+        while pending:
+            ready = [op for (op, links) in pending if all(link in created for link in links)]
+            if not ready:
+                raise ValueError("The export plan links to entities it doesn't create.")
+
+            (requests, batched) = ([], [])
+            for op in ready:
+                if op["request_type"] == "publish":
+                    entity = _resolve(op["entity"], created)
+                    ctx = app.tank.context_from_entity(entity["type"], entity["id"])
+                    created[op["id"]] = tank.util.register_publish(
+                        tk=app.tank, context=ctx, **_resolve(op["data"], created))
+                    continue
+
+                request = {"request_type": op["request_type"], "entity_type": op["entity_type"]}
+                if op["request_type"] == "create":
+                    request["data"] = _resolve(op["data"], created)
+                else:
+                    request["entity_id"] = _resolve_id(op["entity_id"], created)
+                    if op["request_type"] == "update":
+                        request["data"] = _resolve(op["data"], created)
+                requests.append(request)
+                batched.append(op)
+
+            if requests:
+                app.log_debug("Applying %s planned Shotgun writes..." % (len(requests),))
+                for (op, result) in zip(batched, app.shotgun.batch(requests)):
+                    if op["request_type"] == "create":
+                        created[op["id"]] = result
+
+            applied = set(id(op) for op in ready)
+            pending = [(op, links) for (op, links) in pending if id(op) not in applied]
+
+        for (entity_type, entity_ids) in self.filesystem_entities.items():
+            entity_ids = [_resolve_id(i, created) for i in entity_ids]
+            app.tank.create_filesystem_structure(entity_type, entity_ids)
+
+        return created
+
+    def _placeholder(self):
+        placeholder = self._next_placeholder
+        self._next_placeholder -= 1
+        return placeholder
+
+    def _add(self, operation):
+        self._created[operation["id"]] = operation
+        self._operations.append(operation)
+
+    def _entity(self, operation, fields):
+        """
+        Returns the entity created by an operation with the given fields, as
+        Shotgun returns it.
+        """
+        entity = {"type": operation["entity_type"], "id": operation["id"]}
+        for field in fields:
+            entity[field] = _copy(operation["data"].get(field))
+        return entity
+
+    def _keyed(self):
+        """
+        Returns the data of the writes of the plan keyed as :meth:`diff`
+        matches them, with the links to the entities the plan creates
+        replaced by descriptions of them.
+        """
+        names = {}
+        for op in self._operations:
+            if "id" in op:
+                data = op["data"]
+                names[op["id"]] = "%s %s" % (
+                    op["entity_type"], data.get("code") or data.get("name") or data.get("path") or op["id"])
+
+        keyed = {}
+        for op in self._operations:
+            if "id" in op:
+                key = "%s %s" % (op["request_type"], names[op["id"]])
+            elif op["entity_id"] in names:
+                key = "%s new %s" % (op["request_type"], names[op["entity_id"]])
+            else:
+                key = "%s %s %s" % (op["request_type"], op["entity_type"], op["entity_id"])
+
+            # entities sharing a code are told apart by their order
+            unique_key = key
+            count = 1
+            while unique_key in keyed:
+                count += 1
+                unique_key = "%s #%s" % (key, count)
+
+            data = _describe(op.get("data", {}), names)
+            if "entity" in op:
+                data["entity"] = _describe(op["entity"], names)
+            keyed[unique_key] = data
+        return keyed
+
+
+class PlanningShotgun(object):
+    """
+    Proxy for a Shotgun connection recording the writes made with it in an
+    :class:`ExportPlan` rather than making them.
+
+    Reads are passed on to Shotgun, except for those of the entities created
+    by the plan, which are answered by the plan. Links to those entities are
+    left out of the filters of other reads, as Shotgun can't match them.
+    """
+
+    def __init__(self, shotgun, plan):
+        """
+        :param shotgun: The Shotgun connection to read with.
+        :param plan: The :class:`ExportPlan` recording the writes.
+        """
+        self._shotgun = shotgun
+        self._plan = plan
+
+    def __getattr__(self, name):
+        return getattr(self._shotgun, name)
+
+    def find(self, entity_type, filters, fields=None, *args, **kwargs):
+        planned = self._find_created(entity_type, filters, fields)
+        if planned is not None:
+            return planned
+        filters = _without_placeholders(filters)
+        if filters is None:
+            return []
+        return self._shotgun.find(entity_type, filters, fields, *args, **kwargs)
+
+    def find_one(self, entity_type, filters, fields=None, *args, **kwargs):
+        planned = self._find_created(entity_type, filters, fields)
+        if planned is not None:
+            return (planned or [None])[0]
+        filters = _without_placeholders(filters)
+        if filters is None:
+            return None
+        return self._shotgun.find_one(entity_type, filters, fields, *args, **kwargs)
+
+    def create(self, entity_type, data, return_fields=None):
+        return self._plan.create(entity_type, data, return_fields)
+
+    def update(self, entity_type, entity_id, data, *args, **kwargs):
+        return self._plan.update(entity_type, entity_id, data)
+
+    def delete(self, entity_type, entity_id):
+        return self._plan.delete(entity_type, entity_id)
+
+    def batch(self, requests):
+        return self._plan.batch(requests)
+
+    def upload(self, entity_type, entity_id, path, field_name=None, *args, **kwargs):
+        self._plan.record_upload(field_name or "file", {"type": entity_type, "id": entity_id}, path)
+
+    def upload_thumbnail(self, entity_type, entity_id, path, **kwargs):
+        self._plan.record_upload("thumbnail", {"type": entity_type, "id": entity_id})
+
+    def share_thumbnail(self, entities, *args, **kwargs):
+        for entity in entities:
+            self._plan.record_upload("thumbnail", entity)
+
+    def _find_created(self, entity_type, filters, fields):
+        """
+        Returns the result of a query of an entity created by the plan, by
+        its placeholder id, or None if the query is for other entities.
+        """
+        for f in filters if isinstance(filters, list) else []:
+            if isinstance(f, (list, tuple)) and len(f) == 3 and f[0] == "id" and f[1] == "is" \
+                    and _is_placeholder(f[2]):
+                entity = self._plan.find_created(entity_type, f[2], fields)
+                return [entity] if entity is not None else []
+        return None
+
+
+class _PlannedThumbnails(object):
+    """
+    Stands in for the :class:`ThumbnailService` of a dry run, recording the
+    thumbnails the export would upload without rendering them.
+    """
+
+    def __init__(self, plan):
+        self._plan = plan
+
+    def get(self, source_guid, frame, render, width=600):
+        return CachedThumbnail(None, "%s:%s:%s" % (source_guid, frame, width))
+
+    def upload(self, entity, thumbnail):
+        self._plan.record_upload("thumbnail", entity)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _copy_fields(data):
+    """
+    Returns a copy of the field values of a write. See :func:`_copy`.
+    """
+    return dict((field, _copy(value)) for (field, value) in data.items())
+
+
+def _copy(value):
+    """
+    Returns a copy of a field value, with the entities it links to reduced
+    to their type and id, which is all Shotgun reads of a link.
+    """
+    if isinstance(value, dict):
+        if "type" in value and "id" in value:
+            return {"type": value["type"], "id": value["id"]}
+        return dict((k, _copy(v)) for (k, v) in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _is_placeholder(value):
+    """
+    Returns True if the value is the id of an entity created by a plan.
+    """
+    return isinstance(value, (int, long)) and not isinstance(value, bool) and value < 0
+
+
+def _is_placeholder_link(value):
+    return isinstance(value, dict) and "type" in value and _is_placeholder(value.get("id"))
+
+
+def _placeholders(operation):
+    """
+    Returns the placeholder ids an operation of a plan links to.
+    """
+    found = set()
+
+    def collect(value):
+        if _is_placeholder_link(value):
+            found.add(value["id"])
+        elif isinstance(value, dict):
+            for v in value.values():
+                collect(v)
+        elif isinstance(value, (list, tuple)):
+            for v in value:
+                collect(v)
+
+    collect(operation.get("data"))
+    collect(operation.get("entity"))
+    if _is_placeholder(operation.get("entity_id")):
+        found.add(operation["entity_id"])
+    return found
+
+
+def _resolve_id(entity_id, created):
+    if _is_placeholder(entity_id):
+        return created[entity_id]["id"]
+    return entity_id
+
+
+def _resolve(value, created):
+    """
+    Returns a copy of the value with the links to the entities created by a
+    plan replaced by links to the entities created in Shotgun.
+    """
+    if _is_placeholder_link(value):
+        return {"type": value["type"], "id": created[value["id"]]["id"]}
+    if isinstance(value, dict):
+        return dict((k, _resolve(v, created)) for (k, v) in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_resolve(v, created) for v in value]
+    return value
+
+
+def _describe(value, names):
+    """
+    Returns a copy of the value with the links to the entities created by a
+    plan replaced by their description.
+    """
+    if _is_placeholder_link(value):
+        return "new %s" % (names.get(value["id"], value["type"]),)
+    if isinstance(value, dict):
+        return dict((k, _describe(v, names)) for (k, v) in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_describe(v, names) for v in value]
+    return value
+
+
+def _without_placeholders(filters):
+    """
+    Returns the filters without the links to the entities created by a plan,
+    or None if the filters can only match those entities.
+    """
+    if not isinstance(filters, list):
+        return filters
+
+    result = []
+    for f in filters:
+        if isinstance(f, (list, tuple)) and len(f) == 3:
+            (field, operator, value) = f
+            if operator == "is" and _is_placeholder_link(value):
+                return None
+            if operator == "in" and isinstance(value, (list, tuple)):
+                values = [v for v in value if not _is_placeholder_link(v)]
+                if not values:
+                    return None
+                f = [field, operator, values]
+        result.append(f)
+    return result
@@ -0,0 +1,232 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import json
+import time
+import functools
+import threading
+
+
+class ExportTracer(object):
+    """
+    Records the time spent in the parts of an export as spans, and writes
+    them to a file in the Chrome trace event format. The file can be loaded
+    in chrome://tracing or https://ui.perfetto.dev.
+
+    Spans may be recorded from any thread. The file is written once the
+    export has finished and the spans still open at that point have ended.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path of the trace file to write.
+        """
+        self._path = path
+        self._start = time.time()
+        self._events = []
+        self._thread_names = {}
+        self._open_spans = 0
+        self._finished = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        """The path of the trace file."""
+        return self._path
+
+    def span(self, name, category, args=None):
+        """
+        Returns a context manager recording a span for the code it wraps.
+
+        :param name: The name of the span.
+        :param category: The category of the span, e.g. "task" or "shotgun".
+        :param args: An optional dictionary of values shown with the span.
+        """
+        return _Span(self, name, category, args)
+
+    def wrap(self, function, name, category, args=None):
+        """
+        Returns a callable recording a span for each call to the function.
+        """
+        @functools.wraps(function)
+        def traced_function(*a, **kw):
+            with self.span(name, category, args):
+                return function(*a, **kw)
+        return traced_function
+
+    def finish(self):
+        """
+        Write the trace file, once the spans still open have ended.
+        """
+        with self._lock:
+            self._finished = True
+            write = self._open_spans == 0
+        if write:
+            self._write()
+
+    def _begin(self):
+        with self._lock:
+            self._open_spans += 1
+
+    def _end(self, name, category, args, start, end):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": int((start - self._start) * 1000000),
+            "dur": int((end - start) * 1000000),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+
+        with self._lock:
+            self._events.append(event)
+            self._thread_names[thread.ident] = thread.name
+            self._open_spans -= 1
+            write = self._finished and self._open_spans == 0
+        if write:
+            self._write()
+
+    def _write(self):
+        """
+        Write the recorded spans to the trace file.
+        """
+        with self._lock:
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+                for (tid, thread_name) in self._thread_names.items()
+            ]
+            events.extend(self._events)
+
+        folder = os.path.dirname(self._path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(self._path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=repr)
+
+
+class _Span(object):
+    """
+    Context manager recording a span with an :class:`ExportTracer`.
+    """
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._tracer._begin()
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        args = self._args
+        if exc_type is not None:
+            args = dict(args or {}, error=repr(exc_value))
+        self._tracer._end(self._name, self._category, args, self._start, time.time())
+        return False
+
+
+class _NullSpan(object):
+    """
+    Context manager used in place of a span when the export isn't traced.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def trace_span(tracer, name, category, args=None):
+    """
+    Returns a context manager recording a span with the tracer, which does
+    nothing if the tracer is None.
+    """
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, args)
+
+
+def traced(category, name=None):
+    """
+    Decorator recording a span for each call to a method of an object with an
+    ``app`` attribute, when the app has an export tracer.
+
+    :param category: The category of the spans.
+    :param name: The name of the spans. Defaults to the method name.
+    """
+    def decorator(method):
+        span_name = name or method.__name__
+
+        @functools.wraps(method)
+        def traced_method(self, *args, **kwargs):
+            with trace_span(getattr(self.app, "tracer", None), span_name, category):
+                return method(self, *args, **kwargs)
+        return traced_method
+    return decorator
+
+
+def item_args(task=None, item=None):
+    """
+    Returns the span arguments describing a task and the item it exports.
+    """
+    args = {}
+    if task is not None:
+        args["task"] = task.__class__.__name__
+        item = getattr(task, "_item", item)
+    if item is not None and hasattr(item, "name"):
+        args["shot"] = item.name()
+    return args
+
+
+class TracingShotgun(object):
+    """
+    Proxy for a Shotgun connection recording a span for each API call.
+    """
+
+    def __init__(self, shotgun, tracer):
+        """
+        :param shotgun: The Shotgun connection to trace.
+        :param tracer: The :class:`ExportTracer` recording the calls.
+        """
+        self._shotgun = shotgun
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attribute = getattr(self._shotgun, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+
+        tracer = self._tracer
+
+        def traced_call(*args, **kwargs):
+            span_args = None
+            if args and isinstance(args[0], basestring):
+                span_args = {"entity_type": args[0]}
+            with tracer.span(name, "shotgun", span_args):
+                return attribute(*args, **kwargs)
+        return traced_call
@@ -11,7 +11,6 @@
 import re
 import os
 import sys
-import ast
 
 from hiero.exporters import FnAudioExportTask
 from hiero.exporters import FnAudioExportUI
@@ -85,7 +84,7 @@ class ShotgunAudioExporter(ShotgunHieroObjectBase, FnAudioExportTask.AudioExport
 
         # call the get_shot hook
         ########################
-        if self.app.shot_count == 0:
+        if not hasattr(self.app, "preprocess_data"):
             self.app.preprocess_data = {}
 
         # associate publishes with correct shot, which will be the hero item
@@ -100,23 +99,12 @@ class ShotgunAudioExporter(ShotgunHieroObjectBase, FnAudioExportTask.AudioExport
 
         ##############################
         # see if we get a task to use
-        self._sg_task = None
-        try:
-            task_filter = self.app.get_setting("default_task_filter", "[]")
-            task_filter = ast.literal_eval(task_filter)
-            task_filter.append(["entity", "is", self._sg_shot])
-            tasks = self.app.shotgun.find("Task", task_filter)
-            if len(tasks) == 1:
-                self._sg_task = tasks[0]
-        except ValueError:
-            # continue without task
-            setting = self.app.get_setting("default_task_filter", "[]")
-            self.app.log_error("Invalid value for 'default_task_filter': %s" % setting)
+        self._sg_task = self._get_default_task(self._sg_shot)
 
         # figure out the thumbnail frame
         ##########################
         source = self._item.source()
-        self._thumbnail = source.thumbnail(source.posterFrame())
+        self._thumbnail = self._get_thumbnail(source, source.posterFrame())
 
         return FnAudioExportTask.AudioExportTask.startTask(self)
 
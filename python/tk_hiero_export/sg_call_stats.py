@@ -0,0 +1,248 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import sys
+import json
+import time
+import heapq
+import threading
+
+# the modules whose frames are skipped when finding where a call came from
+_PROXY_MODULES = ("sg_call_stats", "export_tracer", "export_plan")
+
+# the upper bounds of the latency histogram buckets, in seconds
+_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# the methods that only read from Shotgun, whose identical calls are reported
+_READ_METHODS = ("find", "find_one", "summarize", "text_search", "schema_read", "schema_field_read")
+
+
+class ShotgunCallStats(object):
+    """
+    Accounts for the Shotgun API calls made during an export.
+
+    Calls are counted by method and entity type, with a latency histogram and
+    the size of the data sent and received, and by the module and function
+    they were made from. The slowest calls and any identical read queries
+    made more than once are reported as well.
+    """
+
+    def __init__(self, slowest_count=20):
+        """
+        :param slowest_count: The number of slowest calls to report.
+        """
+        self._slowest_count = slowest_count
+        self._start = time.time()
+        self._by_call = {}
+        self._by_origin = {}
+        self._queries = {}
+        self._slowest = []
+        self._lock = threading.Lock()
+
+    def record(self, method, args, kwargs, result, duration, origin):
+        """
+        Record a call made to the Shotgun API.
+
+        :param method: The name of the API method called.
+        :param args: The positional arguments of the call.
+        :param kwargs: The keyword arguments of the call.
+        :param result: The value returned by the call, or the error raised.
+        :param duration: The time the call took, in seconds.
+        :param origin: A description of the code the call was made from.
+        """
+        entity_type = args[0] if args and isinstance(args[0], basestring) else None
+        request = _dumps([args, kwargs])
+        response_size = _size(result)
+
+        bucket = len(_LATENCY_BUCKETS)
+        for (i, bound) in enumerate(_LATENCY_BUCKETS):
+            if duration < bound:
+                bucket = i
+                break
+
+        with self._lock:
+            stats = self._by_call.setdefault((method, entity_type), {
+                "calls": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "request_bytes": 0,
+                "response_bytes": 0,
+                "latency_histogram": [0] * (len(_LATENCY_BUCKETS) + 1),
+            })
+            stats["calls"] += 1
+            stats["seconds"] += duration
+            stats["max_seconds"] = max(stats["max_seconds"], duration)
+            stats["request_bytes"] += len(request)
+            stats["response_bytes"] += response_size
+            stats["latency_histogram"][bucket] += 1
+
+            origin_stats = self._by_origin.setdefault(origin, {"calls": 0, "seconds": 0.0})
+            origin_stats["calls"] += 1
+            origin_stats["seconds"] += duration
+
+            if method in _READ_METHODS:
+                query = self._queries.setdefault((method, request), {"calls": 0, "seconds": 0.0, "origins": set()})
+                query["calls"] += 1
+                query["seconds"] += duration
+                query["origins"].add(origin)
+
+            call = (duration, method, entity_type, origin, request)
+            if len(self._slowest) < self._slowest_count:
+                heapq.heappush(self._slowest, call)
+            else:
+                heapq.heappushpop(self._slowest, call)
+
+    def report(self):
+        """
+        Returns a dictionary describing the calls recorded, which can be
+        written as JSON.
+        """
+        with self._lock:
+            calls = [
+                dict(stats, method=method, entity_type=entity_type)
+                for ((method, entity_type), stats) in self._by_call.items()
+            ]
+            origins = [
+                dict(stats, origin=origin) for (origin, stats) in self._by_origin.items()
+            ]
+            duplicates = [
+                {
+                    "method": method,
+                    "request": request,
+                    "calls": query["calls"],
+                    "seconds": query["seconds"],
+                    "origins": sorted(query["origins"]),
+                }
+                for ((method, request), query) in self._queries.items() if query["calls"] > 1
+            ]
+            slowest = [
+                {
+                    "seconds": duration,
+                    "method": method,
+                    "entity_type": entity_type,
+                    "origin": origin,
+                    "request": request,
+                }
+                for (duration, method, entity_type, origin, request) in sorted(self._slowest, reverse=True)
+            ]
+
+        return {
+            "elapsed_seconds": time.time() - self._start,
+            "total_calls": sum(c["calls"] for c in calls),
+            "total_seconds": sum(c["seconds"] for c in calls),
+            "latency_buckets": list(_LATENCY_BUCKETS),
+            "calls": sorted(calls, key=lambda c: c["seconds"], reverse=True),
+            "origins": sorted(origins, key=lambda o: o["seconds"], reverse=True),
+            "slowest_calls": slowest,
+            "duplicate_queries": sorted(duplicates, key=lambda d: d["seconds"], reverse=True),
+        }
+
+    def summary(self, report=None):
+        """
+        Returns the lines of a table summarizing the calls, for the log.
+        """
+        report = report or self.report()
+        lines = [
+            "Shotgun API calls: %s calls in %.2fs of a %.2fs export." % (
+                report["total_calls"], report["total_seconds"], report["elapsed_seconds"]),
+            "%-20s %-20s %7s %9s %9s %9s %11s %11s" % (
+                "method", "entity type", "calls", "total s", "mean ms", "max ms", "sent KB", "recv KB"),
+        ]
+        for c in report["calls"]:
+            lines.append("%-20s %-20s %7d %9.2f %9.1f %9.1f %11.1f %11.1f" % (
+                c["method"], c["entity_type"] or "-", c["calls"], c["seconds"],
+                1000.0 * c["seconds"] / c["calls"], 1000.0 * c["max_seconds"],
+                c["request_bytes"] / 1024.0, c["response_bytes"] / 1024.0))
+
+        lines.append("%-41s %7s %9s" % ("origin", "calls", "total s"))
+        for o in report["origins"]:
+            lines.append("%-41s %7d %9.2f" % (o["origin"], o["calls"], o["seconds"]))
+
+        if report["duplicate_queries"]:
+            lines.append("%s queries were made more than once, %s calls in all." % (
+                len(report["duplicate_queries"]),
+                sum(d["calls"] for d in report["duplicate_queries"])))
+        return lines
+
+    def write(self, path, report=None):
+        """
+        Write the report as JSON to the given path.
+        """
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(path, "w") as f:
+            json.dump(report or self.report(), f, indent=2, sort_keys=True)
+
+
+class AccountingShotgun(object):
+    """
+    Proxy for a Shotgun connection recording each API call made with it in
+    a :class:`ShotgunCallStats`.
+    """
+
+    def __init__(self, shotgun, stats):
+        """
+        :param shotgun: The Shotgun connection to account for.
+        :param stats: The :class:`ShotgunCallStats` recording the calls.
+        """
+        self._shotgun = shotgun
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self._shotgun, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+
+        stats = self._stats
+
+        def accounted_call(*args, **kwargs):
+            origin = _origin()
+            start = time.time()
+            result = None
+            try:
+                result = attribute(*args, **kwargs)
+                return result
+            except Exception, e:
+                result = repr(e)
+                raise
+            finally:
+                stats.record(name, args, kwargs, result, time.time() - start, origin)
+        return accounted_call
+
+
+def _origin():
+    """
+    Returns the module and function the current Shotgun call was made from.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        if module not in _PROXY_MODULES:
+            return "%s.%s" % (module, frame.f_code.co_name)
+        frame = frame.f_back
+    return "unknown"
+
+
+def _dumps(value):
+    """
+    Returns the JSON of a value sent to or received from Shotgun. The keys are
+    sorted, so that identical requests have identical JSON.
+    """
+    return json.dumps(value, sort_keys=True, default=repr)
+
+
+def _size(value):
+    """
+    Returns the size of the JSON of a value received from Shotgun. Responses
+    can be large and are only measured, so their keys aren't sorted.
+    """
+    return len(json.dumps(value, default=repr))
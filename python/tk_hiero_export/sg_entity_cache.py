@@ -0,0 +1,266 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import json
+import time
+import sqlite3
+import datetime
+import threading
+
+
+class ShotgunEntityCache(object):
+    """
+    On-disk cache of the results of Shotgun queries for read-mostly entities,
+    such as Sequences, Scenes and TaskTemplates, kept between sessions.
+
+    Results are reused until they are older than the time to live. Before the
+    results for an entity type are first reused after :meth:`refresh`, the
+    entities of that type changed since the last check are queried in one go.
+    The cached copies of the changed entities are updated, and any result the
+    changes could add entities to or remove them from is dropped, so that it's
+    queried again. Entities deleted in Shotgun don't show up as changes, so they can
+    be returned until their results expire.
+    """
+
+    # the name of the database file
+    FILE_NAME = "sg_entity_cache.db"
+
+    # seconds subtracted from the time of each check for changes, to allow
+    # for the clock of this machine being ahead of the Shotgun server's
+    _clock_skew = 60
+
+    # filter operators that can be checked against changed entities
+    _operators = ("is", "is_not", "in", "not_in")
+
+    def __init__(self, app, path, ttl):
+        """
+        :param app: The app instance used to access Shotgun and for logging.
+        :param path: The path of the database file.
+        :param ttl: The number of seconds results are reused for.
+        """
+        self._app = app
+        self._path = path
+        self._ttl = ttl
+
+        # the entity types checked for changes since the last refresh
+        self._revalidated = set()
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "entity_type TEXT NOT NULL, "
+                "filters TEXT NOT NULL, "
+                "fields TEXT NOT NULL, "
+                "entities TEXT NOT NULL, "
+                "cached_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS syncs ("
+                "entity_type TEXT PRIMARY KEY, "
+                "synced_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+
+    @property
+    def path(self):
+        """The path of the database file."""
+        return self._path
+
+    def refresh(self):
+        """
+        Check each entity type for changes again before its results are next
+        reused. This is called as each export starts.
+        """
+        self._revalidated = set()
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM results WHERE cached_at < ?", (time.time() - self._ttl,))
+            self._connection.commit()
+
+    def find(self, entity_type, filters, fields=None):
+        """
+        Returns the entities matching the filters, as the ``find`` method of
+        the Shotgun API does, querying Shotgun only if there is no valid
+        cached result.
+
+        Queries whose filters or results can't be stored as JSON aren't
+        cached.
+        """
+        fields = sorted(set(fields or []))
+        try:
+            key = json.dumps([entity_type, filters, fields], sort_keys=True)
+        except TypeError:
+            # e.g. filtering on dates, which can't be stored
+            return self._app.shotgun.find(entity_type, filters, fields)
+
+        self._revalidate(entity_type)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT entities, cached_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is not None and row[1] >= time.time() - self._ttl:
+            return json.loads(row[0])
+
+        entities = self._app.shotgun.find(entity_type, filters, fields)
+        try:
+            data = json.dumps(entities)
+        except TypeError:
+            return entities
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entity_type, json.dumps(filters), json.dumps(fields), data, time.time())
+            )
+            self._connection.commit()
+        return json.loads(data)
+
+    def find_one(self, entity_type, filters, fields=None):
+        """
+        Returns the first entity matching the filters, or None.
+        """
+        entities = self.find(entity_type, filters, fields)
+        if entities:
+            return entities[0]
+        return None
+
+    def invalidate(self, entity_type):
+        """
+        Drop the results for the entity type, e.g. after creating an entity
+        that they may be missing.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM results WHERE entity_type = ?", (entity_type,))
+            self._connection.commit()
+
+    def close(self):
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _revalidate(self, entity_type):
+        """
+        Query the entities of the given type that changed since it was last
+        checked, and drop the results they may affect.
+        """
+        if entity_type in self._revalidated:
+            return
+        self._revalidated.add(entity_type)
+
+        with self._lock:
+            sync = self._connection.execute(
+                "SELECT synced_at FROM syncs WHERE entity_type = ?", (entity_type,)
+            ).fetchone()
+            results = self._connection.execute(
+                "SELECT key, filters, fields, entities FROM results WHERE entity_type = ?",
+                (entity_type,)
+            ).fetchall()
+
+        now = time.time()
+        if sync is None or not results:
+            # nothing cached that could be out of date
+            self._set_synced(entity_type, now)
+            return
+
+        fields = set()
+        for (key, filters, result_fields, entities) in results:
+            fields.update(json.loads(result_fields))
+            fields.update(f[0] for f in json.loads(filters) if self._is_simple_filter(f))
+
+        since = datetime.datetime.fromtimestamp(sync[0] - self._clock_skew)
+        changes = self._app.shotgun.find(
+            entity_type, [["updated_at", "greater_than", since]], sorted(fields))
+
+        (updated, stale) = ([], [])
+        for (key, filters, result_fields, entities) in results:
+            entities = self._apply_changes(
+                json.loads(filters), json.loads(result_fields), json.loads(entities), changes)
+            if entities is None:
+                stale.append((key,))
+            else:
+                updated.append((json.dumps(entities), key))
+
+        with self._lock:
+            self._connection.executemany("DELETE FROM results WHERE key = ?", stale)
+            self._connection.executemany("UPDATE results SET entities = ? WHERE key = ?", updated)
+            self._connection.commit()
+        self._set_synced(entity_type, now)
+
+        self._app.log_debug(
+            "%s %s entities changed since they were cached, %s of %s cached results dropped." %
+            (len(changes), entity_type, len(stale), len(results)))
+
+    def _set_synced(self, entity_type, synced_at):
+        """
+        Record the time the entity type was checked for changes.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?)", (entity_type, synced_at))
+            self._connection.commit()
+
+    def _is_simple_filter(self, filter):
+        """
+        Returns True if the filter is a field condition that can be checked
+        against an entity.
+        """
+        return (
+            isinstance(filter, list) and len(filter) == 3 and
+            isinstance(filter[0], basestring) and filter[1] in self._operators
+        )
+
+    def _apply_changes(self, filters, fields, entities, changes):
+        """
+        Returns the cached result of the filters with the changes applied, or
+        None if the changes may have added entities to it or removed them.
+        """
+        by_id = dict((e["id"], e) for e in entities)
+        for change in changes:
+            matches = True
+            for filter in filters:
+                if not self._is_simple_filter(filter):
+                    return None
+                if not self._matches(change.get(filter[0]), filter[1], filter[2]):
+                    matches = False
+                    break
+
+            if matches != (change["id"] in by_id):
+                return None
+            if matches:
+                by_id[change["id"]].update((f, change.get(f)) for f in fields)
+        return entities
+
+    def _matches(self, value, operator, filter_value):
+        """
+        Returns True if the field value meets the condition.
+        """
+        if operator in ("in", "not_in"):
+            found = any(self._equals(value, v) for v in filter_value)
+        else:
+            found = self._equals(value, filter_value)
+        return found == (operator in ("is", "in"))
+
+    def _equals(self, value, filter_value):
+        """
+        Compare a field value with a filter value as Shotgun does: entities by
+        type and id, and text ignoring case.
+        """
+        if isinstance(value, dict) and isinstance(filter_value, dict):
+            return (value.get("type"), value.get("id")) == (filter_value.get("type"), filter_value.get("id"))
+        if isinstance(value, basestring) and isinstance(filter_value, basestring):
+            return value.lower() == filter_value.lower()
+        return value == filter_value
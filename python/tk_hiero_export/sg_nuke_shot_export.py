@@ -11,7 +11,6 @@
 import re
 import os
 import sys
-import ast
 
 from hiero.core import nuke
 from hiero.exporters import FnNukeShotExporter
@@ -138,7 +137,7 @@ class ShotgunNukeShotExporter(ShotgunHieroObjectBase, FnNukeShotExporter.NukeSho
 
 
         source = self._item.source()
-        self._thumbnail = source.thumbnail(source.posterFrame())
+        self._thumbnail = self._get_thumbnail(source, source.posterFrame())
         
         return FnNukeShotExporter.NukeShotExporter.taskStep(self)
 
@@ -176,16 +175,9 @@ class ShotgunNukeShotExporter(ShotgunHieroObjectBase, FnNukeShotExporter.NukeSho
 
         # see if we get a task to use
         if (ctx.entity is not None) and (ctx.entity.get("type", "") == "Shot"):
-            try:
-                task_filter = self.app.get_setting("default_task_filter", "[]")
-                task_filter = ast.literal_eval(task_filter)
-                task_filter.append(["entity", "is", ctx.entity])
-                tasks = self.app.shotgun.find("Task", task_filter)
-                if len(tasks) == 1:
-                    args["task"] = tasks[0]
-            except ValueError:
-                # continue without task
-                self.app.log_error("Invalid value for 'default_task_filter'")
+            sg_task = self._get_default_task(ctx.entity)
+            if sg_task is not None:
+                args["task"] = sg_task
 
         publish_entity_type = sgtk.util.get_published_file_entity_type(self.app.sgtk)
 
@@ -8,7 +8,10 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import os
+import datetime
 import itertools
+import threading
 
 import sgtk
 from sgtk.platform.qt import QtGui
@@ -17,6 +20,7 @@ import hiero.core
 from hiero.core import FnExporterBase
 
 from hiero.exporters import FnShotProcessor
+from hiero.ui.FnUIProperty import UIPropertyFactory
 
 
 # For Hiero versions prior to 9.0 the ShotProcessor class
@@ -34,11 +38,19 @@ except ImportError:
     ShotProcessorUI = FnShotProcessor.ShotProcessor
 
 from .base import ShotgunHieroObjectBase
+from .timecode import TimecodeFormatter
 from .version_creator import ShotgunTranscodeExporter
 from .shot_updater import ShotgunShotUpdaterPreset
 from .shot_updater import ShotgunShotUpdater
-from .collating_exporter import CollatedShotPreset
+from .collating_exporter import CollatingExporter, CollatedShotPreset, clearCollationIndexes
 from .collating_exporter_ui import CollatingExporterUI
+from .sg_update_buffer import ShotgunUpdateBuffer
+from .sg_upload_pool import ShotgunUploadPool
+from .sg_thumbnail_service import ThumbnailService
+from .export_fingerprints import ExportFingerprints, output_key, task_fingerprint
+from .export_tracer import ExportTracer, item_args, traced
+from .sg_call_stats import ShotgunCallStats
+from .export_plan import ExportPlan
 
 from tank.errors import TankHookMethodDoesNotExistError
 
@@ -120,6 +132,10 @@ class ShotgunShotProcessorUI(ShotgunHieroObjectBase, ShotProcessorUI, CollatingE
         if self._cutsSupported():
             cut_type_layout = self._build_cut_type_layout(properties)
             shotgun_layout.addLayout(cut_type_layout)
+            shotgun_layout.addLayout(self._build_incremental_cut_layout(properties))
+
+        shotgun_layout.addLayout(self._build_incremental_export_layout(properties))
+        shotgun_layout.addLayout(self._build_dry_run_layout(properties))
 
         #  UI Hook
         # ===========================
@@ -139,6 +155,77 @@ class ShotgunShotProcessorUI(ShotgunHieroObjectBase, ShotProcessorUI, CollatingE
         else:
             ShotProcessorUI.populateUI(self, default, exportItems, editMode)
 
+    def _build_incremental_export_layout(self, properties):
+        """
+        Returns layout with a checkbox to skip the shots which haven't changed
+        since they were last exported.
+
+        :param properties: A dict containing the 'incrementalExport' preset
+        :return: QtGui.QLayout - for the incremental export widget
+        """
+        tooltip = (
+            "Skip exporting files whose shots and export settings haven't "
+            "changed since they were last exported, as long as the files "
+            "are still on disk. Shots are always updated in Shotgun."
+        )
+        key = "incrementalExport"
+        value = False
+        label = "Skip Unchanged Shots:"
+
+        layout = QtGui.QFormLayout()
+        incremental_property = UIPropertyFactory.create(type(value), key=key, value=value,
+                                                        dictionary=properties, label=label,
+                                                        tooltip=tooltip)
+        layout.addRow(label, incremental_property)
+        return layout
+
+    def _build_incremental_cut_layout(self, properties):
+        """
+        Returns layout with a checkbox to update the latest revision of the
+        Cut rather than create a new one.
+
+        :param properties: A dict containing the 'incrementalCut' preset
+        :return: QtGui.QLayout - for the incremental cut widget
+        """
+        tooltip = (
+            "Update the latest revision of the Cut in Shotgun rather than "
+            "creating a new revision. Only the CutItems whose shots were "
+            "added, removed or re-cut are written."
+        )
+        key = "incrementalCut"
+        value = False
+        label = "Update Latest Cut Revision:"
+
+        layout = QtGui.QFormLayout()
+        incremental_property = UIPropertyFactory.create(type(value), key=key, value=value,
+                                                        dictionary=properties, label=label,
+                                                        tooltip=tooltip)
+        layout.addRow(label, incremental_property)
+        return layout
+
+    def _build_dry_run_layout(self, properties):
+        """
+        Returns layout with a checkbox to plan the export without running it.
+
+        :param properties: A dict containing the 'dryRun' preset
+        :return: QtGui.QLayout - for the dry run widget
+        """
+        tooltip = (
+            "Resolve the export and record the Shotgun writes it would make "
+            "in a plan, without rendering anything or writing to Shotgun. "
+            "The plan is written to the export plan folder."
+        )
+        key = "dryRun"
+        value = False
+        label = "Dry Run:"
+
+        layout = QtGui.QFormLayout()
+        dry_run_property = UIPropertyFactory.create(type(value), key=key, value=value,
+                                                    dictionary=properties, label=label,
+                                                    tooltip=tooltip)
+        layout.addRow(label, dry_run_property)
+        return layout
+
     def _build_cut_type_layout(self, properties):
         """
         Returns layout with a Label and QComboBox with a list of cut types.
@@ -195,9 +282,7 @@ class ShotgunShotProcessorUI(ShotgunHieroObjectBase, ShotProcessorUI, CollatingE
         """
         Returns a QT widget which contains the tag.
         """
-        fields = ['code']
-        filter = [['entity_type', 'is', 'Shot']]
-        templates = [t['code'] for t in self.app.shotgun.find('TaskTemplate', filter, fields=fields)]
+        templates = self._get_task_template_index().codes('Shot')
 
         schema = self.app.shotgun.schema_field_read('Shot', 'sg_status_list')
         statuses = schema['sg_status_list']['properties']['valid_values']['value']
@@ -303,9 +388,30 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
     """
     Adds hook functionality to the built in Shot processor.
     """
+
+    # the shotgunShotCreateProperties left out of the fingerprints of the
+    # exported files, as they don't change the files
+    _unfingerprintedProperties = ("dryRun", "incrementalCut")
+
+    # the fields of the previous revision of the Cut compared with the new
+    # revision by an incremental cut
+    _incrementalCutFields = (
+        "project",
+        "entity",
+        "code",
+        "sg_cut_type",
+        "description",
+        "fps",
+        "timecode_start_text",
+        "timecode_end_text",
+        "duration",
+    )
     def __init__(self, preset, submission=None, synchronous=False):
         FnShotProcessor.ShotProcessor.__init__(self, preset, submission, synchronous)
 
+        # the latest revision of the Cut of the sequence, found by _getCutData
+        self._previous_cut = None
+
         # Call pre processor hook here to make sure it happens pior to any 'hook_resolve_custom_strings'.
         # The order if execution is basically [init processor, resolve user entries, startProcessing].
         self.app.execute_hook("hook_pre_export", processor=self)
@@ -315,6 +421,31 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         Executing the export
         """
 
+        if not preview:
+            # account for the Shotgun calls made by the export if a report of
+            # them has been asked for, as it adds to the cost of each call
+            self.app.sg_call_stats = None
+            if self.app.get_setting("sg_call_report_folder", ""):
+                self.app.sg_call_stats = ShotgunCallStats()
+            self._startTracing()
+
+            # a dry run records the Shotgun writes in a plan rather than
+            # making them
+            self.app.export_plan = None
+            if self._getDryRunProperty():
+                self.app.export_plan = ExportPlan()
+        return self._startProcessing(exportItems, preview)
+
+    @traced("processor", "startProcessing")
+    def _startProcessing(self, exportItems, preview=False):
+        """
+        Executing the export, recorded by the export tracer if there is one.
+        """
+
+        # the tasks created below collate their items from the current state
+        # of the sequences, so make sure the collation indexes are rebuilt.
+        clearCollationIndexes()
+
         # In 10.5v1, the preview option was added. If True, then the export
         # dialog just needs a list of all the tasks that will run. Since we're
         # not adding tasks here, simply return the base class list.
@@ -375,6 +506,22 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         # tag app as first shot
         self.app.shot_count = 0
 
+        # resolve the hooks again, and count the calls made by this export
+        self.app.reset_hook_cache()
+
+        # start the export with a fresh data cache. it is populated in
+        # processTaskPreQueue and shared by all of the tasks.
+        self.app.preprocess_data = {}
+
+        # check the cached entities for changes made since the last export
+        entity_cache = self._get_entity_cache()
+        if entity_cache is not None:
+            entity_cache.refresh()
+
+        # reload the task templates so that any created since the export
+        # dialog was opened are available to the shot updaters.
+        self.app.task_template_index = None
+
         # need to temporarily monkey patch the internal hiero check so that our
         # preview quicktime is generated. See the notes in the method being
         # called for more info.
@@ -393,12 +540,27 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         exportTemplate.pop(0)
         self._exportTemplate.restore(exportTemplate)
 
+    @traced("processor")
     def processTaskPreQueue(self):
         """Process the tasks just before they're queued up for execution."""
 
         # do the normal pre processing as defined in the base class
         FnShotProcessor.ShotProcessor.processTaskPreQueue(self)
 
+        self.app.engine.show_busy(
+            "Preprocessing Sequence",
+            "Retrieving Shots from Shotgun ..."
+        )
+
+        # wrap in a try/catch to make sure we can clear the popup at the end
+        try:
+            # look up all of the shots in the export at once
+            self._prefetchShots()
+            self._prefetchVersions()
+            self._createFilesystemStructure()
+        finally:
+            self.app.engine.clear_busy()
+
         # if set, only exporting the cut portion of the source clip. If false,
         # the export will be the full clip
         cut_length = self._preset.properties()["cutLength"]
@@ -443,6 +605,35 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
                 # transcode_task may be None.
                 cut_related_tasks.append((shot_updater_task, transcode_task))
 
+        # buffer the shot updates made while the tasks execute so they can be
+        # committed in batches. the buffer is closed by the last shot updater
+        # task to finish.
+        update_buffer = ShotgunUpdateBuffer(self.app)
+        self.app.preprocess_data["shot_update_buffer"] = update_buffer
+        self.app.preprocess_data["pending_shot_updaters"] = len(cut_related_tasks)
+        if not cut_related_tasks:
+            update_buffer.close()
+
+        # drop the tasks whose output is already up to date
+        if self._getIncrementalExportProperty():
+            self._skipUnchangedTasks()
+
+        plan = self.app.export_plan
+        if plan is None:
+            # run the uploads made by the tasks in the background, so that the
+            # next task can start while the previous task's media is uploaded.
+            # the export is wrapped up once the last task has finished.
+            self.app.preprocess_data["upload_pool"] = ShotgunUploadPool(self.app)
+
+            # render each thumbnail once and share it between the entities
+            # using it
+            self.app.preprocess_data["thumbnail_service"] = ThumbnailService(self.app)
+            self._trackPendingTasks()
+            self._traceTasks()
+        else:
+            # a dry run only records the thumbnails it would upload
+            self.app.preprocess_data["thumbnail_service"] = plan.thumbnail_service()
+
         # sort the tasks based on their position in the timeline. this gives
         # us the cut order.
         cut_related_tasks.sort(key=lambda tasks: tasks[0]._item.timelineIn())
@@ -455,12 +646,27 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
             # Cut order is 1-based
             shot_updater_task._cut_order = i + 1
 
-        # if you're wondering why we looped over the tasks above only to bail
-        # out here if cuts support isn't available for the site, it's to
-        # maintain backward compatibility for updating the Shot entities with
-        # cut data which relies on setting `_cut_order` on those updater tasks.
-        # The we also use the above loops to get the tasks in cut order which
-        # will be used in `_processCuts` if the site has cut support.
+        # if you're wondering why we looped over the tasks above only for
+        # _createCut to bail out if cuts support isn't available for the
+        # site, it's to maintain backward compatibility for updating the Shot
+        # entities with cut data which relies on setting `_cut_order` on those
+        # updater tasks. The we also use the above loops to get the tasks in
+        # cut order which will be used in `_processCuts` if the site has cut
+        # support.
+        self._createCut(cut_related_tasks)
+
+        # the tasks of a dry run are planned rather than run
+        if plan is not None:
+            self._planTasks()
+
+    def _createCut(self, cut_related_tasks):
+        """
+        Create the Cut and CutItem entries for the tasks, if the site supports
+        cuts and the export is set to create them.
+
+        :param cut_related_tasks: A sorted list of tuples of the form:
+            (shot_updater_task, transcode_task)
+        """
 
         if not self._cutsSupported():
             # cuts not supported. all done here
@@ -515,6 +721,600 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         return sgCreateCut
     # ===========================
 
+    def _getIncrementalCutProperty(self):
+        """Return the setting for whether to update the latest Cut revision."""
+        properties = self._preset.properties().get("shotgunShotCreateProperties", {})
+        return properties.get("incrementalCut", False)
+
+    def _getDryRunProperty(self):
+        """Return the setting for whether to plan the export without running it."""
+        properties = self._preset.properties().get("shotgunShotCreateProperties", {})
+        return properties.get("dryRun", False)
+
+    def _planTasks(self):
+        """
+        Plan the tasks of a dry run rather than running them: the shot updater
+        tasks update their shots, and the transcode tasks publish their
+        output, against the plan. Nothing is rendered. The tasks are then
+        skipped, and the export wrapped up.
+        """
+
+        tasks = [task for taskGroup in self._submission.children() for task in taskGroup.children()]
+
+        unplanned = 0
+        try:
+            for task in tasks:
+                if getattr(task, "_skipped", False):
+                    continue
+                if isinstance(task, ShotgunShotUpdater):
+                    task.taskStep()
+                elif isinstance(task, ShotgunTranscodeExporter):
+                    if not getattr(task, "_nothingToDo", False):
+                        task.planTask()
+                else:
+                    unplanned += 1
+        except:
+            # stop planning the Shotgun writes of the session
+            self._abortExport(self.app.preprocess_data)
+            raise
+
+        if unplanned:
+            self.app.log_info(
+                "%s export tasks other than Shotgun shot updates and transcodes "
+                "aren't part of the plan." % (unplanned,))
+
+        for task in tasks:
+            self._skipTask(task)
+        self._finishExport(self.app.preprocess_data)
+
+    def _writeExportPlan(self, plan):
+        """
+        Log a summary of the plan of a dry run, and write it to the folder of
+        the ``export_plan_folder`` setting, or to the cache location if it
+        isn't set.
+        """
+
+        for line in plan.summary():
+            self.app.log_info(line)
+
+        plan_folder = self.app.get_setting("export_plan_folder", "")
+        if plan_folder:
+            plan_folder = os.path.expanduser(os.path.expandvars(plan_folder))
+        else:
+            plan_folder = os.path.join(self.app.cache_location, "export_plans")
+
+        path = os.path.join(
+            plan_folder,
+            "hiero_export_plan_%s.json" % datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+        )
+        try:
+            plan.write(path)
+        except (IOError, OSError), e:
+            self.app.log_warning("Unable to write the export plan %s: %s" % (path, e))
+            return
+        self.app.log_info("Export plan written to %s" % (path,))
+
+    def _trackPendingTasks(self):
+        """
+        Arrange for the export to be wrapped up once every task in the
+        submission has finished.
+        """
+
+        tasks = [task for taskGroup in self._submission.children() for task in taskGroup.children()]
+        data = self.app.preprocess_data
+        if not tasks:
+            self._finishExport(data)
+            return
+
+        pending = [len(tasks)]
+
+        def trackFinishTask(finishTask):
+            def trackingFinishTask():
+                try:
+                    finishTask()
+                finally:
+                    pending[0] -= 1
+                    if pending[0] == 0:
+                        self._finishExport(data)
+            return trackingFinishTask
+
+        # the tasks left are never finished once the export is cancelled
+        def trackForcedAbort(forcedAbort):
+            def trackingForcedAbort():
+                try:
+                    forcedAbort()
+                finally:
+                    self._abortExport(data)
+            return trackingForcedAbort
+
+        for task in tasks:
+            task.finishTask = trackFinishTask(task.finishTask)
+            task.forcedAbort = trackForcedAbort(task.forcedAbort)
+
+    def _finishTracing(self):
+        """
+        End the export trace, if there is one, and write it out.
+        """
+        tracer = self.app.tracer
+        if tracer is None:
+            return
+        self.app.tracer = None
+        tracer.finish()
+        self.app.log_info("Export trace written to %s" % (tracer.path,))
+
+    def _startTracing(self):
+        """
+        Start tracing the export if the ``trace_folder`` setting is set.
+        """
+
+        # a previous export may have been abandoned before it finished
+        self.app.tracer = None
+
+        trace_folder = self.app.get_setting("trace_folder", "")
+        if not trace_folder:
+            return
+
+        path = os.path.join(
+            os.path.expanduser(os.path.expandvars(trace_folder)),
+            "hiero_export_%s.json" % datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+        )
+        self.app.tracer = ExportTracer(path)
+        self.app.log_debug("Tracing the export to %s" % (path,))
+
+    def _reportShotgunCalls(self):
+        """
+        Log a summary of the Shotgun calls made by the export, and write the
+        full report to the ``sg_call_report_folder``. The calls are only
+        accounted for if that setting is set.
+        """
+
+        stats = self.app.sg_call_stats
+        if stats is None:
+            return
+        self.app.sg_call_stats = None
+
+        report = stats.report()
+        for line in stats.summary(report):
+            self.app.log_info(line)
+
+        report_folder = self.app.get_setting("sg_call_report_folder", "")
+        path = os.path.join(
+            os.path.expanduser(os.path.expandvars(report_folder)),
+            "hiero_export_sg_calls_%s.json" % datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+        )
+        try:
+            stats.write(path, report)
+        except (IOError, OSError), e:
+            self.app.log_warning("Unable to write the Shotgun call report %s: %s" % (path, e))
+            return
+        self.app.log_info("Shotgun call report written to %s" % (path,))
+
+    def _traceTasks(self):
+        """
+        Record the startTask, taskStep and finishTask calls of every task in
+        the submission with the export tracer, if there is one.
+        """
+
+        tracer = self.app.tracer
+        if tracer is None:
+            return
+
+        for taskGroup in self._submission.children():
+            for task in taskGroup.children():
+                args = item_args(task)
+                for name in ("startTask", "taskStep", "finishTask"):
+                    setattr(task, name, tracer.wrap(getattr(task, name), name, "task", args))
+
+    def _finishExport(self, data):
+        """
+        Wrap up the export once all of its tasks have finished: commit any
+        remaining shot updates and wait for the uploads to complete. The plan
+        of a dry run is written out.
+
+        :param data: The data cache of the export.
+        """
+
+        update_buffer = data.get("shot_update_buffer")
+        if update_buffer is not None:
+            try:
+                update_buffer.close()
+            except Exception, e:
+                # the buffer has logged the updates that were dropped, and the
+                # uploads still need to be waited for
+                self.app.log_debug("Failed to commit the buffered Shot updates: %s" % (e,))
+
+        # the entities using each thumbnail are all known once the tasks have
+        # run, so each image is uploaded once for all of them
+        thumbnail_service = data.get("thumbnail_service")
+        if thumbnail_service is not None:
+            thumbnail_service.flush()
+
+        upload_pool = data.pop("upload_pool", None)
+        if upload_pool is not None:
+            self.app.engine.show_busy(
+                "Finishing Export",
+                "Waiting for uploads to Shotgun ..."
+            )
+            try:
+                upload_pool.close()
+            finally:
+                self.app.engine.clear_busy()
+
+        # the uploads are finished with the rendered thumbnails
+        thumbnail_service = data.pop("thumbnail_service", None)
+        if thumbnail_service is not None:
+            thumbnail_service.close()
+
+        # the sequences may be edited once the export has run
+        clearCollationIndexes()
+
+        plan = self.app.export_plan
+        if plan is not None:
+            self.app.export_plan = None
+            self._writeExportPlan(plan)
+
+        self.app.log_hook_call_counts()
+        self._reportShotgunCalls()
+
+        # the trace is written once the spans still open, such as the one for
+        # the task that finished last, have ended
+        self._finishTracing()
+
+    def _abortExport(self, data):
+        """
+        Commit the shot updates buffered by the tasks that ran before the
+        export was cancelled, as they would have been written right away
+        without the buffer, and cancel the uploads that haven't started,
+        removing their temporary files. The plan of a dry run is discarded,
+        and the Shotgun call report and the export trace are written out.
+        Only the first call does anything.
+
+        :param data: The data cache of the export.
+        """
+
+        if data.get("aborted"):
+            return
+        data["aborted"] = True
+
+        try:
+            # the sequences may be edited once the export has been cancelled
+            clearCollationIndexes()
+
+            update_buffer = data.get("shot_update_buffer")
+            if update_buffer is not None:
+                self.app.log_info(
+                    "Export cancelled. Committing %s buffered Shot updates..." % (len(update_buffer),))
+                try:
+                    update_buffer.close()
+                except Exception, e:
+                    # the buffer has logged the updates that were dropped
+                    self.app.log_debug("Failed to commit the buffered Shot updates: %s" % (e,))
+
+            # the tasks left upload right away
+            upload_pool = data.pop("upload_pool", None)
+            if upload_pool is not None:
+                upload_pool.cancel()
+        finally:
+            # stop planning, accounting for and tracing the Shotgun calls of
+            # the session. the plan of a cancelled dry run is incomplete, so
+            # it isn't written out.
+            if self.app.export_plan is not None:
+                self.app.export_plan = None
+                self.app.log_info("Discarded the plan of the cancelled dry run.")
+            self._reportShotgunCalls()
+            self._finishTracing()
+
+    def _getIncrementalExportProperty(self):
+        """Return the setting for whether to skip unchanged shots."""
+        properties = self._preset.properties().get("shotgunShotCreateProperties", {})
+        return properties.get("incrementalExport", False)
+
+    def _skipUnchangedTasks(self):
+        """
+        Skip the export tasks whose inputs and output files haven't changed
+        since they were last exported. The other export tasks record their
+        inputs once they have finished, for the next export.
+
+        The shot updater tasks are never skipped, since the cut information
+        must be kept up to date in Shotgun.
+        """
+
+        tasks = []
+        for taskGroup in self._submission.children():
+            for task in taskGroup.children():
+                if isinstance(task, ShotgunShotUpdater) or getattr(task, "_nothingToDo", False):
+                    continue
+                if not hasattr(task, "resolvedExportPath"):
+                    continue
+                tasks.append((task, output_key(task), task.resolvedExportPath()))
+
+        if not tasks:
+            return
+
+        # the fingerprints are stored in the export root, which doesn't
+        # depend on the version being exported
+        root = os.path.dirname(os.path.commonprefix(
+            [os.path.join(task._exportRoot, "") for (task, key, path) in tasks]))
+        try:
+            fingerprints = ExportFingerprints(root)
+        except Exception, e:
+            self.app.log_warning(
+                "Unable to open the export fingerprints in %s. All shots "
+                "will be exported: %s" % (root, e))
+            return
+
+        # the settings that don't change the exported files are left out, so
+        # that e.g. a dry run compares with the last export that ran
+        properties = self._preset.properties()
+        shotgun_properties = dict(properties.get("shotgunShotCreateProperties") or {})
+        for key in self._unfingerprintedProperties:
+            shotgun_properties.pop(key, None)
+        processor_properties = {
+            "cutLength": properties.get("cutLength"),
+            "shotgunShotCreateProperties": shotgun_properties,
+        }
+
+        skipped = 0
+        for (task, key, path) in tasks:
+            try:
+                fingerprint = task_fingerprint(task, processor_properties)
+            except Exception, e:
+                self.app.log_debug("Unable to fingerprint the task for %s: %s" % (path, e))
+                fingerprints.forget(key)
+                continue
+
+            if fingerprints.is_unchanged(key, fingerprint):
+                self.app.log_debug("Skipping unchanged export: %s" % (path,))
+                self._skipTask(task)
+                # the cut item of the shot is linked to the existing Version
+                version_id = fingerprints.version_id(key)
+                if version_id is not None:
+                    task._sg_version = {"type": "Version", "id": version_id}
+                skipped += 1
+            else:
+                self._recordFingerprintOnFinish(task, fingerprints, key, path, fingerprint)
+
+        self.app.log_info(
+            "Skipping %s of %s export tasks with unchanged shots." % (skipped, len(tasks)))
+
+    def _skipTask(self, task):
+        """
+        Prevent the task from doing anything when it is executed.
+        """
+        task.startTask = lambda: None
+        task.taskStep = lambda: False
+        task.finishTask = lambda: None
+        task.progress = lambda: 1.0
+        task._skipped = True
+
+    def _recordFingerprintOnFinish(self, task, fingerprints, key, path, fingerprint):
+        """
+        Record the fingerprint of the task's output, written to the path, once
+        it has successfully finished and the uploads it queued in the
+        background have succeeded. The record is removed if the task is
+        aborted or one of its uploads fails.
+        """
+        finishTask = task.finishTask
+        forcedAbort = task.forcedAbort
+        aborted = []
+
+        def recordingFinishTask():
+            finishTask()
+            error = getattr(task, "error", None)
+            if aborted or (callable(error) and error()):
+                fingerprints.forget(key)
+                return
+
+            version = getattr(task, "_sg_version", None)
+            version_id = version["id"] if version else None
+
+            uploads = [u for u in getattr(task, "_pending_uploads", []) if u.required]
+            if not uploads:
+                fingerprints.record(key, path, fingerprint, version_id)
+                return
+
+            # the previous record no longer matches the output
+            fingerprints.forget(key)
+            lock = threading.Lock()
+            remaining = [len(uploads)]
+
+            def recordWhenUploaded(upload):
+                with lock:
+                    remaining[0] -= 1
+                    finished = remaining[0] == 0
+                if finished and not [u for u in uploads if u.error is not None]:
+                    fingerprints.record(key, path, fingerprint, version_id)
+
+            for upload in uploads:
+                upload.add_done_callback(recordWhenUploaded)
+
+        def recordingForcedAbort():
+            aborted.append(True)
+            forcedAbort()
+
+        task.finishTask = recordingFinishTask
+        task.forcedAbort = recordingForcedAbort
+
+    def _getShotItems(self):
+        """
+        Returns a list of the track items that Shots will be looked up for
+        while the tasks in the submission are executed.
+
+        Collated tasks that are not the hero use the hero item's Shot.
+        """
+
+        items = []
+        guids = set()
+        for taskGroup in self._submission.children():
+            for task in taskGroup.children():
+                if not isinstance(task, CollatingExporter):
+                    continue
+                if not isinstance(task._item, hiero.core.TrackItem):
+                    continue
+
+                if task.isCollated() and not task.isHero():
+                    item = task.heroItem()
+                else:
+                    item = task._item
+
+                if item.guid() not in guids:
+                    guids.add(item.guid())
+                    items.append(item)
+
+        return items
+
+    def _prefetchShots(self):
+        """
+        Retrieve the Shots for every item in the submission with as few
+        queries as possible and seed the data cache with them, so that the
+        ``hook_get_shot`` calls made by the tasks don't each query Shotgun.
+        """
+
+        items = self._getShotItems()
+        if not items:
+            return
+
+        try:
+            self.app.execute_hook_method(
+                "hook_get_shot",
+                "prefetch_shots",
+                items=items,
+                data=self.app.preprocess_data,
+                fields=["code", "sg_head_in", "sg_tail_out", "task_template"],
+            )
+        except TankHookMethodDoesNotExistError, e:
+            # the hook may have been overridden previously and not updated to
+            # include this method. the shots will be looked up as the tasks
+            # are executed.
+            self.app.log_debug(
+                "The method 'prefetch_shots' could not be found in the "
+                "'hook_get_shot' hook. Shots will be retrieved one at a time."
+            )
+            return
+
+        # the shots created by the export have no tasks until their task
+        # template is applied, so the templates are applied first. the default
+        # tasks of all of the shots can then be fetched in one go as well.
+        self._applyTaskTemplates()
+
+        resolver = self._get_default_task_resolver()
+        if resolver is not None:
+            resolver.load(self.app.preprocess_data.get("shots_by_id", {}).values())
+
+    def _applyTaskTemplates(self):
+        """
+        Apply the task templates of the shot updater tasks to the prefetched
+        Shots with a single batch request, so that the tasks publishing to a
+        Shot find the Tasks of its template without waiting for the buffered
+        shot updates to be committed.
+        """
+
+        data = self.app.preprocess_data
+        shot_ids_by_code = data.get("shot_ids_by_code", {})
+
+        templates = {}
+        for taskGroup in self._submission.children():
+            for task in taskGroup.children():
+                if not isinstance(task, ShotgunShotUpdater):
+                    continue
+                if task.isCollated() and not task.isHero():
+                    continue
+                if not isinstance(task._item, hiero.core.TrackItem):
+                    continue
+
+                try:
+                    parent = self.app.execute_hook_method(
+                        "hook_get_shot",
+                        "get_shot_parent",
+                        hiero_sequence=task._item.parentSequence(),
+                        data=data,
+                        upload_thumbnail=False,
+                    )
+                except TankHookMethodDoesNotExistError, e:
+                    # the shot updater tasks apply the templates as they go
+                    return
+
+                shot_id = shot_ids_by_code.get((parent["type"], parent["id"], task._item.name()))
+                shot = data.get("shots_by_id", {}).get(shot_id)
+                if shot is None:
+                    continue
+
+                template = task.taskTemplate(shot["type"])
+                if template is not None:
+                    templates[(shot["type"], shot["id"])] = template
+
+        batch_data = []
+        for ((shot_type, shot_id), template) in sorted(templates.items()):
+            current_template = data["shots_by_id"][shot_id].get("task_template")
+            if current_template and current_template["id"] == template["id"]:
+                continue
+            batch_data.append({
+                "request_type": "update",
+                "entity_type": shot_type,
+                "entity_id": shot_id,
+                "data": {"task_template": template},
+            })
+
+        if not batch_data:
+            return
+
+        self.app.log_debug("Applying the task templates of %s Shots..." % (len(batch_data),))
+        self.app.shotgun.batch(batch_data)
+        for request in batch_data:
+            data["shots_by_id"][request["entity_id"]].update(request["data"])
+
+    def _prefetchVersions(self):
+        """
+        Retrieve the Versions of every prefetched Shot with as few queries as
+        possible, so that the version numbers resolved by the tasks through
+        ``hook_resolve_custom_strings`` don't each query Shotgun.
+        """
+
+        shots = self.app.preprocess_data.get("shots_by_id", {}).values()
+        if not shots:
+            return
+
+        try:
+            self.app.execute_hook_method(
+                "hook_resolve_custom_strings",
+                "prefetch_versions",
+                shots=shots,
+                data=self.app.preprocess_data,
+            )
+        except TankHookMethodDoesNotExistError, e:
+            # the hook may have been overridden previously and not updated to
+            # include this method. the versions will be looked up as needed.
+            self.app.log_debug(
+                "The method 'prefetch_versions' could not be found in the "
+                "'hook_resolve_custom_strings' hook. Versions will be "
+                "retrieved one shot at a time."
+            )
+
+    def _createFilesystemStructure(self):
+        """
+        Create the folders of all of the prefetched Shots at once, rather than
+        having each shot updater task create the folders of its own Shot.
+        """
+
+        if not self._getShotUpdaterOptions()[6]:
+            return
+
+        shots = self.app.preprocess_data.get("shots_by_id", {}).values()
+        if not shots:
+            # the shot updater tasks create the folders of their shots
+            return
+
+        ids_by_type = {}
+        for shot in shots:
+            ids_by_type.setdefault(shot["type"], []).append(shot["id"])
+
+        for (shot_type, shot_ids) in sorted(ids_by_type.items()):
+            self._create_filesystem_structure(shot_type, sorted(shot_ids))
+
+        # let the shot updater tasks know which folders already exist
+        self.app.preprocess_data["filesystem_entities"] = set(
+            (shot["type"], shot["id"]) for shot in shots)
+
     def _getCollateProperties(self):
         """
         Returns tuple with values for collateTracks collateShotNames settings.
@@ -561,15 +1361,22 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
             pass
 
         # determine which revision number of the cut to create. look for an
-        # existing Cut with the sequence name with the same parent.
+        # existing Cut with the sequence name with the same parent. an
+        # incremental cut updates that revision, comparing its fields with
+        # the new data.
+        fields = ["revision_number"]
+        if self._getIncrementalCutProperty():
+            fields.extend(self._incrementalCutFields)
+
         sg = self.app.shotgun
         prev_cut = sg.find_one(
             "Cut",
             [["code", "is", hiero_sequence.name()],
              ["entity", "is", parent_entity]],
-            ["revision_number"],
+            fields,
             [{"field_name": "revision_number", "direction": "desc"}]
         )
+        self._previous_cut = prev_cut
 
         if prev_cut is None:
             # no matching Cut, start out at version 1
@@ -685,6 +1492,7 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
             # patch. no need to log another message.
             pass
 
+    @traced("processor")
     def _processCut(self, cut_related_tasks):
         """Collect data and create the Cut and CutItem entries for the tasks.
 
@@ -738,13 +1546,6 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
             # add the length of this item to the full cut duration
             cut_duration += cut_item_data["cut_item_duration"]
 
-            # translate some of the cut item data into timecodes that will also
-            # be populated in the cut item
-            tc_cut_item_in = self._timecode(cut_item_data["cut_item_in"], fps, drop_frame)
-            tc_cut_item_out = self._timecode(cut_item_data["cut_item_out"], fps, drop_frame)
-            tc_edit_in = self._timecode(cut_item_data["edit_in"], fps, drop_frame)
-            tc_edit_out = self._timecode(cut_item_data["edit_out"], fps, drop_frame)
-
             # get the shot so that we have all we need for the cut item.
             # this may create the shot if it doesn't exist already
             shot = self.app.execute_hook(
@@ -755,17 +1556,13 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
                 upload_thumbnail=False,
             )
 
-            # update the cut item data with the shot, timecodes and other fields
-            # required
+            # update the cut item data with the shot and other fields required.
+            # the timecodes are added once all the items are processed
             cut_item_data.update({
                 "code": shot_updater_task.clipName(),
                 "project": self.app.context.project,
                 "shot": {"id": shot["id"], "type": "Shot"},
                 "cut_order": cut_order,
-                "timecode_cut_item_in_text": tc_cut_item_in,
-                "timecode_cut_item_out_text": tc_cut_item_out,
-                "timecode_edit_in_text": tc_edit_in,
-                "timecode_edit_out_text": tc_edit_out,
             })
 
             # add the cut item data to each of the cut related tasks. they
@@ -780,23 +1577,48 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
             if transcode_task:
                 transcode_task._cut_item_data = cut_item_data
 
-            if cut_order == 1:
-                # first item in the cut, set the cut's start timecode
-                cut_data["timecode_start_text"] = tc_edit_in
+                # a skipped transcode task doesn't create a Version, so its cut
+                # item is linked to the one created when it last ran
+                if getattr(transcode_task, "_skipped", False) and \
+                        getattr(transcode_task, "_sg_version", None):
+                    cut_item_data["version"] = transcode_task._sg_version
 
+            if cut_order == 1:
                 # let the first shot_updater be responsible for uploading
                 # a thumbnail for the Cut
                 shot_updater_task._create_cut_thumbnail = True
 
-            if cut_order == len(cut_related_tasks):
-                # last item in the cut, set the cut's end timecode
-                cut_data["timecode_end_text"] = tc_edit_out
-
             cut_item_data_list.append(cut_item_data)
 
+        # translate the cut item in/out and edit in/out frames of all the
+        # items into timecodes in one pass
+        timecode_fields = [
+            ("cut_item_in", "timecode_cut_item_in_text"),
+            ("cut_item_out", "timecode_cut_item_out_text"),
+            ("edit_in", "timecode_edit_in_text"),
+            ("edit_out", "timecode_edit_out_text"),
+        ]
+        frames = [
+            cut_item_data[field]
+            for cut_item_data in cut_item_data_list
+            for (field, _) in timecode_fields
+        ]
+        timecodes = iter(self._timecodes(frames, fps, drop_frame))
+        for cut_item_data in cut_item_data_list:
+            for (_, timecode_field) in timecode_fields:
+                cut_item_data[timecode_field] = next(timecodes)
+
+        # the first and last items set the cut's start and end timecodes
+        cut_data["timecode_start_text"] = cut_item_data_list[0]["timecode_edit_in_text"]
+        cut_data["timecode_end_text"] = cut_item_data_list[-1]["timecode_edit_out_text"]
+
         # all tasks processed, add the duration to the cut data
         cut_data["duration"] = cut_duration
 
+        if self._getIncrementalCutProperty() and self._previous_cut is not None:
+            self._updateCut(self._previous_cut, cut_data, cut_item_data_list)
+            return
+
         # create the cut to get the id.
         sg = self.app.shotgun
         cut = sg.create("Cut", cut_data)
@@ -807,6 +1629,128 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         for cut_item_data in cut_item_data_list:
             cut_item_data["cut"] = {"id": cut["id"], "type": "Cut"}
 
+        # all the cut item data is available now, so create the cut items in
+        # a single request rather than one at a time as the tasks execute.
+        # the data dicts are shared with the tasks, so updating them with the
+        # new entities lets the tasks know the cut items already exist.
+        batch_data = []
+        for cut_item_data in cut_item_data_list:
+            batch_data.append({
+                "request_type": "create",
+                "entity_type": "CutItem",
+                "data": dict(cut_item_data),
+            })
+        cut_items = sg.batch(batch_data)
+        for (cut_item_data, cut_item) in zip(cut_item_data_list, cut_items):
+            cut_item_data.update(cut_item)
+        self._app.log_info("Created %s CutItems in Shotgun." % (len(cut_items),))
+
+    def _updateCut(self, cut, cut_data, cut_item_data_list):
+        """Update a previous revision of the Cut in place of creating a new one.
+
+        The CutItems of the revision are fetched in one query and matched with
+        the new cut item data by Shot, in cut order. The new items without a
+        match are created, the previous items without a match are deleted and
+        the fields which differ are updated, all in a single batch. Unchanged
+        CutItems are left alone.
+
+        :param cut: The previous revision of the Cut, with the fields listed
+            by ``_incrementalCutFields``.
+        :param cut_data: The data of the Cut for the current state of the
+            sequence.
+        :param cut_item_data_list: The data of the CutItems, in cut order.
+            Each is updated with the id of its CutItem.
+        """
+
+        sg = self.app.shotgun
+        cut_link = {"id": cut["id"], "type": "Cut"}
+
+        # the revision is kept, rather than bumped
+        cut_data["revision_number"] = cut["revision_number"]
+
+        batch_data = []
+        cut_changes = self._getChangedFields(cut, cut_data)
+        if cut_changes:
+            batch_data.append({
+                "request_type": "update",
+                "entity_type": "Cut",
+                "entity_id": cut["id"],
+                "data": cut_changes,
+            })
+
+        for cut_item_data in cut_item_data_list:
+            cut_item_data["cut"] = cut_link
+
+        fields = sorted(set(itertools.chain(*cut_item_data_list)))
+        previous_items = sg.find("CutItem", [["cut", "is", cut_link]], fields)
+
+        # pair each shot's previous items with its new items in cut order
+        previous_by_shot = {}
+        for item in sorted(previous_items, key=lambda i: i.get("cut_order")):
+            shot = item.get("shot")
+            previous_by_shot.setdefault(shot and shot["id"], []).append(item)
+
+        created = []
+        updated = 0
+        for cut_item_data in cut_item_data_list:
+            matches = previous_by_shot.get(cut_item_data["shot"]["id"])
+            if not matches:
+                batch_data.append({
+                    "request_type": "create",
+                    "entity_type": "CutItem",
+                    "data": dict(cut_item_data),
+                })
+                created.append((len(batch_data) - 1, cut_item_data))
+                continue
+
+            item = matches.pop(0)
+            changes = self._getChangedFields(item, cut_item_data)
+            if changes:
+                batch_data.append({
+                    "request_type": "update",
+                    "entity_type": "CutItem",
+                    "entity_id": item["id"],
+                    "data": changes,
+                })
+                updated += 1
+
+            # let the tasks know the cut item already exists
+            cut_item_data.update({"id": item["id"], "type": "CutItem"})
+
+        deleted = [item for items in previous_by_shot.values() for item in items]
+        for item in deleted:
+            batch_data.append({
+                "request_type": "delete",
+                "entity_type": "CutItem",
+                "entity_id": item["id"],
+            })
+
+        results = sg.batch(batch_data) if batch_data else []
+        for (index, cut_item_data) in created:
+            cut_item_data.update(results[index])
+
+        self._app.log_info(
+            "Updated Cut '%s' revision %s in Shotgun: %s CutItems created, %s "
+            "updated, %s deleted and %s unchanged." % (
+                cut_data["code"], cut["revision_number"], len(created), updated,
+                len(deleted), len(cut_item_data_list) - len(created) - updated))
+
+    def _getChangedFields(self, entity, data):
+        """
+        Returns the fields of the data whose values differ from those of the
+        entity. Links to entities are compared by type and id.
+        """
+
+        def comparable(value):
+            if isinstance(value, dict) and "id" in value:
+                return (value.get("type"), value["id"])
+            return value
+
+        return dict(
+            (field, value) for (field, value) in data.items()
+            if comparable(value) != comparable(entity.get(field))
+        )
+
     def _timecode(self, frame, fps, drop_frame=False):
         """Convenience wrapper to convert a given frame and fps to a timecode.
 
@@ -815,6 +1759,48 @@ class ShotgunShotProcessor(ShotgunHieroObjectBase, FnShotProcessor.ShotProcessor
         :return: timecode string
         """
 
+        return self._timecodes([frame], fps, drop_frame)[0]
+
+    def _timecodes(self, frames, fps, drop_frame=False):
+        """Convert a list of frames to timecodes in one pass.
+
+        The timecodes are formatted in Python rather than by a call into
+        Hiero for each frame. The first and last of them, and any outside
+        of the first day, are checked against Hiero's and if any differ,
+        Hiero formats all of them.
+
+        :param frames: Frame numbers
+        :param fps: Frames per seconds (float)
+        :return: list of timecode strings
+        """
+
+        formatter = TimecodeFormatter(fps, drop_frame)
+        timecodes = formatter.format_all(frames)
+
+        checked = set([0, len(frames) - 1])
+        checked.update(
+            i for (i, frame) in enumerate(frames)
+            if not 0 <= frame < formatter.frames_per_day
+        )
+        for i in sorted(checked):
+            if i < 0:
+                continue
+            hiero_timecode = self._hieroTimecode(frames[i], fps, drop_frame)
+            if hiero_timecode != timecodes[i]:
+                self.app.log_warning(
+                    "Timecode of frame %s at %s fps is %s in Hiero but was "
+                    "formatted as %s. Using Hiero's timecodes." %
+                    (frames[i], fps, hiero_timecode, timecodes[i]))
+                return [
+                    self._hieroTimecode(frame, fps, drop_frame)
+                    for frame in frames
+                ]
+
+        return timecodes
+
+    def _hieroTimecode(self, frame, fps, drop_frame=False):
+        """Returns Hiero's timecode for a given frame and fps."""
+
         if drop_frame:
             display_type = hiero.core.Timecode.kDisplayDropFrameTimecode
         else:
@@ -858,6 +1844,15 @@ class ShotgunShotProcessorPreset(ShotgunHieroObjectBase, FnShotProcessor.ShotPro
         # holds the cut type to use when creating Cut entires in SG
         default_properties["sg_cut_type"] = ""
 
+        # skip exporting the shots that haven't changed since the last export
+        default_properties["incrementalExport"] = False
+
+        # plan the Shotgun writes of the export rather than running it
+        default_properties["dryRun"] = False
+
+        # update the latest revision of the Cut rather than creating one
+        default_properties["incrementalCut"] = False
+
         #  UI Hook
         # ==============================
         custom_properties = self.app.execute_hook_method("hook_customize_export_ui", "initialize_properties",
@@ -0,0 +1,136 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+
+class TaskTemplateIndex(object):
+    """
+    In-memory index of the TaskTemplates in Shotgun, keyed by code.
+
+    All of the templates for an entity type are loaded with a single query
+    the first time that entity type is requested.
+    """
+
+    def __init__(self, app, entity_cache=None):
+        """
+        :param app: The app instance used to access Shotgun.
+        :param entity_cache: An optional :class:`ShotgunEntityCache` to look
+            up the templates in.
+        """
+        self._app = app
+        self._entity_cache = entity_cache
+        self._templates = {}
+
+    def _load(self, entity_type):
+        """
+        Returns the list of templates for the entity type, querying
+        Shotgun the first time it is requested.
+        """
+        if entity_type not in self._templates:
+            templates = (self._entity_cache or self._app.shotgun).find(
+                "TaskTemplate",
+                [["entity_type", "is", entity_type]],
+                fields=["code"],
+            )
+            self._app.log_debug(
+                "Loaded %s %s task templates from Shotgun." % (len(templates), entity_type))
+            self._templates[entity_type] = templates
+        return self._templates[entity_type]
+
+    def codes(self, entity_type):
+        """
+        Returns the list of template codes for the entity type.
+        """
+        return [t["code"] for t in self._load(entity_type)]
+
+    def get(self, entity_type, code):
+        """
+        Returns the template entity with the given code for the entity type,
+        or None if there is no such template. Codes are matched ignoring
+        case, as Shotgun does.
+        """
+        code = (code or "").lower()
+        for template in self._load(entity_type):
+            if (template["code"] or "").lower() == code:
+                return {"type": template["type"], "id": template["id"]}
+        return None
+
+
+class DefaultTaskResolver(object):
+    """
+    Resolves the default Task of the entities in an export.
+
+    The Tasks matching the filter are fetched for many entities at once with
+    :meth:`load`, then handed out from memory. Entities that weren't loaded
+    are queried individually the first time they are requested.
+    """
+
+    # the maximum number of entities in a single "in" filter
+    _load_chunk_size = 200
+
+    def __init__(self, app, task_filter):
+        """
+        :param app: The app instance used to access Shotgun.
+        :param task_filter: The list of filters a Task must match, as defined
+            by the ``default_task_filter`` setting.
+        """
+        self._app = app
+        self._task_filter = list(task_filter)
+        self._tasks = {}
+
+    def load(self, entities):
+        """
+        Fetch the Tasks for the given entities with as few queries as possible.
+
+        :param entities: A list of entity dictionaries.
+        """
+        entities = [
+            {"type": e["type"], "id": e["id"]}
+            for e in entities if (e["type"], e["id"]) not in self._tasks
+        ]
+
+        for i in range(0, len(entities), self._load_chunk_size):
+            chunk = entities[i:i + self._load_chunk_size]
+            tasks = self._app.shotgun.find(
+                "Task",
+                self._task_filter + [["entity", "in", chunk]],
+                fields=["entity"],
+            )
+            for entity in chunk:
+                self._tasks[(entity["type"], entity["id"])] = []
+            for task in tasks:
+                entity = task.pop("entity")
+                self._tasks[(entity["type"], entity["id"])].append(task)
+
+        if entities:
+            self._app.log_debug("Loaded default tasks for %s entities." % (len(entities),))
+
+    def invalidate(self, entity):
+        """
+        Forget the Tasks of the given entity, so that they're queried again
+        the next time they're requested.
+        """
+        self._tasks.pop((entity["type"], entity["id"]), None)
+
+    def get(self, entity):
+        """
+        Returns the Task linked to the given entity that matches the filter,
+        or None if there isn't exactly one.
+        """
+        key = (entity["type"], entity["id"])
+        if key not in self._tasks:
+            self._tasks[key] = self._app.shotgun.find(
+                "Task",
+                self._task_filter + [["entity", "is", {"type": key[0], "id": key[1]}]],
+            )
+
+        tasks = self._tasks[key]
+        if len(tasks) == 1:
+            return tasks[0]
+        return None
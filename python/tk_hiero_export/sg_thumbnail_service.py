@@ -0,0 +1,200 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import os
+import atexit
+import collections
+import hashlib
+import tempfile
+import threading
+
+from tank.platform.qt import QtCore
+
+# the scratch file used by each thread to upload thumbnails
+_scratch = threading.local()
+_scratch_paths = set()
+
+
+def encode_png(qimage, width=600):
+    """
+    Returns the PNG data of the image scaled to the given width. The image is
+    encoded in memory.
+    """
+    byte_array = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(byte_array)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    qimage.scaledToWidth(width, QtCore.Qt.SmoothTransformation).save(buffer, "PNG")
+    buffer.close()
+    return byte_array.data()
+
+
+def upload_thumbnail_data(sg, entity_type, entity_id, data):
+    """
+    Upload PNG data as the thumbnail of an entity.
+
+    The API only uploads files, so the data is written to a scratch file which
+    is reused by every upload made from the same thread.
+    """
+    sg.upload_thumbnail(entity_type, entity_id, _write_scratch_file(data))
+
+
+def share_thumbnail_data(sg, entities, data):
+    """
+    Upload PNG data once as the thumbnail of all of the given entities, with a
+    single request. The data is written to the same scratch file as
+    :func:`upload_thumbnail_data`.
+    """
+    if len(entities) == 1:
+        upload_thumbnail_data(sg, entities[0]["type"], entities[0]["id"], data)
+        return
+    sg.share_thumbnail(entities, thumbnail_path=_write_scratch_file(data))
+
+
+def _write_scratch_file(data):
+    """
+    Write the data to the scratch file of the current thread, and return its
+    path.
+    """
+    path = getattr(_scratch, "path", None)
+    try:
+        if path is None:
+            raise IOError("No scratch file for this thread.")
+        with open(path, "wb") as f:
+            f.write(data)
+    except (IOError, OSError):
+        # first upload from this thread, or the previous file is still held
+        # open by another process (e.g. a virus scanner on Windows)
+        (fd, path) = tempfile.mkstemp(prefix="hiero_export_thumbnail_", suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        _scratch.path = path
+        _scratch_paths.add(path)
+    return path
+
+
+@atexit.register
+def _remove_scratch_files():
+    for path in _scratch_paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class CachedThumbnail(object):
+    """
+    A thumbnail rendered and encoded by the :class:`ThumbnailService`.
+    """
+
+    def __init__(self, data, content_hash):
+        """
+        :param data: The PNG data of the thumbnail.
+        :param content_hash: A hash of the data.
+        """
+        self.data = data
+        self.content_hash = content_hash
+
+
+class ThumbnailService(object):
+    """
+    Renders, encodes and uploads the thumbnails of an export.
+
+    Each frame is rendered and encoded once, no matter how many entities it
+    is the thumbnail for. The entities are collected by image until the
+    thumbnails are flushed, then each distinct image is uploaded once and
+    linked to all of its entities with a single request.
+    """
+
+    def __init__(self, app):
+        """
+        :param app: The app instance used to access Shotgun and for logging.
+        """
+        self._app = app
+        self._thumbnails = {}
+
+        # the thumbnails waiting to be uploaded and the entities using them,
+        # keyed by content hash, and the entities already given each image
+        self._pending = collections.OrderedDict()
+        self._uploaded = set()
+
+    def get(self, source_guid, frame, render, width=600):
+        """
+        Returns the thumbnail for a frame of a source, rendering it if it
+        hasn't been already. Errors raised while rendering are passed on.
+
+        :param source_guid: The guid of the clip or sequence rendered.
+        :param frame: The frame rendered.
+        :param render: A callable returning the QImage of the frame, called if
+            the frame hasn't been rendered yet.
+        :param width: The width the image is scaled to.
+        :returns: A :class:`CachedThumbnail`, or None if nothing was rendered.
+        """
+        key = (source_guid, frame, width)
+        if key not in self._thumbnails:
+            qimage = render()
+            if qimage is None:
+                return None
+
+            data = encode_png(qimage, width)
+            self._thumbnails[key] = CachedThumbnail(data, hashlib.sha1(data).hexdigest())
+
+        return self._thumbnails[key]
+
+    def upload(self, entity, thumbnail):
+        """
+        Set the thumbnail of the entity when the thumbnails are flushed,
+        unless it has already been set to the same image during the export.
+
+        :param entity: The entity dictionary to set the thumbnail of.
+        :param thumbnail: A :class:`CachedThumbnail` returned by :meth:`get`.
+        """
+        key = (entity["type"], entity["id"], thumbnail.content_hash)
+        if key in self._uploaded:
+            return
+        self._uploaded.add(key)
+
+        (thumbnail, entities) = self._pending.setdefault(thumbnail.content_hash, (thumbnail, []))
+        entities.append({"type": entity["type"], "id": entity["id"]})
+
+    def flush(self):
+        """
+        Upload each image waiting to be uploaded once, linking it to all of
+        the entities using it. This happens in the background if the export
+        has an upload pool.
+        """
+        pending = self._pending
+        self._pending = collections.OrderedDict()
+
+        upload_pool = getattr(self._app, "preprocess_data", {}).get("upload_pool")
+        for (thumbnail, entities) in pending.values():
+            description = "thumbnail for %s" % (
+                ", ".join("%s %s" % (e["type"], e["id"]) for e in entities),)
+
+            def upload(sg, thumbnail=thumbnail, entities=entities):
+                self._app.log_debug("Uploading thumbnail for %s entities..." % (len(entities),))
+                share_thumbnail_data(sg, entities, thumbnail.data)
+
+            if upload_pool is not None:
+                upload_pool.submit(description, upload, required=False)
+                continue
+
+            try:
+                upload(self._app.shotgun)
+            except Exception, e:
+                self._app.log_info("Failed to upload %s: %s" % (description, e))
+
+    def close(self):
+        """
+        Release the rendered thumbnails. They must have been flushed and any
+        uploads must have finished.
+        """
+        self._thumbnails = {}
+        self._pending = collections.OrderedDict()
+        self._uploaded = set()
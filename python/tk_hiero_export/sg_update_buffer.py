@@ -0,0 +1,90 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import threading
+from collections import OrderedDict
+
+
+class ShotgunUpdateBuffer(object):
+    """
+    Collects updates to Shotgun entities and commits them with batch requests.
+
+    Updates made to the same entity are merged, so each entity is written once
+    per flush no matter how many callers update it. The buffer is flushed
+    automatically once updates are pending for ``flush_threshold`` entities,
+    and when it is closed. Once closed, updates are written immediately.
+    """
+
+    def __init__(self, app, flush_threshold=50):
+        """
+        :param app: The app instance used to access Shotgun and for logging.
+        :param flush_threshold: The number of entities with pending updates
+            that triggers a flush.
+        """
+        self._app = app
+        self._flush_threshold = flush_threshold
+        self._pending = OrderedDict()
+        self._closed = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def update(self, entity_type, entity_id, data):
+        """
+        Queue an update of the given entity. The data is merged with any
+        update already pending for the entity.
+
+        :param entity_type: The Shotgun entity type.
+        :param entity_id: The id of the entity to update.
+        :param data: A dictionary of fields to update.
+        """
+        with self._lock:
+            self._pending.setdefault((entity_type, entity_id), {}).update(data)
+            if self._closed or len(self._pending) >= self._flush_threshold:
+                self.flush()
+
+    def flush(self):
+        """
+        Commit all of the pending updates with a single batch request. If the
+        request fails, the updates are dropped and the entities they were for
+        are logged before the error is raised.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+
+            batch_data = []
+            for ((entity_type, entity_id), data) in self._pending.iteritems():
+                batch_data.append({
+                    "request_type": "update",
+                    "entity_type": entity_type,
+                    "entity_id": entity_id,
+                    "data": data,
+                })
+
+            self._app.log_debug("Committing %s buffered Shotgun updates..." % (len(batch_data),))
+            try:
+                self._app.shotgun.batch(batch_data)
+            except Exception:
+                self._app.log_error(
+                    "Failed to commit the updates of %s. They were dropped." %
+                    (", ".join("%s %s" % key for key in self._pending),))
+                raise
+            finally:
+                self._pending.clear()
+
+    def close(self):
+        """
+        Flush the pending updates. Any later updates are written immediately.
+        """
+        with self._lock:
+            self._closed = True
+            self.flush()
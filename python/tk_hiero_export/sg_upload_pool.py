@@ -0,0 +1,248 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+import Queue
+import threading
+
+
+class UploadCancelled(Exception):
+    """
+    The error of an upload that was cancelled before it ran.
+    """
+
+
+class PendingUpload(object):
+    """
+    An upload queued on a :class:`ShotgunUploadPool`.
+    """
+
+    def __init__(self, app, description, upload, cleanup=None, owner=None, required=True):
+        """
+        :param app: The app instance used for logging.
+        :param description: A description of the upload used when reporting.
+        :param upload: A callable taking the Shotgun connection to upload with.
+        :param cleanup: An optional callable run once the upload has finished,
+            whether it succeeded or not, or once it has been cancelled.
+        :param owner: The optional export task the upload belongs to. The
+            task's error is set if a required upload fails.
+        :param required: If False, a failure is only logged.
+        """
+        self._app = app
+        self.description = description
+        self.owner = owner
+        self.required = required
+        self.error = None
+        self._upload = upload
+        self._cleanup = cleanup
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def done(self):
+        """Returns True once the upload has finished or been cancelled."""
+        return self._done.is_set()
+
+    def wait(self):
+        """Wait for the upload to finish or be cancelled."""
+        self._done.wait()
+
+    def add_done_callback(self, callback):
+        """
+        Call the callable with the upload once it has finished or been
+        cancelled, right away if it already has. The callback may be run on
+        a worker thread.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        self._call(callback)
+
+    def _call(self, callback):
+        """
+        Call a done callback with the upload, logging any error it raises
+        rather than passing it on to the worker thread.
+        """
+        try:
+            callback(self)
+        except Exception, e:
+            self._app.log_error(
+                "Failed to handle the end of the upload of %s: %s" % (self.description, e))
+
+    def _run(self, sg):
+        """
+        Upload over the Shotgun connection, then clean up.
+        """
+        error = None
+        try:
+            self._upload(sg)
+        except Exception, e:
+            error = e
+        self._finish(error)
+
+    def _cancel(self):
+        """
+        Clean up without uploading.
+        """
+        self._finish(UploadCancelled("The export was cancelled."))
+
+    def _finish(self, error):
+        """
+        Clean up, report a failure on the owner and run the callbacks.
+        """
+        if self._cleanup:
+            try:
+                self._cleanup()
+            except Exception, e:
+                self._app.log_debug("Failed to clean up after uploading %s: %s" % (self.description, e))
+
+        self.error = error
+        if error is not None and self.required and self.owner is not None:
+            self.owner.setError("Failed to upload %s: %s" % (self.description, error))
+
+        with self._lock:
+            callbacks = self._callbacks
+            self._callbacks = []
+            self._done.set()
+        for callback in callbacks:
+            self._call(callback)
+
+
+class ShotgunUploadPool(object):
+    """
+    Runs uploads to Shotgun on a pool of background threads, so that the
+    export tasks don't wait on the network.
+
+    Each upload is a callable taking the Shotgun connection to use. Toolkit
+    keeps one connection per thread, so every worker uploads over its own
+    connection. The number of queued uploads is bounded, so tasks submitting
+    uploads faster than they can be sent are held back rather than piling up
+    files waiting to be uploaded.
+    """
+
+    def __init__(self, app, worker_count=4, queue_size=16):
+        """
+        :param app: The app instance used to access Shotgun and for logging.
+        :param worker_count: The number of uploads to run at once.
+        :param queue_size: The maximum number of uploads waiting to run.
+        """
+        self._app = app
+        self._queue = Queue.Queue(maxsize=queue_size)
+        self._results = []
+        self._lock = threading.Lock()
+
+        self._workers = []
+        for i in range(worker_count):
+            worker = threading.Thread(
+                target=self._work, name="ShotgunUploadPool-%s" % (i,))
+            # don't hold up the application exiting if the export was
+            # abandoned before the pool was closed
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, description, upload, cleanup=None, owner=None, required=True):
+        """
+        Queue an upload, blocking if the queue is full.
+
+        :param description: A description of the upload used when reporting.
+        :param upload: A callable taking the Shotgun connection to upload with.
+        :param cleanup: An optional callable run once the upload has finished,
+            whether it succeeded or not, or once it has been cancelled.
+        :param owner: The optional export task the upload belongs to. The
+            task's error is set as soon as a required upload fails.
+        :param required: If False, a failure is only logged.
+        :returns: The :class:`PendingUpload`.
+        """
+        pending = PendingUpload(self._app, description, upload, cleanup, owner, required)
+        self._queue.put(pending)
+        return pending
+
+    def _work(self):
+        """
+        Run the queued uploads until the pool is closed.
+        """
+        while True:
+            pending = self._queue.get()
+            if pending is None:
+                self._queue.task_done()
+                return
+
+            # the queue must be told the upload is done whatever happens, or
+            # draining it would never return
+            try:
+                pending._run(self._app.shotgun)
+                with self._lock:
+                    self._results.append(pending)
+            except Exception, e:
+                self._app.log_error("Failed to upload %s: %s" % (pending.description, e))
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """
+        Wait for the queued uploads to finish and report their results.
+
+        :returns: A list of the :class:`PendingUpload` objects that finished
+            since the last drain. Their error is None if they succeeded.
+        """
+        self._queue.join()
+
+        with self._lock:
+            results = self._results
+            self._results = []
+
+        failures = [pending for pending in results if pending.error is not None]
+        for pending in failures:
+            message = "Failed to upload %s: %s" % (pending.description, pending.error)
+            if pending.required:
+                self._app.log_error(message)
+            else:
+                self._app.log_info(message)
+        if results:
+            self._app.log_info(
+                "Uploaded %s of %s items to Shotgun." % (len(results) - len(failures), len(results)))
+
+        return results
+
+    def cancel(self):
+        """
+        Cancel the queued uploads that haven't started, running their cleanup,
+        then wait for the running uploads to finish and stop the workers.
+        """
+        cancelled = 0
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except Queue.Empty:
+                break
+            try:
+                if pending is not None:
+                    pending._cancel()
+                    cancelled += 1
+            finally:
+                self._queue.task_done()
+
+        if cancelled:
+            self._app.log_info("Cancelled %s uploads to Shotgun." % (cancelled,))
+        return self.close()
+
+    def close(self):
+        """
+        Wait for the queued uploads to finish, report their results and stop
+        the workers.
+        """
+        results = self.drain()
+        for worker in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        return results
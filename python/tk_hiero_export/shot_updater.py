@@ -122,7 +122,7 @@ class ShotgunShotUpdater(ShotgunHieroObjectBase, FnShotExporter.ShotTask, Collat
         FnShotExporter.ShotTask.taskStep(self)
 
         # call the preprocess hook to get extra values
-        if self.app.shot_count == 0:
+        if not hasattr(self.app, "preprocess_data"):
             self.app.preprocess_data = {}
         sg_shot = self.app.execute_hook("hook_get_shot", task=self, item=self._item, data=self.app.preprocess_data)
 
@@ -249,28 +249,45 @@ class ShotgunShotUpdater(ShotgunHieroObjectBase, FnShotExporter.ShotTask, Collat
             sg_shot['sg_status_list'] = status
 
         # get task template from the tags
-        template = None
-        template_map = dict(self._preset.properties()["task_template_map"])
-        for tag in self._item.tags():
-            if tag.name() in template_map:
-                template = self.app.tank.shotgun.find_one('TaskTemplate',
-                                                          [['entity_type', 'is', shot_type],
-                                                           ['code', 'is', template_map[tag.name()]]])
-                break
-
-        # if there are no associated, assign default template...
-        if template is None:
-            default_template = self.app.get_setting('default_task_template')
-            if default_template:
-                template = self.app.tank.shotgun.find_one('TaskTemplate',
-                    [['entity_type', 'is', shot_type], ['code', 'is', default_template]])
-
+        template = self.taskTemplate(shot_type)
         if template is not None:
             sg_shot['task_template'] = template
 
-        # commit the changes and update the thumbnail
+        # keep any cached copy of the shot in sync with the values written, so
+        # that tasks reading the shot later in the export see the new values
+        cached_shot = self.app.preprocess_data.get("shots_by_id", {}).get(shot_id)
+
+        # applying a different task template creates tasks for the shot, so
+        # they need to be looked up again by the tasks that publish to it.
+        # the processor applies the templates of the prefetched shots before
+        # the tasks are executed, so this is only the case for the others.
+        template_changed = False
+        if template is not None:
+            current_template = (cached_shot or {}).get("task_template")
+            template_changed = not current_template or current_template["id"] != template["id"]
+
+        # commit the changes and update the thumbnail. if the processor has
+        # provided an update buffer, the changes are committed in a batch
+        # along with those of the other shots in the export. a different task
+        # template is committed right away, as the tasks publishing to the
+        # shot look up the tasks it creates.
         self.app.log_debug("Updating info for %s %s: %s" % (shot_type, shot_id, str(sg_shot)))
-        self.app.tank.shotgun.update(shot_type, shot_id, sg_shot)
+        update_buffer = self.app.preprocess_data.get("shot_update_buffer")
+        if update_buffer is None:
+            self.app.shotgun.update(shot_type, shot_id, sg_shot)
+        elif template_changed:
+            self.app.shotgun.update(shot_type, shot_id, {"task_template": template})
+            update_buffer.update(shot_type, shot_id, dict(
+                (k, v) for (k, v) in sg_shot.iteritems() if k != "task_template"))
+        else:
+            update_buffer.update(shot_type, shot_id, sg_shot)
+
+        task_resolver = self.app.preprocess_data.get("default_task_resolver")
+        if template_changed and task_resolver is not None:
+            task_resolver.invalidate({"type": shot_type, "id": shot_id})
+
+        if cached_shot is not None:
+            cached_shot.update(sg_shot)
 
         # CBSD Customization
         # ===========================
@@ -278,8 +295,7 @@ class ShotgunShotUpdater(ShotgunHieroObjectBase, FnShotExporter.ShotTask, Collat
         # self.app.log_debug("Creating file system structure for %s %s..." % (shot_type, shot_id))
         # self.app.tank.create_filesystem_structure(shot_type, [shot_id])
         if self._preset.properties()['tkCreateFilesystemStructure']:
-            self.app.log_debug("Creating file system structure for %s %s..." % (shot_type, shot_id))
-            self.app.tank.create_filesystem_structure(shot_type, [shot_id])
+            self._create_shot_filesystem_structure(shot_type, shot_id, template_changed)
         # ===========================
 
         # return without error
@@ -298,20 +314,24 @@ class ShotgunShotUpdater(ShotgunHieroObjectBase, FnShotExporter.ShotTask, Collat
             # ===========================
 
             cut_item_data = self._cut_item_data
-            cut_item = self.app.tank.shotgun.create("CutItem", cut_item_data)
-            self.app.log_info("Created CutItem in Shotgun: %s" % (cut_item,))
+            if "id" in cut_item_data:
+                # the shot processor has already created the cut item
+                self.app.log_debug("CutItem exists in Shotgun: %s" % (cut_item_data,))
+            else:
+                cut_item = self.app.shotgun.create("CutItem", cut_item_data)
+                self.app.log_info("Created CutItem in Shotgun: %s" % (cut_item,))
 
-            # update the object's cut item data to include the new info
-            self._cut_item_data.update(cut_item)
+                # update the object's cut item data to include the new info
+                self._cut_item_data.update(cut_item)
 
-            cut = cut_item["cut"]
+            cut = self._cut_item_data["cut"]
 
         # see if this task has been designated to update the Cut thumbnail
         if cut and hasattr(self, "_create_cut_thumbnail"):
             hiero_sequence = self._item.sequence()
             try:
                 # see if we can find a poster frame for the sequence
-                thumbnail = hiero_sequence.thumbnail(hiero_sequence.posterFrame())
+                thumbnail = self._get_thumbnail(hiero_sequence, hiero_sequence.posterFrame())
             except Exception:
                 self.app.log_debug("No thumbnail found for the 'Cut'.")
                 pass
@@ -322,6 +342,73 @@ class ShotgunShotUpdater(ShotgunHieroObjectBase, FnShotExporter.ShotTask, Collat
         # return false to indicate success
         return False
 
+    def finishTask(self):
+        """
+        Commit the buffered shot updates once the last shot has been updated.
+        """
+        FnShotExporter.ShotTask.finishTask(self)
+
+        # non-hero collated items don't update a shot
+        if self.isCollated() and not self.isHero():
+            return
+
+        data = getattr(self.app, "preprocess_data", {})
+        update_buffer = data.get("shot_update_buffer")
+        if update_buffer is None:
+            return
+
+        data["pending_shot_updaters"] = data.get("pending_shot_updaters", 1) - 1
+        if data["pending_shot_updaters"] <= 0:
+            update_buffer.close()
+
+    def taskTemplate(self, shot_type):
+        """
+        Returns the task template to apply to the shot, mapped from the tags
+        of the item or the ``default_task_template`` setting, or None if there
+        isn't one.
+
+        :param shot_type: The entity type of the shot.
+        """
+        template = None
+        template_index = self._get_task_template_index()
+        template_map = dict(self._preset.properties()["task_template_map"])
+        for tag in self._item.tags():
+            if tag.name() in template_map:
+                template = template_index.get(shot_type, template_map[tag.name()])
+                break
+
+        # if there are no associated, assign default template...
+        if template is None:
+            default_template = self.app.get_setting('default_task_template')
+            if default_template:
+                template = template_index.get(shot_type, default_template)
+
+        return template
+
+    def _create_shot_filesystem_structure(self, shot_type, shot_id, template_changed):
+        """
+        Create the folders for the shot, unless the processor has already
+        created them for all of the shots in the export.
+
+        :param shot_type: The entity type of the shot.
+        :param shot_id: The id of the shot.
+        :param template_changed: True if a different task template has been
+            applied to the shot.
+        """
+        data = self.app.preprocess_data
+        created = data.get("filesystem_entities")
+        if created is None:
+            # the folders aren't created up front, create them one shot at a time
+            self._create_filesystem_structure(shot_type, [shot_id])
+            return
+
+        # shots created by this export didn't exist when the processor
+        # created the folders, and the tasks that follow need them. the tasks
+        # of a different task template need their folders too.
+        if (shot_type, shot_id) not in created or template_changed:
+            self._create_filesystem_structure(shot_type, [shot_id])
+            created.add((shot_type, shot_id))
+
     def is_cut_length_export(self):
         """
         Returns ``True`` if this task has the "Cut Length" option checked.
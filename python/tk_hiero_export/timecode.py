@@ -0,0 +1,79 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+
+class TimecodeFormatter(object):
+    """
+    Formats frame numbers as SMPTE timecodes, as Hiero displays them, without
+    calling into Hiero.
+
+    Timecodes count whole frames at the nominal rate, the frame rate rounded
+    to the nearest integer, so 23.976 fps is counted at 24. Drop frame
+    timecodes skip the first two frame numbers of every minute (four at 60
+    fps) except every tenth minute, and separate the frames with a
+    semicolon. They only apply to the 30 and 60 fps nominal rates; other
+    rates are formatted as non drop frame timecodes.
+
+    The constants of the rate are computed once, so that all the timecodes
+    of a sequence can be formatted in one pass with :meth:`format_all`.
+    """
+
+    def __init__(self, fps, drop_frame=False):
+        """
+        :param fps: The frame rate, which may be fractional.
+        :param drop_frame: Whether to format drop frame timecodes.
+        """
+        self.fps = float(fps)
+        self.rate = int(round(self.fps))
+        if self.rate <= 0:
+            raise ValueError("Invalid frame rate for timecodes: %s" % (fps,))
+
+        self.drop_frame = bool(drop_frame) and self.rate in (30, 60)
+        if self.drop_frame:
+            self._drop = self.rate // 15
+            self._frames_per_minute = self.rate * 60 - self._drop
+            self._frames_per_ten_minutes = self.rate * 600 - self._drop * 9
+            self._format = "%02d:%02d:%02d;%02d"
+            # the number of frames in a day, after which the timecode wraps,
+            # e.g. 2589408 at 29.97 fps
+            self.frames_per_day = self._frames_per_ten_minutes * 6 * 24
+        else:
+            self._format = "%02d:%02d:%02d:%02d"
+            self.frames_per_day = self.rate * 86400
+
+    def format(self, frame):
+        """
+        Returns the timecode of a frame, counted from 00:00:00:00.
+        """
+        frame = self._frame_number(int(frame))
+        (seconds, frames) = divmod(frame, self.rate)
+        (minutes, seconds) = divmod(seconds, 60)
+        (hours, minutes) = divmod(minutes, 60)
+        return self._format % (hours % 24, minutes, seconds, frames)
+
+    def format_all(self, frames):
+        """
+        Returns the timecodes of a list of frames.
+        """
+        return [self.format(frame) for frame in frames]
+
+    def _frame_number(self, frame):
+        """
+        Returns the frame number displayed for a frame count, accounting for
+        the frame numbers skipped by drop frame timecodes.
+        """
+        if not self.drop_frame:
+            return frame
+
+        (tens, remainder) = divmod(frame, self._frames_per_ten_minutes)
+        frame += self._drop * 9 * tens
+        if remainder > self._drop:
+            frame += self._drop * ((remainder - self._drop) // self._frames_per_minute)
+        return frame
@@ -9,7 +9,6 @@
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
 import os
-import ast
 import sys
 import shutil
 import tempfile
@@ -23,7 +22,6 @@ import hiero
 from hiero import core
 from hiero.core import *
 
-import tank
 import sgtk.util
 from sgtk.platform.qt import QtGui, QtCore
 
@@ -150,6 +148,9 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
         self._quicktime_path = None
         self._temp_quicktime = None
 
+        # the Version created for the output
+        self._sg_version = None
+
     def buildScript(self):
         """
         Override the default buildScript functionality to also output a temp movie
@@ -261,6 +262,26 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
 
     def startTask(self):
         """ Run Task """
+        self._prepareTask()
+        return FnTranscodeExporter.TranscodeExporter.startTask(self)
+
+    def planTask(self):
+        """
+        Record what the task would render and write to Shotgun in the plan of
+        a dry run export, without rendering anything.
+        """
+        self._prepareTask()
+
+        (start, end) = self.collatedOutputRange()
+        self.app.export_plan.record_render(self._resolved_export_path, end - start + 1)
+
+        self._publish()
+
+    def _prepareTask(self):
+        """
+        Resolve the output of the task, and look up the Shot and the data of
+        the entities it will be published with while the item is still valid.
+        """
         if self._resolved_export_path is None:
             self._resolved_export_path = self.resolvedExportPath()
             self._tk_version = self._formatTkVersionString(self.versionString())
@@ -271,7 +292,7 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
 
         # call the get_shot hook
         ########################
-        if self.app.shot_count == 0:
+        if not hasattr(self.app, "preprocess_data"):
             self.app.preprocess_data = {}
 
         # associate publishes with correct shot, which will be the hero item
@@ -298,22 +319,11 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
         # populate the data dictionary for our Version while the item is still valid
         ##############################
         # see if we get a task to use
-        self._sg_task = None
-        try:
-            task_filter = self.app.get_setting("default_task_filter", "[]")
-            task_filter = ast.literal_eval(task_filter)
-            task_filter.append(["entity", "is", self._sg_shot])
-            tasks = self.app.shotgun.find("Task", task_filter)
-            if len(tasks) == 1:
-                self._sg_task = tasks[0]
-        except ValueError:
-            # continue without task
-            setting = self.app.get_setting("default_task_filter", "[]")
-            self.app.log_error("Invalid value for 'default_task_filter': %s" % setting)
+        self._sg_task = self._get_default_task(self._sg_shot)
 
         if self._preset.properties()['create_version']:
             # lookup current login
-            sg_current_user = tank.util.get_current_user(self.app.tank)
+            sg_current_user = self._get_current_user()
 
             file_name = os.path.basename(self._resolved_export_path)
             file_name = os.path.splitext(file_name)[0]
@@ -358,27 +368,38 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
         # anything to work with, which will result in the same result
         # as if the thumbnail failed to upload.
         try:
-            self._thumbnail = source.thumbnail(self._item.sourceIn())
+            self._thumbnail = self._get_thumbnail(source, self._item.sourceIn())
         except Exception:
             pass
 
-        return FnTranscodeExporter.TranscodeExporter.startTask(self)
-
     def finishTask(self):
         """ Finish Task """
         # run base class implementation
         FnTranscodeExporter.TranscodeExporter.finishTask(self)
 
+        self._publish()
+
+        # Log usage metrics
+        try:
+            self.app.log_metric("Transcode & Publish", log_version=True)
+        except:
+            # ingore any errors. ex: metrics logging not supported
+            pass
+
+    def _publish(self):
+        """
+        Publish the output of the task, create its Version and attach it to
+        the cut item.
+        """
+        plan = self.app.export_plan
+
         # create publish
         ################
         # by using entity instead of export path to get context, this ensures
         # collated plates get linked to the hero shot
-        ctx = self.app.tank.context_from_entity('Shot', self._sg_shot['id'])
         published_file_type = self.app.get_setting('plate_published_file_type')
 
         args = {
-            "tk": self.app.tank,
-            "context": ctx,
             "path": self._resolved_export_path,
             "name": os.path.basename(self._resolved_export_path),
             "version_number": int(self._tk_version),
@@ -392,7 +413,7 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
 
         # register publish
         self.app.log_debug("Register publish in shotgun: %s" % str(args))
-        pub_data = tank.util.register_publish(**args)
+        pub_data = self._register_publish(self._sg_shot, **args)
         if self._extra_publish_data is not None:
             self.app.log_debug("Updating Shotgun %s %s" % (published_file_entity_type, str(self._extra_publish_data)))
             self.app.shotgun.update(pub_data["type"], pub_data["id"], self._extra_publish_data)
@@ -419,16 +440,32 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
 
             self.app.log_debug("Creating Shotgun Version %s" % str(self._version_data))
             vers = self.app.shotgun.create("Version", self._version_data)
+            self._sg_version = vers
+
+            if plan is not None:
+                # the quicktime is rendered along with the output
+                plan.record_upload("sg_uploaded_movie", vers)
+            elif self._quicktime_path and os.path.exists(self._quicktime_path):
+                quicktime_path = self._quicktime_path
+                temp_quicktime = self._temp_quicktime
+
+                def upload(sg):
+                    self.app.log_debug("Uploading quicktime to Shotgun... (%s)" % quicktime_path)
+                    sg.upload("Version", vers["id"], quicktime_path, "sg_uploaded_movie")
 
-            if os.path.exists(self._quicktime_path):
-                self.app.log_debug("Uploading quicktime to Shotgun... (%s)" % self._quicktime_path)
-                self.app.shotgun.upload("Version", vers["id"], self._quicktime_path, "sg_uploaded_movie")
-                if self._temp_quicktime:
-                    shutil.rmtree(os.path.dirname(self._quicktime_path))
+                def cleanup():
+                    if temp_quicktime:
+                        shutil.rmtree(os.path.dirname(quicktime_path))
+
+                # the upload may run in the background while the next tasks
+                # are executed
+                self._submit_upload("quicktime for Version %s" % (vers["id"],), upload, cleanup)
 
         # Post creation hook
         ####################
-        if vers:
+        # not run by a dry run, as the hook may act outside of Shotgun on a
+        # Version that doesn't exist yet
+        if vers and plan is None:
             self.app.execute_hook(
                 "hook_post_version_creation",
                 version_data=vers,
@@ -461,13 +498,6 @@ class ShotgunTranscodeExporter(ShotgunHieroObjectBase, FnTranscodeExporter.Trans
                         self._thumbnail
                     )
 
-        # Log usage metrics
-        try:
-            self.app.log_metric("Transcode & Publish", log_version=True)
-        except:
-            # ingore any errors. ex: metrics logging not supported
-            pass
-
 
 class ShotgunTranscodePreset(ShotgunHieroObjectBase, FnTranscodeExporter.TranscodePreset, CollatedShotPreset):
     """ Settings for the shotgun transcode step """